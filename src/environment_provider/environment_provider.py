@@ -19,17 +19,33 @@ import uuid
 import logging
 import traceback
 import json
-from threading import Lock
-from copy import deepcopy
+from threading import Lock, Thread
+from multiprocessing.pool import ThreadPool
+from copy import copy, deepcopy
 from etos_lib.etos import ETOS
 from etos_lib.lib.database import Database
 from etos_lib.logging.logger import FORMAT_CONFIG
 from jsontas.jsontas import JsonTas
+from execution_space_provider import ExecutionSpaceProvider
+from log_area_provider import LogAreaProvider
 from .splitter.split import Splitter
 from .lib.celery import APP
 from .lib.config import Config
+from .lib.event_cache import EventCache
+from .lib.durations import DurationHistory
+from .lib.database_batch import DatabaseBatch
+from .lib.event_batch import EventBatch, unconfirmed_events
+from .lib.batches import group_by_test_runner
+from .lib.sub_suite_store import SubSuiteStore
+from .lib.leases import LeaseStore, ResourceLeases
 from .lib.test_suite import TestSuite
 from .lib.registry import ProviderRegistry
+from .lib.settings import configure_settings
+from .lib.warm_pool import (
+    dataset_references,
+    warm_log_area_provider,
+    warm_execution_space_provider,
+)
 from .lib.json_dumps import JsonDumps
 from .lib.uuid_generate import UuidGenerate
 from .lib.join import Join
@@ -45,7 +61,7 @@ class EnvironmentProviderNotConfigured(Exception):
     """Environment provider was not configured prior to request."""
 
 
-class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
+class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes,too-many-public-methods
     """Environment provider celery Task."""
 
     logger = logging.getLogger("EnvironmentProvider")
@@ -57,7 +73,7 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
     lock = Lock()
 
     def __init__(self, suite_id, suite_runner_ids):
-        """Initialize ETOS, dataset, provider registry and splitter.
+        """Initialize ETOS, dataset, provider registry, splitter and duration history.
 
         :param suite_id: Suite ID to get an environment for
         :type suite_id: str
@@ -80,6 +96,11 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
             self.etos.config.config = deepcopy(self.etos.config.config)
             self.reset()
         self.splitter = Splitter(self.etos, {})
+        self.duration_history = DurationHistory(Database())
+        self.sub_suite_store = SubSuiteStore(Database())
+        self.resource_leases = ResourceLeases()
+        # Copies of all published events, shared with the copies for test suites.
+        self.published_events = []
 
     def reset(self):
         """Create a new dataset and provider registry."""
@@ -120,6 +141,9 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         self.execution_space_provider = self.registry.execution_space_provider(
             self.suite_id
         )
+        self.log_area_provider = warm_log_area_provider(
+            self.etos, self.log_area_provider, self.copy_dataset
+        )
 
     def configure(self, suite_id):
         """Configure environment provider.
@@ -138,19 +162,12 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         self.logger.info("Registry is configured.")
         self.etos.config.set("SUITE_ID", suite_id)
 
-        self.etos.config.set(
-            "EVENT_DATA_TIMEOUT", int(os.getenv("ETOS_EVENT_DATA_TIMEOUT", "10"))
-        )
-        self.etos.config.set(
-            "WAIT_FOR_IUT_TIMEOUT", int(os.getenv("ETOS_WAIT_FOR_IUT_TIMEOUT", "10"))
-        )
-        self.etos.config.set(
-            "WAIT_FOR_EXECUTION_SPACE_TIMEOUT",
-            int(os.getenv("ETOS_WAIT_FOR_EXECUTION_SPACE_TIMEOUT", "10")),
-        )
-        self.etos.config.set(
-            "WAIT_FOR_LOG_AREA_TIMEOUT",
-            int(os.getenv("ETOS_WAIT_FOR_LOG_AREA_TIMEOUT", "10")),
+        configure_settings(self.etos.config)
+
+        self.sub_suite_store = SubSuiteStore(
+            Database(),
+            ttl=self.etos.config.get("SUB_SUITE_TTL"),
+            compression=self.etos.config.get("SUB_SUITE_COMPRESSION"),
         )
 
         self.logger.info("Connect to RabbitMQ")
@@ -158,7 +175,14 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         self.etos.start_publisher()
         self.etos.publisher.wait_start()
 
-        self.environment_provider_config = Config(self.etos, suite_id)
+        event_cache = None
+        if self.etos.config.get("EVENT_CACHE_TTL") > 0:
+            event_cache = EventCache(
+                Database(),
+                ttl=self.etos.config.get("EVENT_CACHE_TTL"),
+                max_size=self.etos.config.get("EVENT_CACHE_MAX_SIZE"),
+            )
+        self.environment_provider_config = Config(self.etos, suite_id, event_cache)
         if not self.environment_provider_config.generated:
             missing = [
                 name
@@ -177,6 +201,12 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
             ]
             raise NoEventDataFound(f"Missing: {', '.join(missing)}")
 
+        if self.etos.config.get("LEASE_TTL") > 0:
+            self.resource_leases = ResourceLeases(
+                LeaseStore(Database(), ttl=self.etos.config.get("LEASE_TTL")),
+                self.environment_provider_config.tercc_id,
+            )
+
     def cleanup(self):
         """Clean up by checkin in all checked out providers."""
         self.logger.info("Cleanup by checking in all checked out providers.")
@@ -186,22 +216,6 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
             except:  # noqa pylint:disable=bare-except
                 pass
 
-    @staticmethod
-    def get_constraint(recipe, key):
-        """Get a constraint key from an ETOS recipe.
-
-        :param recipe: Recipe to get key from.
-        :type recipe: dict
-        :param key: Key to get value from, from the constraints.
-        :type key: str
-        :return: Constraint value.
-        :rtype: any
-        """
-        for constraint in recipe.get("constraints", []):
-            if constraint.get("key") == key:
-                return constraint.get("value")
-        return None
-
     def create_test_suite_dict(self):
         """Create a test suite dictionary based on test runners.
 
@@ -240,22 +254,23 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         :rtype: dict
         """
         self.logger.info("Create new test suite dictionary.")
-        test_suites = {}
-        for test_suite in self.environment_provider_config.test_suite:
-            test_runners = test_suites.setdefault(test_suite.get("name"), {})
+        return group_by_test_runner(self.recipes())
+
+    def recipes(self):
+        """Get all recipes from the test suite, together with the test suite they belong to.
+
+        If 'STREAM_TEST_SUITE' is set, the recipes are parsed while downloading the
+        test suite instead of downloading and parsing the whole test suite at once.
 
+        :return: Generator of test suite and recipe tuples.
+        :rtype: generator
+        """
+        if self.etos.config.get("STREAM_TEST_SUITE"):
+            yield from self.environment_provider_config.stream_test_suite()
+            return
+        for test_suite in self.environment_provider_config.test_suite:
             for recipe in test_suite.get("recipes", []):
-                test_runner = self.get_constraint(recipe, "TEST_RUNNER")
-                test_runners.setdefault(
-                    test_runner,
-                    {
-                        "docker": test_runner,
-                        "priority": test_suite.get("priority"),
-                        "unsplit_recipes": [],
-                    },
-                )
-                test_runners[test_runner]["unsplit_recipes"].append(recipe)
-        return test_suites
+                yield test_suite, recipe
 
     def set_total_test_count_and_test_runners(self, test_runners):
         """Set total test count and test runners to be used by the splitter algorithm.
@@ -269,6 +284,24 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         self.etos.config.set("TOTAL_TEST_COUNT", total_test_count)
         self.etos.config.set("NUMBER_OF_TESTRUNNERS", len(test_runners.keys()))
 
+    def expected_durations(self, test_runners):
+        """Get expected durations of all recipes in a test suite from the duration history.
+
+        :param test_runners: Dictionary with test_runners as keys.
+        :type test_runners: dict
+        :return: Expected durations, by test runner and test case ID.
+        :rtype: dict
+        """
+        return self.duration_history.durations(
+            {
+                test_runner: {
+                    recipe.get("testCase", {}).get("id")
+                    for recipe in values["unsplit_recipes"]
+                }
+                for test_runner, values in test_runners.items()
+            }
+        )
+
     def checkout_and_assign_iuts_to_test_runners(self, test_runners):
         """Checkout IUTs from the IUT provider and assign them to the test_runners dictionary.
 
@@ -280,19 +313,212 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
             maximum_amount=self.etos.config.get("TOTAL_TEST_COUNT"),
         )
         self.etos.config.set("NUMBER_OF_IUTS", len(iuts))
+        # The IUTs in the dataset are the ones assigned to test runners and checked in.
+        iuts = self.resource_leases.lease("iut", self.dataset.get("iuts"))
+        for iut in self.splitter.assign_iuts(test_runners, iuts):
+            self.resource_leases.checkin(self.iut_provider, iut)
+
+    def checkout_log_areas_one_by_one(self, suites, log_area_provider=None):
+        """Checkout a log area for each IUT, with one request to the log area provider each.
+
+        :param suites: IUT and suite pairs to checkout and assign log areas to.
+        :type suites: list
+        :param log_area_provider: Log area provider to checkout from, instead of the
+                                  log area provider of the environment provider.
+        :type log_area_provider: :obj:`log_area_provider.LogAreaProvider`
+        """
+        log_area_provider = log_area_provider or self.log_area_provider
+        dataset = log_area_provider.jsontas.dataset
+        for iut, suite in suites:
+            dataset.add("executor", suite["executor"])
+            dataset.add("iut", iut)
+            # This index will always exist or 'checkout' would raise an exception.
+            suite["log_area"] = self.resource_leases.lease(
+                "log_area",
+                log_area_provider.wait_for_and_checkout_log_areas(
+                    minimum_amount=1, maximum_amount=1
+                ),
+            )[0]
+
+    @staticmethod
+    def bulk_log_area_checkout(log_area_provider):
+        """Check whether log areas for many IUTs can be listed with a single request.
+
+        JSONTas log area providers list log areas without the 'iut' and 'executor' of
+        each IUT, so rulesets whose 'list' step reads them are listed once per IUT.
+
+        :param log_area_provider: Log area provider to checkout from.
+        :type log_area_provider: :obj:`log_area_provider.LogAreaProvider`
+        :return: Whether or not log areas can be checked out in bulk.
+        :rtype: bool
+        """
+        ruleset = log_area_provider.ruleset
+        if ruleset.get("type", "jsontas") == "external":
+            return True
+        references = dataset_references({"list": ruleset.get("list")})
+        return not references & {"iut", "executor"}
+
+    def checkout_log_areas(self, suites, log_area_provider=None):
+        """Checkout log areas for many IUTs with a single request to the log area provider.
+
+        The 'executor' and 'iut' of each suite is passed to the log area provider so that
+        they are available when checking out the log area for that suite. If the log
+        area provider cannot checkout in bulk, log areas are checked out one by one.
+
+        :param suites: IUT and suite pairs to checkout and assign log areas to.
+        :type suites: list
+        :param log_area_provider: Log area provider to checkout from, instead of the
+                                  log area provider of the environment provider.
+        :type log_area_provider: :obj:`log_area_provider.LogAreaProvider`
+        """
+        if not suites:
+            return
+        log_area_provider = log_area_provider or self.log_area_provider
+        if not self.bulk_log_area_checkout(log_area_provider):
+            self.checkout_log_areas_one_by_one(suites, log_area_provider)
+            return
+        contexts = [
+            {"executor": suite["executor"], "iut": iut} for iut, suite in suites
+        ]
+        suites = dict(suites)
+        for context, log_area in log_area_provider.wait_for_and_checkout_log_areas(
+            minimum_amount=len(suites), maximum_amount=len(suites), contexts=contexts
+        ):
+            suites[context["iut"]]["log_area"] = log_area
+        self.resource_leases.lease(
+            "log_area", [suite["log_area"] for suite in suites.values()]
+        )
+
+    def copy_dataset(self):
+        """Make a copy of the current dataset.
 
-        unused_iuts = self.splitter.assign_iuts(test_runners, self.dataset.get("iuts"))
-        for iut in unused_iuts:
-            self.iut_provider.checkin(iut)
+        The ETOS configuration is not pickleable and cannot be deepcopied, so it is
+        shared between the original dataset and the copy.
+
+        :return: A copy of the current dataset.
+        :rtype: :obj:`jsontas.dataset.Dataset`
+        """
+        with self.lock:
+            # pylint:disable=protected-access
+            config = self.dataset._Dataset__dataset.pop("config")
+            try:
+                dataset = self.dataset.copy()
+            finally:
+                self.dataset.add("config", config)
+        dataset.add("config", config)
+        return dataset
+
+    def copy_log_area_provider(self, test_runner=None):
+        """Create a log area provider with a copy of the current dataset.
+
+        Used for log area checkouts that run at the same time as other checkouts, so
+        that the values they add to the dataset are not shared.
+
+        :param test_runner: Test runner to add to the copied dataset.
+        :type test_runner: str
+        :return: Log area provider with a dataset of its own.
+        :rtype: :obj:`log_area_provider.LogAreaProvider`
+        """
+        dataset = self.copy_dataset()
+        if test_runner is not None:
+            dataset.add("test_runner", test_runner)
+        log_area_provider = LogAreaProvider(
+            self.etos,
+            JsonTas(dataset=dataset),
+            self.log_area_provider.ruleset,  # pylint:disable=no-member
+        )
+        self.etos.config.get("PROVIDERS").append(log_area_provider)
+        return warm_log_area_provider(self.etos, log_area_provider, self.copy_dataset)
 
-    def checkout_log_area(self):
-        """Checkout a log area.
+    def copy_execution_space_provider(self, test_runner):
+        """Create an execution space provider with a copy of the current dataset.
 
-        Called for each executor so only a single log area needs to be checked out.
+        :param test_runner: Test runner to add to the copied dataset.
+        :type test_runner: str
+        :return: Execution space provider with a dataset of its own.
+        :rtype:
+            :obj:`execution_space_provider.execution_space_provider.ExecutionSpaceProvider`
         """
-        return self.log_area_provider.wait_for_and_checkout_log_areas(
-            minimum_amount=1, maximum_amount=1
+        dataset = self.copy_dataset()
+        dataset.add("test_runner", test_runner)
+        execution_space_provider = ExecutionSpaceProvider(
+            self.etos,
+            JsonTas(dataset=dataset),
+            self.execution_space_provider.ruleset,  # pylint:disable=no-member
         )
+        self.etos.config.get("PROVIDERS").append(execution_space_provider)
+        return warm_execution_space_provider(
+            self.etos, execution_space_provider, self.copy_dataset, test_runner
+        )
+
+    def checkout_execution_spaces(self, execution_space_provider, amount):
+        """Checkout execution spaces from an execution space provider.
+
+        :param execution_space_provider: Execution space provider to checkout from.
+        :type execution_space_provider:
+            :obj:`execution_space_provider.execution_space_provider.ExecutionSpaceProvider`
+        :param amount: Number of execution spaces to checkout.
+        :type amount: int
+        :return: Checked out execution spaces.
+        :rtype: list
+        """
+        FORMAT_CONFIG.identifier = self.suite_id
+        return self.resource_leases.lease(
+            "executor",
+            execution_space_provider.wait_for_and_checkout_execution_spaces(
+                minimum_amount=amount,
+                maximum_amount=amount,
+            ),
+        )
+
+    def assign_executors(self, iuts, executors, execution_space_provider):
+        """Assign checked out executors to each available IUT.
+
+        :param iuts: Dictionary of IUTs to assign executors to.
+        :type iuts: dict
+        :param executors: Checked out executors to assign.
+        :type executors: list
+        :param execution_space_provider: Provider to check in unassigned executors to.
+        :type execution_space_provider:
+            :obj:`execution_space_provider.execution_space_provider.ExecutionSpaceProvider`
+        :return: IUT and suite pairs that were assigned an executor.
+        :rtype: list
+        """
+        suites = []
+        for iut, suite in iuts.items():
+            try:
+                suite["executor"] = executors.pop(0)
+            except IndexError:
+                break
+            suites.append((iut, suite))
+
+        # Checkin the unassigned executors.
+        for executor in executors:
+            self.resource_leases.checkin(execution_space_provider, executor)
+        return suites
+
+    def assign_executors_to_iuts(
+        self, test_runner, iuts, executors, execution_space_provider
+    ):
+        """Assign checked out executors and a log area to each available IUT.
+
+        :param test_runner: Test runner which will be added to dataset in order for
+                            JSONTas to get more information when running.
+        :type test_runner: dict
+        :param iuts: Dictionary of IUTs to assign executors to.
+        :type iuts: dict
+        :param executors: Checked out executors to assign.
+        :type executors: list
+        :param execution_space_provider: Provider to check in unassigned executors to.
+        :type execution_space_provider:
+            :obj:`execution_space_provider.execution_space_provider.ExecutionSpaceProvider`
+        """
+        self.dataset.add("test_runner", test_runner)
+        suites = self.assign_executors(iuts, executors, execution_space_provider)
+        if self.etos.config.get("BULK_LOG_AREA_CHECKOUT"):
+            self.checkout_log_areas(suites)
+        else:
+            self.checkout_log_areas_one_by_one(suites)
 
     def checkout_and_assign_executors_to_iuts(self, test_runner, iuts):
         """Checkout and assign executors to each available IUT.
@@ -304,25 +530,176 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         :type iuts: dict
         """
         self.dataset.add("test_runner", test_runner)
-        executors = (
-            self.execution_space_provider.wait_for_and_checkout_execution_spaces(
-                minimum_amount=len(iuts),
-                maximum_amount=len(iuts),
+        execution_space_provider = warm_execution_space_provider(
+            self.etos, self.execution_space_provider, self.copy_dataset, test_runner
+        )
+        executors = self.checkout_execution_spaces(execution_space_provider, len(iuts))
+        self.assign_executors_to_iuts(
+            test_runner, iuts, executors, execution_space_provider
+        )
+
+    def checkout_executors_for_test_runners(self, test_runners):
+        """Checkout executors for all test runners concurrently.
+
+        Every test runner gets its own copy of the dataset and its own execution space
+        provider instance so that the JSONTas rulesets are evaluated with the correct
+        'test_runner' while the checkouts are running at the same time.
+
+        :param test_runners: Dictionary with test_runners as keys.
+        :type test_runners: dict
+        :return: Test runner, test runner values, execution space provider and checked
+                 out executors, for each test runner.
+        :rtype: list
+        """
+        thread_pool = ThreadPool(processes=max(len(test_runners), 1))
+        checkouts = []
+        try:
+            for test_runner, values in test_runners.items():
+                execution_space_provider = self.copy_execution_space_provider(
+                    test_runner
+                )
+                self.logger.info(
+                    "Checking out execution spaces for test runner %r", test_runner
+                )
+                checkouts.append(
+                    (
+                        test_runner,
+                        values,
+                        execution_space_provider,
+                        thread_pool.apply_async(
+                            self.checkout_execution_spaces,
+                            args=(execution_space_provider, len(values["iuts"])),
+                        ),
+                    )
+                )
+        finally:
+            # Wait for all checkouts to finish, even if one of them failed, so that
+            # 'cleanup' is able to check in everything that has been checked out.
+            thread_pool.close()
+            thread_pool.join()
+        return [
+            (test_runner, values, execution_space_provider, result.get())
+            for test_runner, values, execution_space_provider, result in checkouts
+        ]
+
+    def checkout_and_assign_executors_to_test_runners(self, test_runners):
+        """Checkout executors for all test runners concurrently and assign them to IUTs.
+
+        :param test_runners: Dictionary with test_runners as keys.
+        :type test_runners: dict
+        """
+        checkouts = self.checkout_executors_for_test_runners(test_runners)
+        for test_runner, values, execution_space_provider, executors in checkouts:
+            self.assign_executors_to_iuts(
+                test_runner, values["iuts"], executors, execution_space_provider
             )
+
+    def checkout_speculative_log_areas(self, log_area_provider):
+        """Checkout log areas before the IUTs are known, if the log area provider allows it.
+
+        Only external log area providers are requested, since JSONTas log area rulesets
+        may depend on the IUT. One log area per test runner is requested, since that is
+        the minimum number of IUTs that will be checked out.
+
+        :param log_area_provider: Log area provider to checkout from.
+        :type log_area_provider: :obj:`log_area_provider.LogAreaProvider`
+        :return: Checked out log areas.
+        :rtype: list
+        """
+        if log_area_provider.ruleset.get("type", "jsontas") != "external":
+            return []
+        amount = self.etos.config.get("NUMBER_OF_TESTRUNNERS")
+        return self.resource_leases.lease(
+            "log_area",
+            log_area_provider.wait_for_and_checkout_log_areas(
+                minimum_amount=amount, maximum_amount=amount
+            ),
         )
-        for iut, suite in iuts.items():
+
+    def checkout_and_assign_to_test_runner(self, test_runner, iuts, log_areas):
+        """Checkout and assign executors and log areas to the IUTs of a test runner.
+
+        The test runner gets its own copy of the dataset and its own providers so that
+        it can check out at the same time as the other test runners. Log areas are
+        checked out after the executors, so that the 'executor' of each IUT is known
+        when checking out its log area.
+
+        :param test_runner: Test runner to checkout for.
+        :type test_runner: str
+        :param iuts: Dictionary of IUTs to assign executors and log areas to.
+        :type iuts: dict
+        :param log_areas: Already checked out log areas to assign before checking out
+                          new ones. Assigned log areas are removed from the list.
+        :type log_areas: list
+        :return: Log areas that were not assigned to an IUT.
+        :rtype: list
+        """
+        execution_space_provider = self.copy_execution_space_provider(test_runner)
+        self.logger.info(
+            "Checking out execution spaces for test runner %r", test_runner
+        )
+        executors = self.checkout_execution_spaces(execution_space_provider, len(iuts))
+        suites = []
+        for iut, suite in self.assign_executors(
+            iuts, executors, execution_space_provider
+        ):
+            if log_areas:
+                suite["log_area"] = log_areas.pop(0)
+            else:
+                suites.append((iut, suite))
+        if suites:
+            self.checkout_log_areas(suites, self.copy_log_area_provider(test_runner))
+        return log_areas
+
+    def checkout_and_assign_pipelined(self, test_runners):
+        """Checkout IUTs, executors and log areas with overlapping phases.
+
+        Log areas are checked out speculatively while the IUTs are checked out. When
+        the IUTs have been assigned, executors and the remaining log areas are checked
+        out for all test runners at the same time. Log areas that are not assigned to
+        an IUT are checked in again.
+
+        :param test_runners: Dictionary with test_runners as keys.
+        :type test_runners: dict
+        """
+        log_area_provider = self.copy_log_area_provider()
+        thread_pool = ThreadPool(processes=1)
+        try:
+            speculative = thread_pool.apply_async(
+                self.checkout_speculative_log_areas, args=(log_area_provider,)
+            )
             try:
-                suite["executor"] = executors.pop(0)
-            except IndexError:
-                break
-            self.dataset.add("executor", suite["executor"])
-            self.dataset.add("iut", iut)
-            # This index will always exist or 'checkout' would raise an exception.
-            suite["log_area"] = self.checkout_log_area()[0]
+                self.checkout_and_assign_iuts_to_test_runners(test_runners)
+            finally:
+                # Wait for the speculative checkout, even if the IUT checkout failed,
+                # so that 'cleanup' is able to check in everything that is checked out.
+                log_areas = speculative.get()
+        finally:
+            thread_pool.close()
+            thread_pool.join()
 
-        # Checkin the unassigned executors.
-        for executor in executors:
-            self.execution_space_provider.checkin(executor)
+        thread_pool = ThreadPool(processes=max(len(test_runners), 1))
+        results = []
+        try:
+            for test_runner, values in test_runners.items():
+                amount = len(values["iuts"])
+                results.append(
+                    thread_pool.apply_async(
+                        self.checkout_and_assign_to_test_runner,
+                        args=(test_runner, values["iuts"], log_areas[:amount]),
+                    )
+                )
+                log_areas = log_areas[amount:]
+        finally:
+            # Wait for all checkouts to finish, even if one of them failed, so that
+            # 'cleanup' is able to check in everything that has been checked out.
+            thread_pool.close()
+            thread_pool.join()
+        for result in results:
+            log_areas.extend(result.get())
+        # Over-provisioned log areas.
+        for log_area in log_areas:
+            self.resource_leases.checkin(log_area_provider, log_area)
 
     def checkin_iuts_without_executors(self, iuts):
         """Find all IUTs without an assigned executor and check them in.
@@ -335,7 +712,7 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         remove = []
         for iut, suite in iuts.items():
             if suite.get("executor") is None:
-                self.iut_provider.checkin(iut)
+                self.resource_leases.checkin(self.iut_provider, iut)
                 remove.append(iut)
         return remove
 
@@ -353,30 +730,200 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
             self.logger.error(json_data)
             raise
 
-    def send_environment_events(self, test_suites):
+    def send_environment_events(self, test_suites, resources=None):
         """Send environment defined events for the created sub suites.
 
         :param test_suites: Test suites to send environment defined for.
         :type test_suites: dict
+        :param resources: Resources of each sub suite, by identifier.
+        :type resources: dict
         """
         base_url = os.getenv("ETOS_ENVIRONMENT_PROVIDER")
-        database = Database(None)  # None = no expiry
-        for sub_suite in test_suites.get("sub_suites", []):
-            # In a valid sub suite all of these keys must exist
-            # making this a safe assumption
-            identifier = sub_suite["executor"]["instructions"]["identifier"]
-            event = self.etos.events.send_environment_defined(
-                sub_suite.get("name"),
-                uri=f"{base_url}/sub_suite?id={identifier}",
-                links={"CONTEXT": self.dataset.get("context")},
-            )
-            database.write(event.meta.event_id, identifier)
-            database.writer.hset(
-                f"SubSuite:{identifier}", "EventID", event.meta.event_id
-            )
-            database.writer.hset(
-                f"SubSuite:{identifier}", "Suite", json.dumps(sub_suite)
+        # All events are created, and stored in the database, before they are published
+        # so that they can be published in a single burst.
+        event_batch = EventBatch()
+        with DatabaseBatch(self.sub_suite_store.database) as batch:
+            for sub_suite in test_suites.get("sub_suites", []):
+                # In a valid sub suite all of these keys must exist
+                # making this a safe assumption
+                identifier = sub_suite["executor"]["instructions"]["identifier"]
+                event = event_batch.events.send_environment_defined(
+                    sub_suite.get("name"),
+                    uri=f"{base_url}/sub_suite?id={identifier}",
+                    links={"CONTEXT": self.dataset.get("context")},
+                )
+                # The sub suite itself is already stored by the test suite.
+                self.sub_suite_store.write_event_id(
+                    batch, identifier, event.meta.event_id
+                )
+                self.resource_leases.transfer(
+                    batch, identifier, (resources or {}).get(identifier, [])
+                )
+        event_batch.publish(self.etos.publisher)
+        self.published_events.extend(event_batch.published)
+
+    def confirm_events(self):
+        """Wait for all published events to be confirmed by the message bus.
+
+        If not all events are confirmed in time, the publisher is restarted and the
+        events that were never confirmed are published again, from the copies kept
+        when they were published.
+
+        :raises TimeoutError: If the events are not confirmed after publishing again.
+        """
+        try:
+            self.etos.publisher.wait_for_unpublished_events()
+            return
+        except TimeoutError:
+            self.etos.publisher.stop()
+        event_batch = EventBatch()
+        event_batch.queue.extend(
+            unconfirmed_events(self.etos.publisher, self.published_events)
+        )
+        self.logger.warning(
+            "Not all events were confirmed, publishing %d events again",
+            len(event_batch.queue),
+        )
+        self.etos.start_publisher()
+        event_batch.publish(self.etos.publisher)
+        self.etos.publisher.wait_for_unpublished_events()
+
+    def confirm_events_and_stop_publisher(self):
+        """Confirm all published events, see :meth:`confirm_events`, and stop the publisher.
+
+        Used to confirm the events after the environment has been returned, when
+        'ASYNC_EVENT_CONFIRMS' is set.
+        """
+        FORMAT_CONFIG.identifier = self.suite_id
+        try:
+            self.confirm_events()
+        except TimeoutError:
+            self.logger.exception("Not all environment defined events were published")
+        finally:
+            self.etos.publisher.stop()
+
+    def copy_for_test_suite(self):
+        """Copy the environment provider so that a test suite can be provisioned in isolation.
+
+        The copy gets its own ETOS configuration, dataset, provider registry and providers
+        but shares the event publisher and the event data with this environment provider.
+
+        :return: A copy of this environment provider.
+        :rtype: :obj:`EnvironmentProvider`
+        """
+        environment_provider = copy(self)
+        environment_provider.etos = ETOS(
+            "ETOS Environment Provider", os.getenv("HOSTNAME"), "Environment Provider"
+        )
+        environment_provider.etos.publisher = self.etos.publisher
+        with self.lock:
+            environment_provider.etos.config.config = dict(self.etos.config.config)
+            environment_provider.reset()
+        environment_provider.splitter = Splitter(environment_provider.etos, {})
+        return environment_provider
+
+    def provision_test_suite(
+        self, test_suite_name, test_runners, dataset, suite_runner_id
+    ):
+        """Checkout IUTs, execution spaces and log areas for a test suite and split its tests.
+
+        :param test_suite_name: Name of the test suite to provision.
+        :type test_suite_name: str
+        :param test_runners: Dictionary with test_runners as keys.
+        :type test_runners: dict
+        :param dataset: Dataset to use for this test suite.
+        :type dataset: dict
+        :param suite_runner_id: Correlation ID for the suite runner.
+        :type suite_runner_id: str
+        :return: Test suite JSON with assigned IUTs, execution spaces and log areas.
+        :rtype: dict
+        """
+        FORMAT_CONFIG.identifier = self.suite_id
+        self.new_dataset(dataset)
+
+        self.set_total_test_count_and_test_runners(test_runners)
+        self.logger.info(
+            "Total test count : %r", self.etos.config.get("TOTAL_TEST_COUNT")
+        )
+        self.logger.info(
+            "Total testrunners: %r",
+            self.etos.config.get("NUMBER_OF_TESTRUNNERS"),
+        )
+
+        if self.etos.config.get("SPLIT_STRATEGY") == "lpt":
+            self.splitter.durations = self.expected_durations(test_runners)
+        if self.etos.config.get("PIPELINED_CHECKOUT"):
+            self.checkout_and_assign_pipelined(test_runners)
+        elif self.etos.config.get("CONCURRENT_EXECUTION_SPACE_CHECKOUT"):
+            self.checkout_and_assign_iuts_to_test_runners(test_runners)
+            self.checkout_and_assign_executors_to_test_runners(test_runners)
+        else:
+            self.checkout_and_assign_iuts_to_test_runners(test_runners)
+            for test_runner, values in test_runners.items():
+                self.checkout_and_assign_executors_to_iuts(test_runner, values["iuts"])
+        for values in test_runners.values():
+            for iut in self.checkin_iuts_without_executors(values["iuts"]):
+                values["iuts"].pop(iut)
+
+        for sub_suite in test_runners.values():
+            self.splitter.split(sub_suite)
+
+        test_suite = TestSuite(
+            test_suite_name,
+            test_runners,
+            self.environment_provider_config,
+            self.sub_suite_store,
+        )
+        # This is where the resulting test suite is generated.
+        # The resulting test suite will be a dictionary with test runners, IUTs
+        # execution spaces and log areas with tests split up over as many as
+        # possible. The resulting test suite definition is further explained in
+        # :obj:`environment_provider.lib.test_suite.TestSuite`
+        test_suite.generate(suite_runner_id)
+        test_suite_json = test_suite.to_json()
+
+        # Test that the test suite JSON is serializable so that the
+        # exception is caught here and not by the webserver.
+        # This makes sure that we can cleanup if anything breaks.
+        self.verify_json(test_suite_json)
+
+        self.send_environment_events(test_suite_json, test_suite.resources)
+        return test_suite_json
+
+    def provision_test_suites_in_parallel(self, test_suites):
+        """Provision test suites in parallel, each with its own copy of the environment provider.
+
+        :param test_suites: Arguments to :meth:`provision_test_suite` for each test suite.
+        :type test_suites: list
+        :return: Test suite JSONs in the same order as the test suites.
+        :rtype: list
+        """
+        thread_pool = ThreadPool(
+            processes=min(
+                self.etos.config.get("PARALLEL_TEST_SUITES"), len(test_suites)
             )
+        )
+        environment_providers = []
+        results = []
+        try:
+            for test_suite in test_suites:
+                environment_provider = self.copy_for_test_suite()
+                environment_providers.append(environment_provider)
+                results.append(
+                    thread_pool.apply_async(
+                        environment_provider.provision_test_suite, args=test_suite
+                    )
+                )
+        finally:
+            # Wait for all test suites to finish, even if one of them failed, so that
+            # 'cleanup' is able to check in everything that has been checked out.
+            thread_pool.close()
+            thread_pool.join()
+            for environment_provider in environment_providers:
+                self.etos.config.get("PROVIDERS").extend(
+                    environment_provider.etos.config.get("PROVIDERS")
+                )
+        return [result.get() for result in results]
 
     def run(self):
         """Run the environment provider task.
@@ -384,7 +931,7 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
         :return: Test suite JSON with assigned IUTs, execution spaces and log areas.
         :rtype: dict
         """
-        suites = []
+        confirms = None
         try:
             self.configure(self.suite_id)
             test_suites = self.create_test_suite_dict()
@@ -396,57 +943,40 @@ class EnvironmentProvider:  # pylint:disable=too-many-instance-attributes
                 ), "If multiple datasets are provided it must correspond with number of test suites"
             else:
                 datasets = [datasets] * len(test_suites)
-            for test_suite_name, test_runners in test_suites.items():
-                dataset = datasets.pop(0)
-                self.new_dataset(dataset)
-
-                self.set_total_test_count_and_test_runners(test_runners)
-                self.logger.info(
-                    "Total test count : %r", self.etos.config.get("TOTAL_TEST_COUNT")
+            test_suites = [
+                (
+                    test_suite_name,
+                    test_runners,
+                    datasets.pop(0),
+                    self.suite_runner_ids.pop(0),
                 )
-                self.logger.info(
-                    "Total testrunners: %r",
-                    self.etos.config.get("NUMBER_OF_TESTRUNNERS"),
-                )
-
-                self.checkout_and_assign_iuts_to_test_runners(test_runners)
-                for test_runner, values in test_runners.items():
-                    self.checkout_and_assign_executors_to_iuts(
-                        test_runner, values["iuts"]
-                    )
-                    for iut in self.checkin_iuts_without_executors(values["iuts"]):
-                        values["iuts"].remove(iut)
-
-                for sub_suite in test_runners.values():
-                    self.splitter.split(sub_suite)
-
-                test_suite = TestSuite(
-                    test_suite_name, test_runners, self.environment_provider_config
-                )
-                # This is where the resulting test suite is generated.
-                # The resulting test suite will be a dictionary with test runners, IUTs
-                # execution spaces and log areas with tests split up over as many as
-                # possible. The resulting test suite definition is further explained in
-                # :obj:`environment_provider.lib.test_suite.TestSuite`
-                test_suite.generate(self.suite_runner_ids.pop(0))
-                test_suite_json = test_suite.to_json()
-
-                # Test that the test suite JSON is serializable so that the
-                # exception is caught here and not by the webserver.
-                # This makes sure that we can cleanup if anything breaks.
-                self.verify_json(test_suite_json)
-
-                self.send_environment_events(test_suite_json)
-
-                suites.append(test_suite_json)
+                for test_suite_name, test_runners in test_suites.items()
+            ]
+            parallel_test_suites = self.etos.config.get("PARALLEL_TEST_SUITES")
+            if parallel_test_suites > 1 and len(test_suites) > 1:
+                suites = self.provision_test_suites_in_parallel(test_suites)
+            else:
+                suites = [
+                    self.provision_test_suite(*test_suite) for test_suite in test_suites
+                ]
+            # Events are published without waiting for each confirm, so that the
+            # confirms of all test suites are waited for at once.
+            if self.etos.config.get("ASYNC_EVENT_CONFIRMS"):
+                confirms = Thread(target=self.confirm_events_and_stop_publisher)
+            else:
+                self.confirm_events()
             return {"suites": suites, "error": None}
         except Exception as exception:  # pylint:disable=broad-except
             self.cleanup()
             traceback.print_exc()
             return {"error": str(exception), "details": traceback.format_exc()}
         finally:
-            if self.etos.publisher is not None:
-                self.etos.publisher.wait_for_unpublished_events()
+            # Resources that are not in a sub suite are checked in by now.
+            self.resource_leases.release()
+            if confirms is not None:
+                # Return the environment without waiting for the confirms.
+                confirms.start()
+            elif self.etos.publisher is not None:
                 self.etos.publisher.stop()
 
 
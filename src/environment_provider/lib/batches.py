@@ -0,0 +1,247 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider streaming test batches parser."""
+import re
+import json
+import codecs
+
+WHITESPACE = " \t\n\r"
+# Characters that change the nesting of a JSON value, outside and inside of strings.
+STRUCTURE = re.compile(r'["\[\]{}]')
+STRING = re.compile(r'["\\]')
+# Characters that end a number, boolean or null.
+SCALAR_END = re.compile(r"[\s,:\]}]")
+
+
+class BatchesStream:
+    """Incremental JSON reader for a test batches document.
+
+    Only the JSON value currently being parsed is kept in memory, together with the
+    unparsed part of the latest chunk, instead of the whole document text.
+    """
+
+    def __init__(self, chunks):
+        """Initialize with the chunks of the batches document.
+
+        :param chunks: Chunks of a batches document, as bytes or str.
+        :type chunks: iterable
+        """
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self):
+        """Read the next chunk into the buffer, dropping already parsed data.
+
+        :return: Whether or not there was more data to read.
+        :rtype: bool
+        """
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self.utf8.decode(chunk)
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character in the document.
+
+        :return: Next non-whitespace character.
+        :rtype: str
+        """
+        while True:
+            while (
+                self.position < len(self.buffer)
+                and self.buffer[self.position] in WHITESPACE
+            ):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read():
+                raise ValueError("Unexpected end of test batches document.")
+
+    def expect(self, character):
+        """Consume the next character in the document, which must be 'character'.
+
+        :param character: Character to expect.
+        :type character: str
+        """
+        found = self.peek()
+        if found != character:
+            raise ValueError(
+                f"Expected {character!r} in test batches document, got {found!r}."
+            )
+        self.position += 1
+
+    def scan(self):
+        """Find the end of the next JSON value in the document, reading chunks as needed.
+
+        Every character is scanned once, keeping track of strings and nesting between
+        chunks, so that the value is decoded only when all of it has been read.
+
+        :return: Position in the buffer just after the value.
+        :rtype: int
+        """
+        scalar = self.peek() not in '"[{'
+        depth = 0
+        in_string = False
+        scanned = self.position
+        while True:
+            if scalar:
+                match = SCALAR_END.search(self.buffer, scanned)
+            else:
+                match = (STRING if in_string else STRUCTURE).search(
+                    self.buffer, scanned
+                )
+            if match is None:
+                scanned = max(scanned, len(self.buffer)) - self.position
+                if not self.read():
+                    if scalar:
+                        return len(self.buffer)
+                    raise ValueError("Unexpected end of test batches document.")
+                scanned += self.position
+                continue
+            if scalar:
+                return match.start()
+            character = match.group()
+            scanned = match.end()
+            if character == "\\":
+                # Skip the escaped character, which may be in the next chunk.
+                scanned += 1
+            elif character == '"':
+                in_string = not in_string
+            elif character in "[{":
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0 and not in_string:
+                return scanned
+
+    def value(self):
+        """Decode the next JSON value in the document.
+
+        :return: Decoded JSON value.
+        :rtype: any
+        """
+        end = self.scan()
+        value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+        if self.position != end:
+            raise ValueError("Invalid JSON value in test batches document.")
+        return value
+
+    def items(self, close):
+        """Iterate over the items of a JSON array or object that is already opened.
+
+        The item itself shall be consumed by the caller for each iteration.
+
+        :param close: Character that closes the array or object.
+        :type close: str
+        """
+        if self.peek() == close:
+            self.position += 1
+            return
+        while True:
+            yield
+            found = self.peek()
+            self.position += 1
+            if found == close:
+                return
+            if found != ",":
+                raise ValueError(
+                    f"Expected ',' or {close!r} in test batches document, got {found!r}."
+                )
+
+
+def stream_recipes(chunks):
+    """Parse a test batches document incrementally and yield its recipes.
+
+    Each recipe is yielded as soon as it has been parsed, together with the test
+    suite it belongs to, without its 'recipes'. All recipes of a test suite are
+    yielded with the same test suite dictionary, which is updated as the test suite
+    is parsed. Keys such as 'name' and 'priority' may come after 'recipes' in the
+    document and are only set in it when the whole test suite has been parsed.
+
+    :param chunks: Chunks of a batches document, as bytes or str.
+    :type chunks: iterable
+    :return: Generator of test suite and recipe tuples.
+    :rtype: generator
+    """
+    stream = BatchesStream(chunks)
+    stream.expect("[")
+    for _ in stream.items("]"):
+        test_suite = {}
+        stream.expect("{")
+        for _ in stream.items("}"):
+            key = stream.value()
+            stream.expect(":")
+            if key != "recipes":
+                test_suite[key] = stream.value()
+                continue
+            stream.expect("[")
+            for _ in stream.items("]"):
+                yield test_suite, stream.value()
+
+
+def get_constraint(recipe, key):
+    """Get a constraint key from an ETOS recipe.
+
+    :param recipe: Recipe to get key from.
+    :type recipe: dict
+    :param key: Key to get value from, from the constraints.
+    :type key: str
+    :return: Constraint value.
+    :rtype: any
+    """
+    for constraint in recipe.get("constraints", []):
+        if constraint.get("key") == key:
+            return constraint.get("value")
+    return None
+
+
+def group_by_test_runner(recipes):
+    """Group recipes by test suite name and test runner, as they arrive.
+
+    The name and priority of a streamed test suite may only be known when all of its
+    recipes have been parsed, so recipes are grouped by test suite dictionary first.
+
+    :param recipes: Test suite and recipe tuples, see :func:`stream_recipes`.
+    :type recipes: iterable
+    :return: Test runners, with their recipes, by test suite name.
+    :rtype: dict
+    """
+    grouped = []
+    for test_suite, recipe in recipes:
+        if not grouped or grouped[-1][0] is not test_suite:
+            grouped.append((test_suite, {}))
+        test_runner = get_constraint(recipe, "TEST_RUNNER")
+        grouped[-1][1].setdefault(test_runner, []).append(recipe)
+    test_suites = {}
+    for test_suite, test_runner_recipes in grouped:
+        test_runners = test_suites.setdefault(test_suite.get("name"), {})
+        for test_runner, unsplit_recipes in test_runner_recipes.items():
+            test_runners.setdefault(
+                test_runner,
+                {
+                    "docker": test_runner,
+                    "priority": test_suite.get("priority"),
+                    "unsplit_recipes": [],
+                },
+            )["unsplit_recipes"].extend(unsplit_recipes)
+    return test_suites
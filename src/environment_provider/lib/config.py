@@ -17,11 +17,16 @@
 import os
 import time
 import logging
+from contextlib import closing
+from multiprocessing.pool import ThreadPool
 from packageurl import PackageURL
+from etos_lib.logging.logger import FORMAT_CONFIG
+from .batches import stream_recipes
 from .graphql import (
     request_tercc,
     request_activity_triggered,
     request_artifact_published,
+    request_tercc_and_activity_triggered,
 )
 
 
@@ -34,17 +39,21 @@ class Config:  # pylint:disable=too-many-instance-attributes
     artifact_created = None
     artifact_published = None
     activity_triggered = None
+    artifact_published_requested = False
     tercc = None
 
-    def __init__(self, etos, tercc_id):
+    def __init__(self, etos, tercc_id, event_cache=None):
         """Initialize with ETOS library and automatically load the config.
 
         :param etos: ETOS library instance.
         :type etos: :obj:`etos_lib.etos.Etos`
         :param tercc_id: ID of test execution recipe.
         :type tercc_id: str
+        :param event_cache: Optional cache for event lookups.
+        :type event_cache: :obj:`environment_provider.lib.event_cache.EventCache`
         """
         self.etos = etos
+        self.event_cache = event_cache
         self.load_config()
         self.tercc_id = tercc_id
         self.__generate()
@@ -124,43 +133,167 @@ class Config:  # pylint:disable=too-many-instance-attributes
         except AssertionError:
             return False
 
+    def __parse_tercc(self, response):
+        """Parse test execution recipe collection created and artifact created from response.
+
+        :param response: Response from graphql.
+        :type response: dict
+        """
+        node = response["testExecutionRecipeCollectionCreated"]["edges"][0]["node"]
+        node = node.copy()
+        node.pop("links")
+        _, artifact_created = self.__get_node(response, "ArtifactCreated", "links")
+        self.tercc = node
+        self.artifact_created = artifact_created
+
+    def __parse_activity_triggered(self, response):
+        """Parse activity triggered from response.
+
+        :param response: Response from graphql.
+        :type response: dict
+        """
+        self.activity_triggered = response["activityTriggered"]["edges"][0]["node"]
+
+    def __parse_artifact_published(self, response):
+        """Parse artifact published from response.
+
+        :param response: Response from graphql.
+        :type response: dict
+        """
+        # ArtifactPublished is not required and can be None.
+        self.artifact_published_requested = True
+        if response:
+            self.artifact_published = response["artifactPublished"]["edges"][0]["node"]
+
+    def __missing_requests(self):
+        """Get the graphql requests required for the event data that is still missing.
+
+        The test execution recipe collection created and the activity triggered are
+        requested with a single query if both are missing. Artifact published can only be
+        requested when the artifact created is known.
+
+        :return: Request functions, their argument and the parsers for their responses.
+        :rtype: list
+        """
+        requests = []
+        if self.tercc is None and self.activity_triggered is None:
+            requests.append(
+                (
+                    request_tercc_and_activity_triggered,
+                    self.tercc_id,
+                    (self.__parse_tercc, self.__parse_activity_triggered),
+                )
+            )
+        elif self.tercc is None:
+            requests.append((request_tercc, self.tercc_id, (self.__parse_tercc,)))
+        elif self.activity_triggered is None:
+            requests.append(
+                (
+                    request_activity_triggered,
+                    self.tercc_id,
+                    (self.__parse_activity_triggered,),
+                )
+            )
+        if self.artifact_created is not None and not self.artifact_published_requested:
+            requests.append(
+                (
+                    self.__request_artifact_published,
+                    self.artifact_id,
+                    (self.__parse_artifact_published,),
+                )
+            )
+        return requests
+
+    def __request_artifact_published(self, etos, artifact_id):
+        """Request an artifact published event from the event cache or from graphql.
+
+        Only responses with an artifact published are stored in the cache since an
+        artifact published event may be sent after the environment was requested.
+
+        :param etos: ETOS library instance.
+        :type etos: :obj:`etos_lib.etos.Etos`
+        :param artifact_id: ID of artifact created the artifact published links to.
+        :type artifact_id: str
+        :return: Response from the event cache, graphql or None
+        :rtype: dict or None
+        """
+        if self.event_cache is not None:
+            response = self.event_cache.get("ArtifactPublished", artifact_id)
+            if response is not None:
+                return response
+        response = request_artifact_published(etos, artifact_id)
+        if (
+            self.event_cache is not None
+            and response
+            and response["artifactPublished"]["edges"]
+        ):
+            self.event_cache.set("ArtifactPublished", artifact_id, response)
+        return response
+
+    def __request(self, method, identifier):
+        """Send a request to graphql. Executed in a thread.
+
+        :param method: Request function from the graphql module.
+        :type method: function
+        :param identifier: ID to request events for.
+        :type identifier: str
+        :return: Response from graphql or None
+        :rtype: dict or None
+        """
+        FORMAT_CONFIG.identifier = self.tercc_id
+        return method(self.etos, identifier)
+
+    def __fetch(self, requests):
+        """Send graphql requests concurrently and parse their responses.
+
+        Event data that was fetched by a previous call is kept, so that a failing
+        request does not require the other requests to be sent again.
+
+        :param requests: Requests from :meth:`__missing_requests`.
+        :type requests: list
+        """
+        thread_pool = ThreadPool(processes=len(requests))
+        try:
+            results = [
+                (
+                    thread_pool.apply_async(self.__request, args=(method, identifier)),
+                    parsers,
+                )
+                for method, identifier, parsers in requests
+            ]
+            for result, parsers in results:
+                try:
+                    response = result.get()
+                except Exception:  # pylint:disable=broad-except
+                    self.logger.exception("Failed to request event data.")
+                    continue
+                for parser in parsers:
+                    try:
+                        parser(response)
+                    except (KeyError, IndexError, TypeError):
+                        pass
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
     def __generate(self):
         """Generate the event data required for the environment provider."""
         if self.generated is False:
             self.logger.info("Generate event data from event storage.")
             timeout = time.time() + self.etos.config.get("EVENT_DATA_TIMEOUT")
-            while not self._validate_event_data():
+            requests = self.__missing_requests()
+            while requests:
                 self.logger.info("Waiting for event data.")
                 if time.time() > timeout:
                     self.logger.error("Timeout reached. Exiting.")
                     return None
-
-                try:
-                    response = request_tercc(self.etos, self.tercc_id)
-                    node = response["testExecutionRecipeCollectionCreated"]["edges"][0][
-                        "node"
-                    ]
-                    node = node.copy()
-                    node.pop("links")
-                    self.tercc = node
-                    _, self.artifact_created = self.__get_node(
-                        response, "ArtifactCreated", "links"
-                    )
-
-                    response = request_activity_triggered(self.etos, self.tercc_id)
-                    self.activity_triggered = response["activityTriggered"]["edges"][0][
-                        "node"
-                    ]
-
-                    response = request_artifact_published(self.etos, self.artifact_id)
-                    # ArtifactPublished is not required and can be None.
-                    if response:
-                        self.artifact_published = response["artifactPublished"][
-                            "edges"
-                        ][0]["node"]
-                except:  # noqa, pylint:disable=bare-except
-                    pass
-                time.sleep(1)
+                self.__fetch(requests)
+                missing_requests = self.__missing_requests()
+                # Only wait if no new event data was found, otherwise the requests
+                # that depend on the new event data can be sent immediately.
+                if missing_requests == requests:
+                    time.sleep(1)
+                requests = missing_requests
             self.generated = True
         return None
 
@@ -237,3 +370,32 @@ class Config:  # pylint:disable=too-many-instance-attributes
             except AttributeError:
                 pass
         return self.__test_suite if self.__test_suite else []
+
+    def stream_test_suite(self):
+        """Download test batches and parse them while they are being downloaded.
+
+        Recipes are yielded as soon as they have been parsed, so that neither the text
+        of the whole batches document nor all of its recipes have to be kept in memory.
+        The response is closed when the generator is exhausted or closed.
+
+        :return: Generator of test suite and recipe tuples.
+        :rtype: generator
+        """
+        batch_uri = self.tercc.get("data", {}).get("batchesUri")
+        json_header = {"Accept": "application/json"}
+        responses = self.etos.http.wait_for_request(
+            batch_uri,
+            timeout=self.etos.config.get("TEST_SUITE_TIMEOUT"),
+            as_json=False,
+            stream=True,
+            headers=json_header,
+        )
+        with closing(responses):
+            for response in responses:
+                with closing(response):
+                    yield from stream_recipes(
+                        response.iter_content(
+                            chunk_size=self.etos.config.get("TEST_SUITE_CHUNK_SIZE")
+                        )
+                    )
+                break
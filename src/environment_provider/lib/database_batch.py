@@ -0,0 +1,114 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider batched database writes."""
+
+
+class DatabaseBatch:
+    """Batch writes to the ETOS database so that they are sent in a single round trip.
+
+    Writes are queued in a pipeline and sent when the context manager exits, also if
+    an exception was raised, so that everything written before the exception is stored::
+
+        with DatabaseBatch(database) as batch:
+            batch.write("key", "value")
+            batch.hset("hash", {"field": "value", "other_field": "value"})
+    """
+
+    def __init__(self, database):
+        """Initialize with ETOS database.
+
+        :param database: ETOS database to write to. Its 'expire' is used by :meth:`write`.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        """
+        self.database = database
+        self.pipeline = None
+
+    def __enter__(self):
+        """Start a new batch."""
+        self.pipeline = self.database.writer.pipeline(transaction=False)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Send all queued writes to the database."""
+        self.pipeline.execute()
+        self.pipeline = None
+
+    def write(self, key, value, expire=None):
+        """Write a single key, with the expiry of the database, same as Database.write.
+
+        :param key: Key to write to.
+        :type key: str
+        :param value: Value to write.
+        :type value: any
+        :param expire: Seconds until the key expires. Default is the expiry of the database.
+        :type expire: int
+        """
+        if expire is None:
+            expire = self.database.expire
+        if expire is None:
+            self.pipeline.set(key, value)
+        else:
+            self.pipeline.set(key, value, ex=expire)
+
+    def hset(self, key, mapping):
+        """Set several fields of a hash.
+
+        :param key: Key of hash to write to.
+        :type key: str
+        :param mapping: Fields and values to write.
+        :type mapping: dict
+        """
+        self.pipeline.hset(key, mapping=mapping)
+
+    def hdel(self, key, *fields):
+        """Delete fields from a hash.
+
+        :param key: Key of hash to delete fields from.
+        :type key: str
+        :param fields: Fields to delete.
+        :type fields: str
+        """
+        self.pipeline.hdel(key, *fields)
+
+    def expire(self, key, seconds):
+        """Set expiry time of a key.
+
+        :param key: Key to set expiry time for.
+        :type key: str
+        :param seconds: Number of seconds until key expires.
+        :type seconds: int
+        """
+        self.pipeline.expire(key, seconds)
+
+    def zadd(self, key, mapping):
+        """Add members, with scores, to a sorted set.
+
+        :param key: Key of sorted set to add members to.
+        :type key: str
+        :param mapping: Members and their scores.
+        :type mapping: dict
+        """
+        self.pipeline.zadd(key, mapping)
+
+    def zrem(self, key, *members):
+        """Remove members from a sorted set.
+
+        :param key: Key of sorted set to remove members from.
+        :type key: str
+        :param members: Members to remove.
+        :type members: str
+        """
+        self.pipeline.zrem(key, *members)
@@ -0,0 +1,129 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider test case duration history module."""
+import logging
+
+from redis.exceptions import WatchError
+
+
+class DurationHistory:
+    """Rolling estimate of test case durations, per test runner.
+
+    Durations are stored in the ETOS database as one hash per test runner, with the
+    test case ID as field and the estimated duration, in seconds, as value.
+    Every reported duration moves the estimate towards it by 'weight', i.e. the
+    estimate is an exponentially weighted moving average.
+    The hash of a test runner expires 'ttl' seconds after its last update.
+    """
+
+    logger = logging.getLogger("DurationHistory")
+
+    def __init__(self, database, weight=0.3, ttl=2592000):
+        """Initialize with ETOS database, weight of new durations and TTL.
+
+        :param database: ETOS database to store durations in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param weight: Weight, between 0 and 1, of a new duration in the estimate.
+        :type weight: float
+        :param ttl: How long, in seconds, to keep the durations of a test runner
+                    after its last update.
+        :type ttl: int
+        """
+        self.database = database
+        self.weight = weight
+        self.ttl = ttl
+
+    @staticmethod
+    def key(test_runner):
+        """Database key for the durations of a test runner.
+
+        :param test_runner: Test runner to get key for.
+        :type test_runner: str
+        :return: Database key.
+        :rtype: str
+        """
+        return f"Durations:{test_runner}"
+
+    def durations(self, test_runners):
+        """Get estimated durations for test cases of several test runners.
+
+        All durations are fetched with a single request to the database.
+
+        :param test_runners: Test case IDs to get durations for, by test runner.
+        :type test_runners: dict
+        :return: Estimated durations, by test runner and test case ID. Test cases
+                 without an estimate, or without an ID, are not included.
+        :rtype: dict
+        """
+        test_runners = {
+            test_runner: [
+                test_case for test_case in test_cases if test_case is not None
+            ]
+            for test_runner, test_cases in test_runners.items()
+        }
+        test_runners = {
+            test_runner: test_cases
+            for test_runner, test_cases in test_runners.items()
+            if test_cases
+        }
+        pipeline = self.database.reader.pipeline(transaction=False)
+        for test_runner, test_cases in test_runners.items():
+            pipeline.hmget(self.key(test_runner), test_cases)
+        durations = {}
+        for (test_runner, test_cases), estimates in zip(
+            test_runners.items(), pipeline.execute()
+        ):
+            durations[test_runner] = {
+                test_case: float(estimate)
+                for test_case, estimate in zip(test_cases, estimates)
+                if estimate is not None
+            }
+        return durations
+
+    def update(self, test_runner, durations):
+        """Update the duration estimates of test cases executed by a test runner.
+
+        :param test_runner: Test runner that executed the test cases.
+        :type test_runner: str
+        :param durations: Durations, in seconds, by test case ID.
+        :type durations: dict
+        """
+        if not durations:
+            return
+        key = self.key(test_runner)
+        test_cases = list(durations)
+        with self.database.writer.pipeline() as pipeline:
+            while True:
+                try:
+                    # Estimates that change before the update is written are read
+                    # again, so that concurrent updates are not lost.
+                    pipeline.watch(key)
+                    estimates = pipeline.hmget(key, test_cases)
+                    pipeline.multi()
+                    for test_case, estimate in zip(test_cases, estimates):
+                        duration = float(durations[test_case])
+                        if estimate is not None:
+                            estimate = float(estimate)
+                            duration = estimate + self.weight * (duration - estimate)
+                        pipeline.hset(key, test_case, duration)
+                    pipeline.expire(key, self.ttl)
+                    pipeline.execute()
+                    break
+                except WatchError:
+                    self.logger.debug("Durations for %r changed, retrying", test_runner)
+        self.logger.debug(
+            "Updated duration of %d test cases for %r", len(test_cases), test_runner
+        )
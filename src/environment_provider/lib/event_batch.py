@@ -0,0 +1,93 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider batched event publishing."""
+import logging
+from etos_lib.lib.events import Events
+
+
+class EventBatch:
+    """Collect events so that they can be published in a single burst.
+
+    Events are created with the ETOS library event helpers, but instead of being
+    published one by one they are collected until :meth:`publish` is called::
+
+        batch = EventBatch()
+        event = batch.events.send_environment_defined("name", uri="http://uri")
+        batch.publish(etos.publisher)
+    """
+
+    logger = logging.getLogger("EventBatch")
+
+    def __init__(self):
+        """Initialize an empty batch."""
+        self.queue = []
+        self.published = []
+        self.events = Events(self)
+
+    def send_event(self, event, block=True):  # pylint:disable=unused-argument
+        """Collect an event instead of publishing it. Called by the event helpers.
+
+        :param event: Event to collect.
+        :type event: :obj:`eiffellib.events.eiffel_base_event.EiffelBaseEvent`
+        :param block: Unused, kept for compatibility with the publisher.
+        :type block: bool
+        """
+        self.queue.append(event)
+
+    def publish(self, publisher):
+        """Publish all collected events in a single burst.
+
+        Publisher confirms are handled asynchronously by the publisher, which will
+        also resend events that could not be published.
+        Use 'wait_for_unpublished_events' on the publisher to wait for them.
+        The published events are kept in 'published', so that they can be published
+        again if they are never confirmed.
+
+        :param publisher: Publisher to publish events with.
+        :type publisher: :obj:`eiffellib.publishers.RabbitMQPublisher`
+        """
+        if not self.queue:
+            return
+        publisher.wait_start()
+        self.logger.info("Publishing %d events", len(self.queue))
+        for event in self.queue:
+            publisher.send_event(event, block=False)
+        self.published.extend(self.queue)
+        self.queue.clear()
+
+
+def unconfirmed_events(publisher, events):
+    """Get the events that a stopped publisher never got publisher confirms for.
+
+    The RabbitMQ publisher keeps the events that are waiting for a confirm, and the
+    events that were not acknowledged, until they are confirmed. Publishers that do
+    not keep track of their confirms are assumed to not have confirmed any event.
+    The publisher shall be stopped, so that the events are not changed while read.
+
+    :param publisher: Stopped publisher that the events were published with.
+    :type publisher: :obj:`eiffellib.publishers.RabbitMQPublisher`
+    :param events: Events that were published.
+    :type events: list
+    :return: The events that are not confirmed, in the order they were published.
+    :rtype: list
+    """
+    # pylint:disable=protected-access
+    if not hasattr(publisher, "_deliveries"):
+        return list(events)
+    pending = list(publisher._deliveries.values())
+    pending += getattr(publisher, "_nacked_deliveries", [])
+    pending_ids = {event.meta.event_id for event in pending}
+    return [event for event in events if event.meta.event_id in pending_ids]
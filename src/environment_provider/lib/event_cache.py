@@ -0,0 +1,122 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider event cache module."""
+import json
+import time
+import logging
+
+
+class EventCache:
+    """Cache for event lookups, shared between all environment provider workers.
+
+    Events are stored in the ETOS database keyed by event type and event ID and expire
+    after 'ttl' seconds. An index of all cached events is kept so that the oldest events
+    can be removed when there are more than 'max_size' events in the cache.
+    """
+
+    logger = logging.getLogger("EventCache")
+    index = "EventCache:Index"
+    statistics_key = "EventCache:Statistics"
+
+    def __init__(self, database, ttl=3600, max_size=10000):
+        """Initialize with ETOS database, TTL and max size.
+
+        :param database: ETOS database to store events in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param ttl: How long, in seconds, to keep events in the cache.
+        :type ttl: int
+        :param max_size: Maximum number of events to keep in the cache.
+        :type max_size: int
+        """
+        self.database = database
+        self.ttl = ttl
+        self.max_size = max_size
+
+    @staticmethod
+    def key(event_type, event_id):
+        """Database key for an event.
+
+        :param event_type: Type of the cached event.
+        :type event_type: str
+        :param event_id: ID that the event was looked up with.
+        :type event_id: str
+        :return: Database key.
+        :rtype: str
+        """
+        return f"EventCache:{event_type}:{event_id}"
+
+    def get(self, event_type, event_id):
+        """Get an event from the cache.
+
+        The lookup is counted in the same round trip as the event is read. A miss is
+        counted separately, since it is followed by a much slower event request anyway.
+
+        :param event_type: Type of the cached event.
+        :type event_type: str
+        :param event_id: ID that the event was looked up with.
+        :type event_id: str
+        :return: The cached event or None.
+        :rtype: dict or None
+        """
+        pipeline = self.database.writer.pipeline(transaction=False)
+        pipeline.get(self.key(event_type, event_id))
+        pipeline.hincrby(self.statistics_key, "lookups", 1)
+        event, _ = pipeline.execute()
+        if event is None:
+            self.logger.debug("Cache miss for %s %r", event_type, event_id)
+            self.database.writer.hincrby(self.statistics_key, "misses", 1)
+            return None
+        self.logger.debug("Cache hit for %s %r", event_type, event_id)
+        return json.loads(event)
+
+    def set(self, event_type, event_id, event):
+        """Store an event in the cache.
+
+        The event is stored, and expired and excess events are removed from the index,
+        in a single transaction so that every evicted event is only removed by one
+        worker. The evicted events themselves are deleted afterwards, if there are any.
+
+        :param event_type: Type of the event to cache.
+        :type event_type: str
+        :param event_id: ID that the event was looked up with.
+        :type event_id: str
+        :param event: Event to cache.
+        :type event: dict
+        """
+        key = self.key(event_type, event_id)
+        now = time.time()
+        pipeline = self.database.writer.pipeline(transaction=True)
+        pipeline.set(key, json.dumps(event), ex=self.ttl)
+        pipeline.zadd(self.index, {key: now})
+        pipeline.zremrangebyscore(self.index, "-inf", now - self.ttl)
+        # All but the 'max_size' newest events.
+        pipeline.zrange(self.index, 0, -self.max_size - 1)
+        pipeline.zremrangebyrank(self.index, 0, -self.max_size - 1)
+        evicted = pipeline.execute()[3]
+        if evicted:
+            self.logger.debug("Evicting %d events from the cache", len(evicted))
+            self.database.writer.delete(*evicted)
+
+    def statistics(self):
+        """Get the hit and miss counters of the cache.
+
+        :return: Number of cache hits and misses.
+        :rtype: dict
+        """
+        statistics = self.database.reader.hgetall(self.statistics_key)
+        lookups = int(statistics.get(b"lookups", 0))
+        misses = int(statistics.get(b"misses", 0))
+        return {"hits": lookups - misses, "misses": misses}
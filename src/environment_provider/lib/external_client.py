@@ -0,0 +1,155 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider asynchronous external provider client module."""
+import time
+import asyncio
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from provider_http import poll_delays
+
+
+class ExternalProviderClient:
+    """Client driving checkouts from many external providers on one event loop.
+
+    A checkout is a conversation of a start request, status requests until the
+    provider is done and, on failure, a stop request. Waiting between status requests
+    is done on the event loop, so any number of conversations can be in flight at
+    once. Only the HTTP requests themselves are sent from a thread pool, bounded by
+    'max_requests', through the pooled sessions of the external providers.
+
+    Usable from synchronous code with :meth:`checkout_all`.
+    """
+
+    logger = logging.getLogger("ExternalProviderClient")
+
+    def __init__(self, max_requests=10):
+        """Initialize with the maximum number of HTTP requests in flight.
+
+        :param max_requests: Maximum number of HTTP requests to send at once.
+        :type max_requests: int
+        """
+        self.max_requests = max_requests
+
+    async def request(self, executor, method, *args):
+        """Run a blocking provider method, sending an HTTP request, in the thread pool.
+
+        :param executor: Thread pool to run the method in.
+        :type executor: :obj:`concurrent.futures.ThreadPoolExecutor`
+        :param method: Provider method to run.
+        :type method: function
+        :return: The return value of the method.
+        :rtype: any
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(method, *args))
+
+    async def wait(self, executor, provider, provider_id):
+        """Wait for an external provider to finish its request.
+
+        :param executor: Thread pool to send the status requests from.
+        :type executor: :obj:`concurrent.futures.ThreadPoolExecutor`
+        :param provider: External provider to wait for.
+        :type provider: :obj:`iut_provider.utilities.external_provider.ExternalProvider`
+        :param provider_id: The ID of the external provider request.
+        :type provider_id: str
+        :return: The response from the external provider.
+        :rtype: dict
+        """
+        deadline = time.time() + provider.wait_timeout
+        delays = poll_delays()
+        polled = time.time()
+        while time.time() < deadline:
+            # Time spent waiting for the previous poll counts towards the delay.
+            await asyncio.sleep(max(0, next(delays) - (time.time() - polled)))
+            polled = time.time()
+            try:
+                response = await self.request(
+                    executor, provider.status, provider_id, deadline
+                )
+            except (ConnectionError, requests.exceptions.Timeout):
+                self.logger.error(
+                    "Error connecting to external provider %r", provider.id
+                )
+                continue
+            if response.get("status") == "DONE":
+                return response
+        raise TimeoutError(f"Status request timed out after {provider.wait_timeout}s")
+
+    async def checkout(
+        self, executor, provider, minimum_amount, maximum_amount, *args
+    ):  # pylint:disable=too-many-arguments
+        """Check out resources from an external provider.
+
+        :param executor: Thread pool to send the HTTP requests from.
+        :type executor: :obj:`concurrent.futures.ThreadPoolExecutor`
+        :param provider: External provider to check out from.
+        :type provider: :obj:`iut_provider.utilities.external_provider.ExternalProvider`
+        :param minimum_amount: Minimum amount of resources to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of resources to checkout.
+        :type maximum_amount: int
+        :param args: Additional start and checkout arguments, such as log area
+                     contexts.
+        :type args: list
+        :return: List of checked out resources.
+        :rtype: list
+        """
+        try:
+            provider_id = await self.request(
+                executor, provider.start, minimum_amount, maximum_amount, *args
+            )
+            response = await self.wait(executor, provider, provider_id)
+            return await self.request(
+                executor,
+                provider.checkout_response,
+                response,
+                minimum_amount,
+                maximum_amount,
+                *args,
+            )
+        except:  # pylint:disable=bare-except
+            await self.request(executor, provider.checkin_all)
+            raise
+
+    async def gather(self, checkouts):
+        """Check out resources from several external providers at once.
+
+        :param checkouts: Provider, minimum amount, maximum amount and additional start
+                          arguments, for each checkout.
+        :type checkouts: list
+        :return: Checked out resources, or the exception raised, for each checkout.
+        :rtype: list
+        """
+        with ThreadPoolExecutor(max_workers=self.max_requests) as executor:
+            return await asyncio.gather(
+                *(self.checkout(executor, *checkout) for checkout in checkouts),
+                return_exceptions=True,
+            )
+
+    def checkout_all(self, checkouts):
+        """Check out resources from several external providers at once, synchronously.
+
+        :param checkouts: Provider, minimum amount, maximum amount and additional start
+                          arguments, for each checkout.
+        :type checkouts: list
+        :return: Checked out resources, or the exception raised, for each checkout.
+        :rtype: list
+        """
+        return asyncio.run(self.gather(checkouts))
@@ -81,6 +81,68 @@ def request_tercc(etos, suite_id):
     return None
 
 
+def request_tercc_and_activity_triggered(etos, suite_id):
+    """Request a test execution recipe collection created and an activity triggered event.
+
+    Both events are requested with a single query to graphql.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.etos.Etos`
+    :param suite_id: ID of execution recipe to request.
+    :type suite_id: str
+    :return: Response from graphql or None
+    :rtype: dict or None
+    """
+    query = """
+{
+  testExecutionRecipeCollectionCreated(search: "{'meta.id': '%s'}") {
+    edges {
+      node {
+        data {
+          batchesUri
+          customData {
+            key
+            value
+          }
+        }
+        meta {
+          id
+        }
+        links {
+          ... on Cause {
+            links {
+              __typename
+              ... on ArtifactCreated {
+                data {
+                  identity
+                }
+                meta {
+                  id
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+  activityTriggered(last: 1, search: "{'links.type': 'CAUSE', 'links.target': '%s'}") {
+    edges {
+      node {
+        meta {
+          id
+        }
+      }
+    }
+  }
+}
+    """
+    for response in request(etos, query % (suite_id, suite_id)):
+        if response:
+            return response
+    return None
+
+
 def request_activity_triggered(etos, suite_id):
     """Request an activiy triggered event from graphql.
 
@@ -0,0 +1,322 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider lease module."""
+import json
+import time
+import logging
+from uuid import uuid4
+from threading import Lock
+
+
+class LeaseStore:
+    """Leases on the IUTs, execution spaces and log areas of sub suites.
+
+    A lease is granted on each resource when it is checked out and is handed over to
+    the sub suite of the resource when the sub suite is stored. The lease on a sub
+    suite has to be renewed by whoever holds the sub suite, before it expires after
+    'ttl' seconds. Leases are members of a sorted set in the ETOS database, keyed by
+    the identifier of the sub suite, or of the resource lease, and scored by the time
+    they expire, so that expired leases can be found with a single range query.
+    Leased resources are stored, as partial sub suites, in the 'Lease:Resources' hash.
+
+    Expired leases are claimed by removing them from the sorted set, so that only one
+    worker reaps each lease even if several workers are reaping at once.
+    """
+
+    logger = logging.getLogger("LeaseStore")
+    index = "Lease:Index"
+    resources_key = "Lease:Resources"
+    reaper_key = "Lease:Reaper"
+
+    def __init__(self, database, ttl=300):
+        """Initialize with ETOS database and TTL.
+
+        :param database: ETOS database to store leases in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param ttl: How long, in seconds, a lease lasts unless it is renewed.
+        :type ttl: int
+        """
+        self.database = database
+        self.ttl = ttl
+
+    @staticmethod
+    def decode(identifier):
+        """Decode a sub suite identifier read from the database.
+
+        :param identifier: Identifier as stored in the database.
+        :type identifier: bytes or str
+        :return: Identifier.
+        :rtype: str
+        """
+        if isinstance(identifier, bytes):
+            return identifier.decode("utf-8")
+        return identifier
+
+    def grant(self, batch, *identifiers):
+        """Queue new leases, expiring after 'ttl' seconds, in a database batch.
+
+        :param batch: Database batch to write the leases in.
+        :type batch: :obj:`environment_provider.lib.database_batch.DatabaseBatch`
+        :param identifiers: Identifiers of the sub suites to lease.
+        :type identifiers: str
+        """
+        if not identifiers:
+            return
+        expires = time.time() + self.ttl
+        batch.zadd(self.index, {identifier: expires for identifier in identifiers})
+
+    def grant_resources(self, suite_id, resource_type, *resources):
+        """Grant leases on resources, as soon as they have been checked out.
+
+        The resources are not changed, so the caller has to keep track of the lease
+        ID of each resource to hand the lease over to its sub suite, see
+        :meth:`transfer`.
+
+        :param suite_id: ID of the suite that the resources are checked out for.
+        :type suite_id: str
+        :param resource_type: Type of the resources, 'iut', 'executor' or 'log_area'.
+        :type resource_type: str
+        :param resources: Checked out resources to lease.
+        :type resources: :obj:`iut_provider.iut.Iut` or
+                         :obj:`execution_space_provider.execution_space.ExecutionSpace`
+                         or :obj:`log_area_provider.log_area.LogArea`
+        :return: IDs of the granted leases, in the same order as the resources.
+        :rtype: list
+        """
+        if not resources:
+            return []
+        leased = {}
+        for resource in resources:
+            leased[f"Resource:{uuid4()}"] = json.dumps(
+                {"suite_id": suite_id, resource_type: resource.as_dict}
+            )
+        expires = time.time() + self.ttl
+        pipeline = self.database.writer.pipeline(transaction=False)
+        pipeline.hset(self.resources_key, mapping=leased)
+        pipeline.zadd(self.index, {lease_id: expires for lease_id in leased})
+        pipeline.execute()
+        return list(leased)
+
+    def transfer(self, batch, identifier, *lease_ids):
+        """Queue a lease on a sub suite, replacing the leases on its resources.
+
+        :param batch: Database batch to write the leases in.
+        :type batch: :obj:`environment_provider.lib.database_batch.DatabaseBatch`
+        :param identifier: Identifier of the sub suite to lease.
+        :type identifier: str
+        :param lease_ids: IDs of the leases on the resources of the sub suite.
+        :type lease_ids: str
+        """
+        self.grant(batch, identifier)
+        if lease_ids:
+            batch.zrem(self.index, *lease_ids)
+            batch.hdel(self.resources_key, *lease_ids)
+
+    def renew(self, *identifiers):
+        """Renew leases, for another 'ttl' seconds.
+
+        Only leases that are still in the index are renewed, with a single atomic
+        command each, so that a lease that has been claimed by a reaper or released
+        is never granted again.
+
+        :param identifiers: Identifiers of the sub suites to renew the leases of.
+        :type identifiers: str
+        :return: Identifiers of the renewed leases.
+        :rtype: list
+        """
+        if not identifiers:
+            return []
+        expires = time.time() + self.ttl
+        pipeline = self.database.writer.pipeline(transaction=False)
+        for identifier in identifiers:
+            pipeline.zadd(self.index, {identifier: expires}, xx=True, ch=True)
+        return [
+            identifier
+            for identifier, changed in zip(identifiers, pipeline.execute())
+            if changed
+        ]
+
+    def release(self, *identifiers):
+        """Release leases, when the resources of their sub suites have been checked in.
+
+        :param identifiers: Identifiers of the sub suites, or resource leases, to
+                            release the leases of.
+        :type identifiers: str
+        """
+        if not identifiers:
+            return
+        pipeline = self.database.writer.pipeline(transaction=False)
+        pipeline.zrem(self.index, *identifiers)
+        pipeline.hdel(self.resources_key, *identifiers)
+        pipeline.execute()
+
+    def read_resources(self, identifiers):
+        """Read the resources of resource leases, as partial sub suites.
+
+        :param identifiers: Identifiers of leases, of sub suites or resources.
+        :type identifiers: list
+        :return: Resources, by the identifiers that are resource leases.
+        :rtype: dict
+        """
+        if not identifiers:
+            return {}
+        return {
+            identifier: json.loads(resources)
+            for identifier, resources in zip(
+                identifiers,
+                self.database.writer.hmget(self.resources_key, identifiers),
+            )
+            if resources is not None
+        }
+
+    def claim_expired(self, count=100):
+        """Claim expired leases, so that no other worker reaps them.
+
+        :param count: Maximum number of leases to claim.
+        :type count: int
+        :return: Identifiers of the sub suites of the claimed leases.
+        :rtype: list
+        """
+        expired = self.database.writer.zrangebyscore(
+            self.index, "-inf", time.time(), start=0, num=count
+        )
+        if not expired:
+            return []
+        pipeline = self.database.writer.pipeline(transaction=False)
+        for identifier in expired:
+            pipeline.zrem(self.index, identifier)
+        claimed = [
+            self.decode(identifier)
+            for identifier, removed in zip(expired, pipeline.execute())
+            if removed
+        ]
+        self.logger.info("Claimed %d expired leases", len(claimed))
+        return claimed
+
+    def acquire_reaper(self, interval):
+        """Acquire the right to reap expired leases, at most once every 'interval' seconds.
+
+        :param interval: Seconds until the next reaper can be acquired.
+        :type interval: int
+        :return: Whether or not the reaper was acquired.
+        :rtype: bool
+        """
+        return bool(
+            self.database.writer.set(self.reaper_key, time.time(), nx=True, ex=interval)
+        )
+
+
+class ResourceLeases:
+    """Leases on the resources checked out by an environment provider.
+
+    Resources are leased as soon as they are checked out, so that they are checked in
+    by the lease reaper if the environment provider dies before their sub suites are
+    stored. The leases are handed over to the sub suites when their environment defined
+    events are stored and the leases on resources that are not used are released when
+    the resources are checked in. The remaining leases are released when the
+    environment provider is done, since it has then checked in everything it did not use.
+
+    The lease IDs are kept by resource, and not in the resources themselves, so that
+    they never end up in sub suites or in check in requests. Resources are identified
+    by the objects returned from the providers, which are kept until their leases are
+    handed over or released.
+
+    Without a lease store nothing is leased.
+    """
+
+    def __init__(self, lease_store=None, suite_id=None):
+        """Initialize with lease store and the ID of the suite to lease resources for.
+
+        :param lease_store: Store to grant leases in.
+        :type lease_store: :obj:`LeaseStore`
+        :param suite_id: ID of the suite that resources are checked out for.
+        :type suite_id: str
+        """
+        self.lease_store = lease_store
+        self.suite_id = suite_id
+        self.leases = {}
+        self.lock = Lock()
+
+    def lease(self, resource_type, resources):
+        """Lease checked out resources.
+
+        :param resource_type: Type of the resources, 'iut', 'executor' or 'log_area'.
+        :type resource_type: str
+        :param resources: Checked out resources to lease.
+        :type resources: list
+        :return: The resources.
+        :rtype: list
+        """
+        if self.lease_store is not None:
+            lease_ids = self.lease_store.grant_resources(
+                self.suite_id, resource_type, *resources
+            )
+            with self.lock:
+                for resource, lease_id in zip(resources, lease_ids):
+                    self.leases[id(resource)] = (resource, lease_id)
+        return resources
+
+    def pop(self, resources):
+        """Stop keeping track of the leases on resources.
+
+        :param resources: Resources to get the lease IDs of.
+        :type resources: list
+        :return: IDs of the leases on the resources that are leased.
+        :rtype: list
+        """
+        with self.lock:
+            leases = [self.leases.pop(id(resource), None) for resource in resources]
+        return [lease[1] for lease in leases if lease is not None]
+
+    def transfer(self, batch, identifier, resources):
+        """Queue a lease on a sub suite, replacing the leases on its resources.
+
+        :param batch: Database batch to write the leases in.
+        :type batch: :obj:`environment_provider.lib.database_batch.DatabaseBatch`
+        :param identifier: Identifier of the sub suite to lease.
+        :type identifier: str
+        :param resources: IUT, executor and log area of the sub suite.
+        :type resources: list
+        """
+        if self.lease_store is not None:
+            # The lease has to be renewed by the test runner, see '/lease'.
+            self.lease_store.transfer(batch, identifier, *self.pop(resources))
+
+    def checkin(self, provider, resource):
+        """Check in a resource that is not used and release the lease on it.
+
+        The lease is kept if the check in fails, so that the lease reaper tries again.
+
+        :param provider: Provider to check in the resource to.
+        :type provider: :obj:`iut_provider.IutProvider` or
+                        :obj:`execution_space_provider.ExecutionSpaceProvider` or
+                        :obj:`log_area_provider.LogAreaProvider`
+        :param resource: Resource to check in.
+        :type resource: :obj:`iut_provider.iut.Iut` or
+                        :obj:`execution_space_provider.execution_space.ExecutionSpace`
+                        or :obj:`log_area_provider.log_area.LogArea`
+        """
+        provider.checkin(resource)
+        if self.lease_store is not None:
+            self.lease_store.release(*self.pop([resource]))
+
+    def release(self):
+        """Release the leases on all resources that have not been handed over."""
+        if self.lease_store is not None:
+            with self.lock:
+                lease_ids = [lease_id for _, lease_id in self.leases.values()]
+                self.leases.clear()
+            self.lease_store.release(*lease_ids)
@@ -16,8 +16,11 @@
 """ETOS Environment Provider registry module."""
 import json
 import logging
+from uuid import uuid4
+from functools import lru_cache
 from collections import OrderedDict
-import jsonschema
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
 from execution_space_provider import (
     ExecutionSpaceProvider,
@@ -26,12 +29,36 @@ from execution_space_provider import (
 from iut_provider import IutProvider, iut_provider_schema
 
 from log_area_provider import LogAreaProvider, log_area_provider_schema
+from .database_batch import DatabaseBatch
+
+
+@lru_cache(maxsize=None)
+def schema_validator(schema):
+    """Load a JSON schema and create a validator for it.
+
+    Validators are cached so that each schema is only loaded and checked once.
+
+    :param schema: Path to JSON schema to create validator for.
+    :type schema: :obj:`pathlib.Path`
+    :return: Validator for the JSON schema.
+    :rtype: :obj:`jsonschema.Draft7Validator`
+    """
+    with open(schema, encoding="UTF-8") as schema_file:
+        schema = json.load(schema_file)
+    validator = validator_for(schema)
+    validator.check_schema(schema)
+    return validator(schema)
 
 
 class ProviderRegistry:
     """Environment provider registry."""
 
     logger = logging.getLogger("Registry")
+    generations = "EnvironmentProvider:ProviderGenerations"
+    # Parsed provider rulesets, shared by all registries in this process.
+    # Keyed by provider key, with a (generation, ruleset) tuple as value.
+    # The cached rulesets are shared and must not be modified.
+    rulesets = {}
 
     def __init__(self, etos, jsontas, database):
         """Initialize with ETOS library, JsonTas and ETOS database.
@@ -85,11 +112,142 @@ class ProviderRegistry:
         :rtype: dict
         """
         self.logger.debug("Validating provider %r against %r", provider, schema)
-        with open(schema, encoding="UTF-8") as schema_file:
-            schema = json.load(schema_file)
-        jsonschema.validate(instance=provider, schema=schema)
+        error = best_match(schema_validator(schema).iter_errors(provider))
+        if error is not None:
+            raise error
         return provider
 
+    def get_provider_by_id(self, providers, provider_id):
+        """Get a provider ruleset, from the in-process cache if it is up to date.
+
+        A provider is re-read from the ETOS Database only if its generation has
+        changed, i.e. if it has been registered again, since it was cached.
+
+        :param providers: Database key of the providers to get provider from.
+        :type providers: str
+        :param provider_id: ID of provider.
+        :type provider_id: str
+        :return: Provider JSON or None.
+        :rtype: dict or None
+        """
+        key = f"{providers}:{provider_id}"
+        ruleset = self.cached_provider(
+            key, self.database.reader.hget(self.generations, key)
+        )
+        if ruleset is not None:
+            return ruleset
+        # Read generation and provider in a single request, so that the provider
+        # is at least as new as the generation it is cached with.
+        pipeline = self.database.reader.pipeline(transaction=False)
+        pipeline.hget(self.generations, key)
+        pipeline.hget(providers, provider_id)
+        generation, provider = pipeline.execute()
+        self.logger.debug(provider)
+        if not provider:
+            return None
+        return self.cache_provider(key, generation, provider)
+
+    def cached_provider(self, key, generation):
+        """Get a provider ruleset from the in-process cache.
+
+        :param key: Provider key, as stored in the generations hash.
+        :type key: str
+        :param generation: Current generation of the provider.
+        :type generation: bytes or str or None
+        :return: Cached provider JSON or None if it is not cached or outdated.
+        :rtype: dict or None
+        """
+        if generation is None:
+            return None
+        if isinstance(generation, bytes):
+            generation = generation.decode("utf-8")
+        cached = self.rulesets.get(key)
+        if cached is not None and cached[0] == generation:
+            self.logger.debug("Using cached provider %r", key)
+            return cached[1]
+        return None
+
+    def cache_provider(self, key, generation, provider):
+        """Parse a provider ruleset and add it to the in-process cache.
+
+        Providers without a generation, i.e. that have not been registered through
+        :meth:`register_provider`, are parsed but not cached.
+
+        :param key: Provider key, as stored in the generations hash.
+        :type key: str
+        :param generation: Generation of the provider.
+        :type generation: bytes or str or None
+        :param provider: Provider JSON string to parse.
+        :type provider: bytes or str
+        :return: Parsed provider JSON.
+        :rtype: dict
+        """
+        ruleset = json.loads(provider, object_pairs_hook=OrderedDict)
+        if generation is not None:
+            if isinstance(generation, bytes):
+                generation = generation.decode("utf-8")
+            self.rulesets[key] = (generation, ruleset)
+        return ruleset
+
+    def generation_of(self, ruleset):
+        """Get the provider key and generation of a cached provider ruleset.
+
+        :param ruleset: Provider JSON, as returned by :meth:`get_provider_by_id`.
+        :type ruleset: dict
+        :return: Provider key and generation, or None if ruleset is not cached.
+        :rtype: list or None
+        """
+        for key, (generation, cached) in list(self.rulesets.items()):
+            if cached is ruleset:
+                return [key, generation]
+        return None
+
+    def configured_provider(self, suite_id, name):
+        """Get a provider configured to suite ID, from the in-process cache if possible.
+
+        :param suite_id: Suite ID to get provider for.
+        :type suite_id: str
+        :param name: Name of the provider in the suite configuration.
+        :type name: str
+        :return: Provider JSON or None.
+        :rtype: dict or None
+        """
+        configuration = f"EnvironmentProvider:{suite_id}"
+        reference = self.database.reader.hget(configuration, f"{name}Generation")
+        if reference is None:
+            provider = self.database.reader.hget(configuration, name)
+            self.logger.info(provider)
+            if provider:
+                return json.loads(provider, object_pairs_hook=OrderedDict)
+            return None
+        key, generation = json.loads(reference)
+        ruleset = self.cached_provider(key, generation)
+        if ruleset is not None:
+            return ruleset
+        provider = self.database.reader.hget(configuration, name)
+        self.logger.info(provider)
+        if provider:
+            # The configured provider is a copy of the registered provider with this
+            # generation, so it can be cached for the registered provider as well.
+            return self.cache_provider(key, generation, provider)
+        return None
+
+    def register_provider(self, providers, provider_id, ruleset):
+        """Store a provider ruleset and bump its generation.
+
+        :param providers: Database key of the providers to add provider to.
+        :type providers: str
+        :param provider_id: ID of provider.
+        :type provider_id: str
+        :param ruleset: Provider JSON to store.
+        :type ruleset: dict
+        """
+        with DatabaseBatch(self.database) as batch:
+            batch.hset(providers, {provider_id: json.dumps(ruleset)})
+            # The generation is written after the provider so that a reader that sees
+            # the new generation also sees the new provider.
+            batch.hset(self.generations, {f"{providers}:{provider_id}": str(uuid4())})
+
     def get_log_area_provider_by_id(self, provider_id):
         """Get log area provider by name from the ETOS Database.
 
@@ -101,13 +259,9 @@ class ProviderRegistry:
         :rtype: dict or None
         """
         self.logger.info("Getting log area provider %r", provider_id)
-        provider = self.database.reader.hget(
+        return self.get_provider_by_id(
             "EnvironmentProvider:LogAreaProviders", provider_id
         )
-        self.logger.debug(provider)
-        if provider:
-            return json.loads(provider, object_pairs_hook=OrderedDict)
-        return None
 
     def get_iut_provider_by_id(self, provider_id):
         """Get IUT provider by name from the ETOS Database.
@@ -120,13 +274,7 @@ class ProviderRegistry:
         :rtype: dict or None
         """
         self.logger.info("Getting iut provider %r", provider_id)
-        provider = self.database.reader.hget(
-            "EnvironmentProvider:IUTProviders", provider_id
-        )
-        self.logger.debug(provider)
-        if provider:
-            return json.loads(provider, object_pairs_hook=OrderedDict)
-        return None
+        return self.get_provider_by_id("EnvironmentProvider:IUTProviders", provider_id)
 
     def get_execution_space_provider_by_id(self, provider_id):
         """Get execution space provider by name from the ETOS Database.
@@ -139,13 +287,9 @@ class ProviderRegistry:
         :rtype: dict or None
         """
         self.logger.info("Getting execution space provider %r", provider_id)
-        provider = self.database.reader.hget(
+        return self.get_provider_by_id(
             "EnvironmentProvider:ExecutionSpaceProviders", provider_id
         )
-        self.logger.debug(provider)
-        if provider:
-            return json.loads(provider, object_pairs_hook=OrderedDict)
-        return None
 
     def register_log_area_provider(self, ruleset):
         """Register a new log area provider.
@@ -155,11 +299,8 @@ class ProviderRegistry:
         """
         data = self.validate(ruleset, log_area_provider_schema(ruleset))
         self.logger.info("Registering %r", data)
-        self.database.writer.hdel(
-            "EnvironmentProvider:LogAreaProviders", data["log"]["id"]
-        )
-        self.database.writer.hset(
-            "EnvironmentProvider:LogAreaProviders", data["log"]["id"], json.dumps(data)
+        self.register_provider(
+            "EnvironmentProvider:LogAreaProviders", data["log"]["id"], data
         )
 
     def register_iut_provider(self, ruleset):
@@ -170,9 +311,8 @@ class ProviderRegistry:
         """
         data = self.validate(ruleset, iut_provider_schema(ruleset))
         self.logger.info("Registering %r", data)
-        self.database.writer.hdel("EnvironmentProvider:IUTProviders", data["iut"]["id"])
-        self.database.writer.hset(
-            "EnvironmentProvider:IUTProviders", data["iut"]["id"], json.dumps(data)
+        self.register_provider(
+            "EnvironmentProvider:IUTProviders", data["iut"]["id"], data
         )
 
     def register_execution_space_provider(self, ruleset):
@@ -183,13 +323,10 @@ class ProviderRegistry:
         """
         data = self.validate(ruleset, execution_space_provider_schema(ruleset))
         self.logger.info("Registering %r", data)
-        self.database.writer.hdel(
-            "EnvironmentProvider:ExecutionSpaceProviders", data["execution_space"]["id"]
-        )
-        self.database.writer.hset(
+        self.register_provider(
             "EnvironmentProvider:ExecutionSpaceProviders",
             data["execution_space"]["id"],
-            json.dumps(data),
+            data,
         )
 
     def execution_space_provider(self, suite_id):
@@ -200,17 +337,10 @@ class ProviderRegistry:
         :return: Execution space provider object.
         :rtype: :obj:`environment_provider.execution_space.ExecutionSpaceProvider`
         """
-        provider_json = self.database.reader.hget(
-            f"EnvironmentProvider:{suite_id}", "ExecutionSpaceProvider"
-        )
-        self.logger.info(provider_json)
+        provider_json = self.configured_provider(suite_id, "ExecutionSpaceProvider")
         if provider_json:
             provider = ExecutionSpaceProvider(
-                self.etos,
-                self.jsontas,
-                json.loads(provider_json, object_pairs_hook=OrderedDict).get(
-                    "execution_space"
-                ),
+                self.etos, self.jsontas, provider_json.get("execution_space")
             )
             self.etos.config.get("PROVIDERS").append(provider)
             return provider
@@ -224,12 +354,8 @@ class ProviderRegistry:
         :return: IUT provider object.
         :rtype: :obj:`environment_provider.iut.iut_provider.IutProvider`
         """
-        provider_str = self.database.reader.hget(
-            f"EnvironmentProvider:{suite_id}", "IUTProvider"
-        )
-        self.logger.info(provider_str)
-        if provider_str:
-            provider_json = json.loads(provider_str, object_pairs_hook=OrderedDict)
+        provider_json = self.configured_provider(suite_id, "IUTProvider")
+        if provider_json:
             provider = IutProvider(self.etos, self.jsontas, provider_json.get("iut"))
             self.etos.config.get("PROVIDERS").append(provider)
             return provider
@@ -243,15 +369,10 @@ class ProviderRegistry:
         :return: Log area provider object.
         :rtype: :obj:`environment_provider.logs.log_area_provider.LogAreaProvider`
         """
-        provider_json = self.database.reader.hget(
-            f"EnvironmentProvider:{suite_id}", "LogAreaProvider"
-        )
-        self.logger.info(provider_json)
+        provider_json = self.configured_provider(suite_id, "LogAreaProvider")
         if provider_json:
             provider = LogAreaProvider(
-                self.etos,
-                self.jsontas,
-                json.loads(provider_json, object_pairs_hook=OrderedDict).get("log"),
+                self.etos, self.jsontas, provider_json.get("log")
             )
             self.etos.config.get("PROVIDERS").append(provider)
             return provider
@@ -306,22 +427,25 @@ class ProviderRegistry:
             "Log area provider: %r", log_area_provider.get("log", {}).get("id")
         )
         self.logger.info("Expire: 3600")
-        self.database.writer.hset(
-            f"EnvironmentProvider:{suite_id}", "Dataset", json.dumps(dataset)
-        )
-        self.database.writer.hset(
-            f"EnvironmentProvider:{suite_id}",
-            "IUTProvider",
-            json.dumps(iut_provider),
-        )
-        self.database.writer.hset(
-            f"EnvironmentProvider:{suite_id}",
-            "ExecutionSpaceProvider",
-            json.dumps(execution_space_provider),
-        )
-        self.database.writer.hset(
-            f"EnvironmentProvider:{suite_id}",
-            "LogAreaProvider",
-            json.dumps(log_area_provider),
-        )
-        self.database.writer.expire(f"EnvironmentProvider:{suite_id}", 3600)
+        configuration = {
+            "Dataset": json.dumps(dataset),
+            "IUTProvider": json.dumps(iut_provider),
+            "ExecutionSpaceProvider": json.dumps(execution_space_provider),
+            "LogAreaProvider": json.dumps(log_area_provider),
+        }
+        uncached = []
+        for name, provider in (
+            ("IUTProvider", iut_provider),
+            ("ExecutionSpaceProvider", execution_space_provider),
+            ("LogAreaProvider", log_area_provider),
+        ):
+            reference = self.generation_of(provider)
+            if reference is None:
+                uncached.append(f"{name}Generation")
+            else:
+                configuration[f"{name}Generation"] = json.dumps(reference)
+        with DatabaseBatch(self.database) as batch:
+            if uncached:
+                batch.hdel(f"EnvironmentProvider:{suite_id}", *uncached)
+            batch.hset(f"EnvironmentProvider:{suite_id}", configuration)
+            batch.expire(f"EnvironmentProvider:{suite_id}", 3600)
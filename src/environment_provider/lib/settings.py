@@ -0,0 +1,64 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider settings module."""
+import os
+import json
+
+
+def boolean(value):
+    """Parse a boolean setting.
+
+    :param value: Value of the setting.
+    :type value: str
+    :return: Whether or not the setting is 'true'.
+    :rtype: bool
+    """
+    return value.lower() == "true"
+
+
+# Settings of the environment provider. Each setting is read from the environment
+# variable 'ETOS_{name}' and parsed with its function, or with its default value.
+SETTINGS = (
+    ("EVENT_DATA_TIMEOUT", int, "10"),
+    ("WAIT_FOR_IUT_TIMEOUT", int, "10"),
+    ("WAIT_FOR_EXECUTION_SPACE_TIMEOUT", int, "10"),
+    ("WAIT_FOR_LOG_AREA_TIMEOUT", int, "10"),
+    ("CONCURRENT_EXECUTION_SPACE_CHECKOUT", boolean, "false"),
+    ("BULK_LOG_AREA_CHECKOUT", boolean, "false"),
+    ("PIPELINED_CHECKOUT", boolean, "false"),
+    ("WARM_POOL_SIZES", json.loads, "{}"),
+    ("WARM_POOL_MAX_AGE", int, "3600"),
+    ("PARALLEL_TEST_SUITES", int, "1"),
+    ("EVENT_CACHE_TTL", int, "3600"),
+    ("EVENT_CACHE_MAX_SIZE", int, "10000"),
+    ("SPLIT_STRATEGY", str, "round_robin"),
+    ("SUB_SUITE_TTL", int, "172800"),
+    ("SUB_SUITE_COMPRESSION", str.lower, "none"),
+    ("LEASE_TTL", int, "0"),
+    ("ASYNC_EVENT_CONFIRMS", boolean, "false"),
+    ("STREAM_TEST_SUITE", boolean, "false"),
+    ("TEST_SUITE_CHUNK_SIZE", int, "65536"),
+)
+
+
+def configure_settings(config):
+    """Set the settings of the environment provider, from environment variables.
+
+    :param config: ETOS configuration to set the settings in.
+    :type config: :obj:`etos_lib.lib.config.Config`
+    """
+    for name, parse, default in SETTINGS:
+        config.set(name, parse(os.getenv(f"ETOS_{name}", default)))
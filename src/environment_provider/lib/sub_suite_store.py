@@ -0,0 +1,287 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider sub suite storage module."""
+import json
+import zlib
+import hashlib
+
+COMPRESSIONS = ("none", "zlib")
+
+
+class SubSuiteStore:
+    """Storage of generated sub suites in the ETOS database.
+
+    Every sub suite is stored once, in the 'Suite' field of the 'SubSuite:{identifier}'
+    hash, where identifier is the identifier of the execution space that executes it.
+    The 'Encoding' field tells whether the sub suite is compressed, the 'ETag' field
+    holds a hash of the sub suite JSON and the 'EventID' field holds the ID of the
+    environment defined event that was sent for it.
+    The whole hash expires after 'ttl' seconds.
+    """
+
+    def __init__(self, database, ttl=172800, compression="none"):
+        """Initialize with ETOS database, TTL and compression.
+
+        :param database: ETOS database to store sub suites in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param ttl: How long, in seconds, to keep sub suites in the database.
+        :type ttl: int
+        :param compression: Compression to store new sub suites with, 'none' or 'zlib'.
+        :type compression: str
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown sub suite compression {compression!r}, "
+                f"must be one of {', '.join(COMPRESSIONS)}"
+            )
+        self.database = database
+        self.ttl = ttl
+        self.compression = compression
+
+    @staticmethod
+    def key(identifier):
+        """Database key for a sub suite.
+
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :return: Database key.
+        :rtype: str
+        """
+        return f"SubSuite:{identifier}"
+
+    @staticmethod
+    def etag(data):
+        """Entity tag of a sub suite JSON.
+
+        :param data: Sub suite JSON.
+        :type data: bytes or str
+        :return: Entity tag.
+        :rtype: str
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def encode(self, sub_suite):
+        """Encode a sub suite for storage.
+
+        :param sub_suite: Sub suite to encode.
+        :type sub_suite: dict
+        :return: Encoded sub suite, the name of its encoding and its entity tag.
+        :rtype: tuple
+        """
+        data = json.dumps(sub_suite).encode("utf-8")
+        etag = self.etag(data)
+        if self.compression == "zlib":
+            return zlib.compress(data), "zlib", etag
+        return data, "none", etag
+
+    @staticmethod
+    def encoding(encoding):
+        """Name of the encoding of a stored sub suite.
+
+        :param encoding: Encoding as stored in the database.
+        :type encoding: bytes or str or None
+        :return: Name of the encoding, 'none' if not compressed.
+        :rtype: str
+        """
+        if isinstance(encoding, bytes):
+            encoding = encoding.decode("utf-8")
+        return encoding or "none"
+
+    @staticmethod
+    def to_json(data, encoding):
+        """Decompress a stored sub suite into JSON, without parsing it.
+
+        :param data: Stored sub suite.
+        :type data: bytes or str
+        :param encoding: Name of the encoding of the stored sub suite.
+        :type encoding: str
+        :return: Sub suite JSON.
+        :rtype: bytes
+        """
+        if encoding == "zlib":
+            return zlib.decompress(data)
+        if isinstance(data, str):
+            return data.encode("utf-8")
+        return data
+
+    def decode(self, data, encoding):
+        """Decode a stored sub suite.
+
+        :param data: Stored sub suite.
+        :type data: bytes or str
+        :param encoding: Name of the encoding of the stored sub suite.
+        :type encoding: str
+        :return: Decoded sub suite.
+        :rtype: dict
+        """
+        return json.loads(self.to_json(data, encoding))
+
+    def write(self, batch, identifier, sub_suite):
+        """Queue a sub suite write in a database batch.
+
+        :param batch: Database batch to write the sub suite in.
+        :type batch: :obj:`environment_provider.lib.database_batch.DatabaseBatch`
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :param sub_suite: Sub suite to store.
+        :type sub_suite: dict
+        """
+        data, encoding, etag = self.encode(sub_suite)
+        key = self.key(identifier)
+        batch.hset(key, {"Suite": data, "Encoding": encoding, "ETag": etag})
+        batch.expire(key, self.ttl)
+
+    def write_event_id(self, batch, identifier, event_id):
+        """Queue writes of the environment defined event ID for a sub suite.
+
+        The event ID is stored in the sub suite hash and the identifier is stored under
+        the event ID, with the same TTL as the sub suite.
+
+        :param batch: Database batch to write the event ID in.
+        :type batch: :obj:`environment_provider.lib.database_batch.DatabaseBatch`
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :param event_id: ID of the environment defined event for the sub suite.
+        :type event_id: str
+        """
+        key = self.key(identifier)
+        batch.hset(key, {"EventID": event_id})
+        batch.expire(key, self.ttl)
+        batch.write(event_id, identifier, expire=self.ttl)
+
+    def read_metadata(self, identifier):
+        """Read the encoding and entity tag of a sub suite, without reading the sub suite.
+
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :return: Name of the encoding and entity tag of the sub suite. The entity tag
+                 is None if the sub suite is not stored or was stored without one.
+        :rtype: tuple
+        """
+        encoding, etag = self.database.reader.hmget(
+            self.key(identifier), ["Encoding", "ETag"]
+        )
+        if isinstance(etag, bytes):
+            etag = etag.decode("utf-8")
+        return self.encoding(encoding), etag
+
+    def read_encoded(self, identifier):
+        """Read a sub suite, without decoding it.
+
+        Sub suites stored by earlier versions of the environment provider, directly
+        under the identifier, are also found.
+
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :return: Stored sub suite, the name of its encoding and its entity tag, or None
+                 if it is not stored.
+        :rtype: tuple or None
+        """
+        data, encoding, etag = self.database.reader.hmget(
+            self.key(identifier), ["Suite", "Encoding", "ETag"]
+        )
+        if data is None:
+            data = self.database.read(identifier)
+            if data is None:
+                return None
+        encoding = self.encoding(encoding)
+        if etag is None:
+            etag = self.etag(self.to_json(data, encoding))
+        elif isinstance(etag, bytes):
+            etag = etag.decode("utf-8")
+        return data, encoding, etag
+
+    def read(self, identifier):
+        """Read a sub suite.
+
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :return: Sub suite or None if it is not stored.
+        :rtype: dict or None
+        """
+        stored = self.read_encoded(identifier)
+        if stored is None:
+            return None
+        data, encoding, _ = stored
+        return self.decode(data, encoding)
+
+    def read_many(self, identifiers):
+        """Read several sub suites, with a single database request.
+
+        Sub suites stored by earlier versions of the environment provider, directly
+        under the identifier, are read one by one.
+
+        :param identifiers: Identifiers of the execution spaces executing the sub suites.
+        :type identifiers: list
+        :return: Each of the sub suites, None for those that are not stored.
+        :rtype: list
+        """
+        pipeline = self.database.reader.pipeline(transaction=False)
+        for identifier in identifiers:
+            pipeline.hmget(self.key(identifier), ["Suite", "Encoding"])
+        sub_suites = []
+        for identifier, (data, encoding) in zip(identifiers, pipeline.execute()):
+            if data is None:
+                data = self.database.read(identifier)
+            if data is None:
+                sub_suites.append(None)
+                continue
+            sub_suites.append(self.decode(data, self.encoding(encoding)))
+        return sub_suites
+
+    def exists(self, identifier):
+        """Check whether a sub suite is stored, without reading it.
+
+        :param identifier: Identifier of the execution space executing the sub suite.
+        :type identifier: str
+        :return: Whether or not the sub suite is stored.
+        :rtype: bool
+        """
+        return bool(self.database.reader.hexists(self.key(identifier), "Suite"))
+
+    def exists_many(self, identifiers):
+        """Check whether several sub suites are stored, with a single database request.
+
+        :param identifiers: Identifiers of the execution spaces executing the sub suites.
+        :type identifiers: list
+        :return: Whether or not each of the sub suites is stored.
+        :rtype: list
+        """
+        pipeline = self.database.reader.pipeline(transaction=False)
+        for identifier in identifiers:
+            pipeline.hexists(self.key(identifier), "Suite")
+        return [bool(exists) for exists in pipeline.execute()]
+
+    def remove(self, *identifiers):
+        """Remove sub suites, and their environment defined event IDs, from the database.
+
+        All sub suites are removed with two database requests, regardless of how many.
+
+        :param identifiers: Identifiers of the execution spaces executing the sub suites.
+        :type identifiers: str
+        """
+        if not identifiers:
+            return
+        keys = [self.key(identifier) for identifier in identifiers]
+        pipeline = self.database.writer.pipeline(transaction=False)
+        for key in keys:
+            pipeline.hget(key, "EventID")
+        event_ids = [
+            event_id for event_id in pipeline.execute() if event_id is not None
+        ]
+        self.database.writer.delete(*keys, *event_ids)
@@ -14,8 +14,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Test suite module."""
-import json
 from etos_lib.lib.database import Database
+from .database_batch import DatabaseBatch
+from .sub_suite_store import SubSuiteStore
 
 # pylint:disable=line-too-long
 
@@ -127,7 +128,13 @@ class TestSuite:
         }
     """
 
-    def __init__(self, test_suite_name, test_runners, environment_provider_config):
+    def __init__(
+        self,
+        test_suite_name,
+        test_runners,
+        environment_provider_config,
+        sub_suite_store=None,
+    ):
         """Initialize test suite representation.
 
         :param test_suite_name: Name of the test suite.
@@ -136,12 +143,18 @@ class TestSuite:
         :type test_runners: dict
         :param environment_provider_config: Environment provider config.
         :type environment_provider_config: :obj:`environment_provider.lib.config.Config`
+        :param sub_suite_store: Storage for the generated sub suites.
+        :type sub_suite_store: :obj:`environment_provider.lib.sub_suite_store.SubSuiteStore`
         """
         self._suite = {}
+        # IUT, executor and log area of each generated sub suite, by identifier.
+        self.resources = {}
         self.test_suite_name = test_suite_name
         self.test_runners = test_runners
         self.environment_provider_config = environment_provider_config
-        self.database = Database(expire=172800)  # 48h
+        if sub_suite_store is None:
+            sub_suite_store = SubSuiteStore(Database())
+        self.sub_suite_store = sub_suite_store
 
     def add(self, name, value):
         """Add a new item to suite.
@@ -162,27 +175,31 @@ class TestSuite:
         """
         counter = 0
         suites = []
-        for test_runner, data in self.test_runners.items():
-            for iut, suite in data.get("iuts", {}).items():
-                sub_suite = {
-                    "name": f"{self.test_suite_name}_SubSuite_{counter}",
-                    "suite_id": self.environment_provider_config.tercc_id,
-                    "test_suite_started_id": suite_runner_id,
-                    "priority": data.get("priority"),
-                    "recipes": suite.get("recipes", []),
-                    "test_runner": test_runner,
-                    "iut": iut.as_dict,
-                    "artifact": self.environment_provider_config.artifact_id,
-                    "context": self.environment_provider_config.context,
-                    "executor": suite.get("executor").as_dict,
-                    "log_area": suite.get("log_area").as_dict,
-                }
-                self.database.write(
-                    sub_suite["executor"]["instructions"]["identifier"],
-                    json.dumps(sub_suite),
-                )
-                suites.append(sub_suite)
-                counter += 1
+        with DatabaseBatch(self.sub_suite_store.database) as batch:
+            for test_runner, data in self.test_runners.items():
+                for iut, suite in data.get("iuts", {}).items():
+                    sub_suite = {
+                        "name": f"{self.test_suite_name}_SubSuite_{counter}",
+                        "suite_id": self.environment_provider_config.tercc_id,
+                        "test_suite_started_id": suite_runner_id,
+                        "priority": data.get("priority"),
+                        "recipes": suite.get("recipes", []),
+                        "test_runner": test_runner,
+                        "iut": iut.as_dict,
+                        "artifact": self.environment_provider_config.artifact_id,
+                        "context": self.environment_provider_config.context,
+                        "executor": suite.get("executor").as_dict,
+                        "log_area": suite.get("log_area").as_dict,
+                    }
+                    identifier = sub_suite["executor"]["instructions"]["identifier"]
+                    self.sub_suite_store.write(batch, identifier, sub_suite)
+                    self.resources[identifier] = [
+                        iut,
+                        suite.get("executor"),
+                        suite.get("log_area"),
+                    ]
+                    suites.append(sub_suite)
+                    counter += 1
         self._suite = {"suite_name": self.test_suite_name, "sub_suites": suites}
 
     def to_json(self):
@@ -0,0 +1,634 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider warm pool module."""
+import re
+import json
+import time
+import hashlib
+import logging
+from threading import Lock, Thread
+
+from etos_lib.lib.database import Database
+from jsontas.jsontas import JsonTas
+from execution_space_provider import ExecutionSpaceProvider
+from execution_space_provider.execution_space import ExecutionSpace
+from log_area_provider import LogAreaProvider
+from log_area_provider.log_area import LogArea
+
+# Dataset values that differ between environment requests, or between the IUTs and
+# executors of a request.
+REQUEST_DATASET_KEYS = (
+    "uuid",
+    "config",
+    "identity",
+    "artifact_id",
+    "artifact_created",
+    "artifact_published",
+    "tercc",
+    "context",
+    "custom_data",
+    "dataset",
+    "iut",
+    "executor",
+)
+# Dataset values set by the providers themselves while running a ruleset.
+PROVIDER_DATASET_KEYS = ("this", "amount")
+REFERENCE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)")
+
+
+class WarmPool:
+    """Pool of already checked out resources, shared between all environment providers.
+
+    Resources are stored in the ETOS database, in a sorted set scored by the time they
+    were checked out, so that the oldest resources are handed out first.
+    Every pool is added to an index so that all pools can be listed and evicted.
+    Resources that have been in the pool for longer than 'max_age' seconds are evicted
+    and should be checked in by the caller.
+
+    Pool IDs start with the type of the resources in the pool, 'executor' or
+    'log_area', so that evicted resources can be checked in without knowing what
+    provider wrapper put them there.
+    """
+
+    logger = logging.getLogger("WarmPool")
+    index = "WarmPool:Index"
+    evictor_key = "WarmPool:Evictor"
+
+    def __init__(self, database, pool_id, size, max_age=None):
+        """Initialize with ETOS database, pool ID, size and maximum age.
+
+        :param database: ETOS database to store the pool in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param pool_id: ID of the pool.
+        :type pool_id: str
+        :param size: Number of resources to keep in the pool.
+        :type size: int
+        :param max_age: Seconds that a resource may stay in the pool, None for no limit.
+        :type max_age: int
+        """
+        self.database = database
+        self.pool_id = pool_id
+        self.size = size
+        self.max_age = max_age
+
+    @property
+    def key(self):
+        """Database key for the resources of the pool.
+
+        :return: Database key.
+        :rtype: str
+        """
+        return f"WarmPool:{self.pool_id}"
+
+    @property
+    def resource_type(self):
+        """Type of the resources in the pool.
+
+        :return: Resource type, 'executor' or 'log_area'.
+        :rtype: str
+        """
+        return self.pool_id.split(":", 1)[0]
+
+    @property
+    def statistics_key(self):
+        """Database key for the hit and miss counters of the pool.
+
+        :return: Database key.
+        :rtype: str
+        """
+        return f"WarmPool:{self.pool_id}:Statistics"
+
+    def take(self, amount):
+        """Take resources from the pool.
+
+        :param amount: Number of resources to take.
+        :type amount: int
+        :return: Resource dictionaries, at most 'amount'.
+        :rtype: list
+        """
+        if amount <= 0:
+            return []
+        resources = [
+            json.loads(resource)
+            for resource, _ in self.database.writer.zpopmin(self.key, amount)
+        ]
+        self.logger.debug(
+            "Took %d of %d resources from warm pool %r",
+            len(resources),
+            amount,
+            self.pool_id,
+        )
+        pipeline = self.database.writer.pipeline(transaction=False)
+        pipeline.hincrby(self.statistics_key, "hits", len(resources))
+        pipeline.hincrby(self.statistics_key, "misses", amount - len(resources))
+        pipeline.execute()
+        return resources
+
+    def put(self, resources):
+        """Put checked out resources in the pool.
+
+        :param resources: Resource dictionaries to put in the pool.
+        :type resources: list
+        """
+        if not resources:
+            return
+        now = time.time()
+        pipeline = self.database.writer.pipeline(transaction=False)
+        pipeline.zadd(self.key, {json.dumps(resource): now for resource in resources})
+        pipeline.zadd(self.index, {self.pool_id: now})
+        pipeline.execute()
+
+    def evict(self):
+        """Remove the resources that have been in the pool for longer than its maximum age.
+
+        A resource is only returned to the caller that removed it, so that every
+        evicted resource is checked in once.
+
+        :return: Evicted resource dictionaries, to be checked in.
+        :rtype: list
+        """
+        if not self.max_age:
+            return []
+        expired = self.database.writer.zrangebyscore(
+            self.key, "-inf", time.time() - self.max_age
+        )
+        if not expired:
+            return []
+        pipeline = self.database.writer.pipeline(transaction=False)
+        for resource in expired:
+            pipeline.zrem(self.key, resource)
+        evicted = [
+            json.loads(resource)
+            for resource, removed in zip(expired, pipeline.execute())
+            if removed
+        ]
+        self.logger.info(
+            "Evicted %d resources from warm pool %r", len(evicted), self.pool_id
+        )
+        return evicted
+
+    def missing(self):
+        """Get the number of resources that are missing for the pool to be full.
+
+        :return: Number of missing resources.
+        :rtype: int
+        """
+        return max(self.size - self.database.writer.zcard(self.key), 0)
+
+    def metrics(self):
+        """Get the size, age and hit rate of the pool.
+
+        :return: Metrics of the pool.
+        :rtype: dict
+        """
+        size = self.database.writer.zcard(self.key)
+        oldest = self.database.writer.zrange(self.key, 0, 0, withscores=True)
+        statistics = self.database.reader.hgetall(self.statistics_key)
+        hits = int(statistics.get(b"hits", 0))
+        misses = int(statistics.get(b"misses", 0))
+        return {
+            "size": size,
+            "age": time.time() - oldest[0][1] if oldest else 0,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0,
+        }
+
+    @classmethod
+    def pool_ids(cls, database):
+        """Get the IDs of all pools.
+
+        :param database: ETOS database that the pools are stored in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :return: Pool IDs.
+        :rtype: list
+        """
+        return [
+            pool_id.decode("utf-8") if isinstance(pool_id, bytes) else pool_id
+            for pool_id in database.writer.zrange(cls.index, 0, -1)
+        ]
+
+    @classmethod
+    def evict_all(cls, database, max_age):
+        """Remove the resources that are too old from all pools.
+
+        Pools are not evicted when resources are taken from them only, since nothing
+        would ever take resources from a pool that is no longer used.
+
+        :param database: ETOS database that the pools are stored in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param max_age: Seconds that a resource may stay in a pool.
+        :type max_age: int
+        :return: Pool and evicted resource dictionaries, to be checked in, tuples.
+        :rtype: list
+        """
+        evicted = []
+        for pool_id in cls.pool_ids(database):
+            pool = cls(database, pool_id, 0, max_age)
+            resources = pool.evict()
+            if resources:
+                evicted.append((pool, resources))
+        return evicted
+
+    @classmethod
+    def acquire_evictor(cls, database, interval):
+        """Acquire the right to evict all pools, at most once every 'interval' seconds.
+
+        :param database: ETOS database that the pools are stored in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :param interval: Seconds until the next evictor can be acquired.
+        :type interval: int
+        :return: Whether or not the evictor was acquired.
+        :rtype: bool
+        """
+        return bool(
+            database.writer.set(cls.evictor_key, time.time(), nx=True, ex=interval)
+        )
+
+    @classmethod
+    def all_metrics(cls, database):
+        """Get the metrics of all pools.
+
+        :param database: ETOS database that the pools are stored in.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        :return: Metrics, by pool ID.
+        :rtype: dict
+        """
+        return {
+            pool_id: cls(database, pool_id, 0).metrics()
+            for pool_id in cls.pool_ids(database)
+        }
+
+
+class WarmPoolProvider:
+    """Execution space or log area provider that takes resources from a warm pool first.
+
+    Resources that are missing in the pool are checked out from the wrapped provider and
+    the pool is refilled in the background, with a provider of its own, after every
+    checkout. All other attributes are those of the wrapped provider.
+
+    Only resources taken from the pool are checked in by :meth:`checkin_all`, since the
+    wrapped provider checks in its own resources.
+    """
+
+    logger = logging.getLogger("WarmPoolProvider")
+    refill_locks = {}
+    lock = Lock()
+
+    def __init__(self, provider, pool, resource_class, refill_checkout):
+        """Initialize with the wrapped provider and its pool.
+
+        :param provider: Provider to check out resources from, when the pool is empty.
+        :type provider: :obj:`execution_space_provider.ExecutionSpaceProvider` or
+                        :obj:`log_area_provider.LogAreaProvider`
+        :param pool: Pool to take resources from.
+        :type pool: :obj:`WarmPool`
+        :param resource_class: Class to create the resources of the pool with.
+        :type resource_class: cls
+        :param refill_checkout: Function checking out a number of resources, with a
+                                provider of its own, to refill the pool with.
+        :type refill_checkout: function
+        """
+        self.provider = provider
+        self.pool = pool
+        self.resource_class = resource_class
+        self.refill_checkout = refill_checkout
+        self.taken = []
+
+    def __getattr__(self, name):
+        """Get an attribute of the wrapped provider."""
+        return getattr(self.provider, name)
+
+    def take_pooled(self, amount):
+        """Take resources from the pool, after checking in those that are too old.
+
+        :param amount: Maximum amount of resources to take.
+        :type amount: int
+        :return: List of resources taken from the pool.
+        :rtype: list
+        """
+        self.checkin_evicted()
+        resources = [
+            self.resource_class(**resource) for resource in self.pool.take(amount)
+        ]
+        self.taken.extend(resources)
+        return resources
+
+    def take(self, checkout, minimum_amount, maximum_amount, **kwargs):
+        """Take resources from the pool and check out the rest from the provider.
+
+        :param checkout: Checkout method of the wrapped provider.
+        :type checkout: function
+        :param minimum_amount: Minimum amount of resources to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of resources to checkout.
+        :type maximum_amount: int
+        :return: List of checked out resources.
+        :rtype: list
+        """
+        resources = self.take_pooled(maximum_amount)
+        if len(resources) < maximum_amount:
+            resources.extend(
+                checkout(
+                    minimum_amount=max(minimum_amount - len(resources), 0),
+                    maximum_amount=maximum_amount - len(resources),
+                    **kwargs,
+                )
+            )
+        self.refill_async()
+        return resources
+
+    def wait_for_and_checkout_execution_spaces(
+        self, minimum_amount=0, maximum_amount=100
+    ):
+        """Take execution spaces from the pool, checking out the rest from the provider.
+
+        :param minimum_amount: Minimum amount of execution spaces to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of execution spaces to checkout.
+        :type maximum_amount: int
+        :return: List of checked out execution spaces.
+        :rtype: list
+        """
+        return self.take(
+            self.provider.wait_for_and_checkout_execution_spaces,
+            minimum_amount,
+            maximum_amount,
+        )
+
+    def wait_for_and_checkout_log_areas(
+        self, minimum_amount=0, maximum_amount=100, contexts=None
+    ):
+        """Take log areas from the pool, checking out the rest from the provider.
+
+        :param minimum_amount: Minimum amount of log areas to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of log areas to checkout.
+        :type maximum_amount: int
+        :param contexts: Dataset values, such as 'iut' and 'executor', for each log area.
+        :type contexts: list
+        :return: List of checked out log areas or, if contexts are given, of context and
+                 log area pairs.
+        :rtype: list
+        """
+        if contexts is None:
+            return self.take(
+                self.provider.wait_for_and_checkout_log_areas,
+                minimum_amount,
+                maximum_amount,
+            )
+        pooled = self.take_pooled(maximum_amount)
+        # The first contexts belong to the log areas taken from the pool.
+        pairs = list(zip(contexts, pooled))
+        if len(pooled) < maximum_amount:
+            pairs.extend(
+                self.provider.wait_for_and_checkout_log_areas(
+                    minimum_amount=max(minimum_amount - len(pooled), 0),
+                    maximum_amount=maximum_amount - len(pooled),
+                    contexts=contexts[len(pooled) :],
+                )
+            )
+        self.refill_async()
+        return pairs
+
+    def checkin(self, resource):
+        """Check in a resource to the wrapped provider.
+
+        :param resource: Resource to check in.
+        :type resource: :obj:`execution_space_provider.execution_space.ExecutionSpace`
+                        or :obj:`log_area_provider.log_area.LogArea`
+        """
+        self.provider.checkin(resource)
+        if resource in self.taken:
+            self.taken.remove(resource)
+
+    def checkin_all(self):
+        """Check in all resources that were taken from the pool."""
+        for resource in list(self.taken):
+            try:
+                self.checkin(resource)
+            except Exception as exception:  # pylint:disable=broad-except
+                self.logger.error("%r", exception)
+
+    def checkin_evicted(self):
+        """Check in the resources that are evicted from the pool for being too old."""
+        for resource in self.pool.evict():
+            try:
+                self.provider.checkin(self.resource_class(**resource))
+            except Exception as exception:  # pylint:disable=broad-except
+                self.logger.error("%r", exception)
+
+    def refill(self):
+        """Check out the resources that are missing in the pool and put them in it."""
+        self.checkin_evicted()
+        missing = self.pool.missing()
+        if missing <= 0:
+            return
+        self.logger.info("Refilling warm pool %r with %d", self.pool.pool_id, missing)
+        resources = self.refill_checkout(missing)
+        self.pool.put([resource.as_dict for resource in resources])
+
+    def refill_async(self):
+        """Refill the pool in a background thread, unless it is already being refilled."""
+        with self.lock:
+            refill_lock = self.refill_locks.setdefault(self.pool.pool_id, Lock())
+        if not refill_lock.acquire(blocking=False):
+            return
+
+        def refill():
+            """Refill the pool and release the refill lock."""
+            try:
+                self.refill()
+            except Exception:  # pylint:disable=broad-except
+                self.logger.exception(
+                    "Failed to refill warm pool %r", self.pool.pool_id
+                )
+            finally:
+                refill_lock.release()
+
+        Thread(target=refill, daemon=True).start()
+
+
+def dataset_references(ruleset):
+    """Get the names of the dataset values that a ruleset reads.
+
+    :param ruleset: Ruleset of an execution space or log area provider.
+    :type ruleset: dict
+    :return: Names of the dataset values.
+    :rtype: set
+    """
+    names = set()
+    values = [value for key, value in ruleset.items() if key not in ("id", "checkin")]
+    while values:
+        value = values.pop()
+        if isinstance(value, dict):
+            values.extend(value.values())
+        elif isinstance(value, list):
+            values.extend(value)
+        elif isinstance(value, str):
+            names.update(REFERENCE.findall(value))
+    return names - set(PROVIDER_DATASET_KEYS)
+
+
+def warm_pool_id(resource_type, ruleset, dataset):
+    """Get the ID of the warm pool that resources of a provider are shared in.
+
+    Resources are only shared between checkouts that read the same dataset values, so
+    that a resource checked out for one test suite is never handed out to another test
+    suite that it was not checked out for. Resources are never pooled if they depend on
+    the request they are checked out for, since no other request could take them:
+    resources of rulesets with a 'checkout' step, which are checked out for a specific
+    IUT or executor, of rulesets reading any of the :data:`REQUEST_DATASET_KEYS` and of
+    external providers, which are sent the request in their start requests.
+
+    :param resource_type: Type of the resources, 'executor' or 'log_area'.
+    :type resource_type: str
+    :param ruleset: Ruleset of an execution space or log area provider.
+    :type ruleset: dict
+    :param dataset: Dataset that resources are checked out with.
+    :type dataset: :obj:`jsontas.dataset.Dataset`
+    :return: ID of the warm pool or None if the resources cannot be pooled.
+    :rtype: str or None
+    """
+    if ruleset.get("type", "jsontas") == "external" or ruleset.get("checkout"):
+        return None
+    references = dataset_references(ruleset)
+    if references & set(REQUEST_DATASET_KEYS):
+        return None
+    values = {name: dataset.get(name) for name in references}
+    digest = hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{resource_type}:{ruleset.get('id')}:{digest[:16]}"
+
+
+def warm_pool_size(etos, provider):
+    """Get the configured warm pool size of a provider.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param provider: Provider to get the warm pool size of.
+    :type provider: :obj:`execution_space_provider.ExecutionSpaceProvider` or
+                    :obj:`log_area_provider.LogAreaProvider`
+    :return: Number of resources to keep in the warm pool of the provider.
+    :rtype: int
+    """
+    return (etos.config.get("WARM_POOL_SIZES") or {}).get(provider.id, 0)
+
+
+def warm_pool(etos, resource_type, provider, dataset):
+    """Get the warm pool of a provider, for resources checked out with a dataset.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param resource_type: Type of the resources, 'executor' or 'log_area'.
+    :type resource_type: str
+    :param provider: Provider to get the warm pool of.
+    :type provider: :obj:`execution_space_provider.ExecutionSpaceProvider` or
+                    :obj:`log_area_provider.LogAreaProvider`
+    :param dataset: Dataset that resources are checked out with.
+    :type dataset: :obj:`jsontas.dataset.Dataset`
+    :return: Warm pool of the provider or None if its resources cannot be pooled.
+    :rtype: :obj:`WarmPool` or None
+    """
+    pool_id = warm_pool_id(resource_type, provider.ruleset, dataset)
+    if pool_id is None:
+        WarmPool.logger.warning(
+            "Resources of provider %r depend on the request and cannot be pooled",
+            provider.id,
+        )
+        return None
+    return WarmPool(
+        Database(),
+        pool_id,
+        warm_pool_size(etos, provider),
+        etos.config.get("WARM_POOL_MAX_AGE"),
+    )
+
+
+def warm_log_area_provider(etos, log_area_provider, copy_dataset):
+    """Take log areas from a warm pool, if a warm pool is configured for the provider.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param log_area_provider: Log area provider to take log areas from.
+    :type log_area_provider: :obj:`log_area_provider.LogAreaProvider`
+    :param copy_dataset: Function copying the dataset to refill the pool with.
+    :type copy_dataset: function
+    :return: The log area provider, wrapped with a warm pool if one is configured.
+    :rtype: :obj:`log_area_provider.LogAreaProvider`
+    """
+    if not warm_pool_size(etos, log_area_provider):
+        return log_area_provider
+    dataset = copy_dataset()
+    pool = warm_pool(etos, "log_area", log_area_provider, dataset)
+    if pool is None:
+        return log_area_provider
+    ruleset = log_area_provider.ruleset
+
+    def refill_checkout(amount):
+        """Check out log areas for the warm pool."""
+        provider = LogAreaProvider(etos, JsonTas(dataset=dataset), ruleset)
+        return provider.wait_for_and_checkout_log_areas(
+            minimum_amount=1, maximum_amount=amount
+        )
+
+    provider = WarmPoolProvider(log_area_provider, pool, LogArea, refill_checkout)
+    etos.config.get("PROVIDERS").append(provider)
+    return provider
+
+
+def warm_execution_space_provider(
+    etos, execution_space_provider, copy_dataset, test_runner
+):
+    """Take execution spaces from a warm pool, if a warm pool is configured for the provider.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param execution_space_provider: Execution space provider to take execution
+                                     spaces from.
+    :type execution_space_provider:
+        :obj:`execution_space_provider.execution_space_provider.ExecutionSpaceProvider`
+    :param copy_dataset: Function copying the dataset to refill the pool with.
+    :type copy_dataset: function
+    :param test_runner: Test runner to take execution spaces for.
+    :type test_runner: str
+    :return: The execution space provider, wrapped with a warm pool if one is
+             configured.
+    :rtype:
+        :obj:`execution_space_provider.execution_space_provider.ExecutionSpaceProvider`
+    """
+    if not warm_pool_size(etos, execution_space_provider):
+        return execution_space_provider
+    dataset = copy_dataset()
+    dataset.add("test_runner", test_runner)
+    pool = warm_pool(etos, "executor", execution_space_provider, dataset)
+    if pool is None:
+        return execution_space_provider
+    ruleset = execution_space_provider.ruleset
+
+    def refill_checkout(amount):
+        """Check out execution spaces for the warm pool."""
+        provider = ExecutionSpaceProvider(etos, JsonTas(dataset=dataset), ruleset)
+        return provider.wait_for_and_checkout_execution_spaces(
+            minimum_amount=1, maximum_amount=amount
+        )
+
+    provider = WarmPoolProvider(
+        execution_space_provider, pool, ExecutionSpace, refill_checkout
+    )
+    etos.config.get("PROVIDERS").append(provider)
+    return provider
@@ -14,7 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """ETOS Environment Provider splitter module."""
-from copy import deepcopy
+import heapq
+from .strategies import STRATEGIES
 
 
 class Splitter:
@@ -30,37 +31,99 @@ class Splitter:
         """
         self.etos = etos
         self.ruleset = ruleset
+        # Expected recipe durations, by test runner and test case ID.
+        self.durations = {}
 
-    @staticmethod
-    def _iterator(iterable):
-        """Create a generator from iterable."""
-        yield from iterable
+    def strategy(self, test_runner=None):
+        """Get the split strategy to use, from the 'SPLIT_STRATEGY' configuration.
+
+        :param test_runner: Test runner to get expected recipe durations for.
+        :type test_runner: str
+        :return: Split strategy, initialized with the expected recipe durations.
+        :rtype: :obj:`environment_provider.splitter.strategies.SplitStrategy`
+        """
+        name = self.etos.config.get("SPLIT_STRATEGY") or "round_robin"
+        try:
+            strategy = STRATEGIES[name]
+        except KeyError as exception:
+            raise ValueError(
+                f"Unknown split strategy {name!r}. Available: {list(STRATEGIES)}"
+            ) from exception
+        return strategy(self.durations.get(test_runner))
 
-    def splitter(self, test_suite):
-        """Iterate through all IUTs and assign a recipe in a round-robin fashion.
+    def splitter(self, test_suite, strategy):
+        """Assign all unsplit recipes of a test suite to its IUTs.
+
+        All assigned recipes are removed from 'unsplit_recipes'.
 
         :param test_suite: Test suite to iterate IUTs for.
         :type test_suite: dict
+        :param strategy: Split strategy to assign recipes with.
+        :type strategy: :obj:`environment_provider.splitter.strategies.SplitStrategy`
         """
-        test_list = self._iterator(deepcopy(test_suite.get("unsplit_recipes")))
-        while True:
-            try:
-                for _, iut_dict in test_suite.get("iuts").items():
-                    test = next(test_list)
-                    iut_dict["recipes"].append(test)
-                    test_suite["unsplit_recipes"].remove(test)
-            except StopIteration:
-                break
+        iuts = list(test_suite.get("iuts").values())
+        if not iuts:
+            return
+        recipes = test_suite.get("unsplit_recipes")
+        strategy.split(iuts, recipes)
+        recipes.clear()
 
     def split(self, test_suite):
-        """Will only call the splitter of this object.
-
-        In the future this might be where other splitter algorithms are evaluated.
+        """Split a test suite using the configured split strategy.
 
         :param test_suite: Test suite to attach tests to.
         :type test_suite: dict
         """
-        self.splitter(test_suite)
+        self.splitter(test_suite, self.strategy(test_suite.get("docker")))
+
+    @staticmethod
+    def allocate(number_of_iuts, number_of_tests):
+        """Allocate IUTs to test runners in proportion to their number of tests.
+
+        Every test runner with tests gets at least one IUT, if there are enough IUTs,
+        and no test runner gets more IUTs than it has tests. All IUTs are allocated
+        unless there are more IUTs than tests.
+        The proportional shares are rounded using the largest remainder method.
+
+        :param number_of_iuts: Number of IUTs to allocate.
+        :type number_of_iuts: int
+        :param number_of_tests: Number of tests for each test runner.
+        :type number_of_tests: list
+        :return: Number of IUTs for each test runner.
+        :rtype: list
+        """
+        total = sum(number_of_tests)
+        if number_of_iuts >= total:
+            return list(number_of_tests)
+        quotas = [number_of_iuts * tests / total for tests in number_of_tests]
+        allocation = [int(quota) for quota in quotas]
+        by_remainder = sorted(
+            range(len(quotas)), key=lambda index: allocation[index] - quotas[index]
+        )
+        for index in by_remainder[: number_of_iuts - sum(allocation)]:
+            allocation[index] += 1
+
+        # Move IUTs from the test runners with the largest surplus compared to their
+        # quota, to test runners with tests but without IUTs.
+        surplus = [
+            (quotas[index] - allocation[index], index)
+            for index in range(len(quotas))
+            if allocation[index] > 1
+        ]
+        heapq.heapify(surplus)
+        for index in sorted(
+            range(len(quotas)), key=lambda index: quotas[index], reverse=True
+        ):
+            if allocation[index] or not number_of_tests[index]:
+                continue
+            if not surplus:
+                break
+            _, donor = heapq.heappop(surplus)
+            allocation[donor] -= 1
+            allocation[index] += 1
+            if allocation[donor] > 1:
+                heapq.heappush(surplus, (quotas[donor] - allocation[donor], donor))
+        return allocation
 
     def assign_iuts(self, test_runners, iuts):
         """Assign IUTs to test runners.
@@ -72,38 +135,22 @@ class Splitter:
         :return: Any unassigned IUT.
         :rtype: list
         """
-        iuts = deepcopy(iuts)
-        for test_runner in test_runners.values():
+        total_test_count = self.etos.config.get("TOTAL_TEST_COUNT")
+        number_of_tests = [
+            len(test_runner.get("unsplit_recipes"))
+            for test_runner in test_runners.values()
+        ]
+        allocation = self.allocate(len(iuts), number_of_tests)
+        assigned = 0
+        for test_runner, tests, number_of_iuts in zip(
+            test_runners.values(), number_of_tests, allocation
+        ):
             test_runner.setdefault("iuts", {})
-            test_runner["percentage_of_tests"] = len(
-                test_runner.get("unsplit_recipes")
-            ) / self.etos.config.get("TOTAL_TEST_COUNT")
-            number_of_iuts = round(
-                self.etos.config.get("NUMBER_OF_IUTS")
-                * test_runner["percentage_of_tests"]
-            )
-            if not number_of_iuts:
-                number_of_iuts = 1
-
-            number_of_tests = len(test_runner.get("unsplit_recipes"))
-            number_of_iuts = (
-                number_of_tests if number_of_tests < number_of_iuts else number_of_iuts
+            test_runner["percentage_of_tests"] = (
+                tests / total_test_count if total_test_count else 0
             )
             test_runner["number_of_iuts"] = number_of_iuts
-
-        while True:
-            try:
-                for test_runner in test_runners.values():
-                    if len(test_runner.get("iuts")) >= test_runner["number_of_iuts"]:
-                        continue
-                    test_runner["iuts"][iuts.pop(0)] = {"recipes": [], "executor": None}
-                unfinished = [
-                    test_runner
-                    for test_runner in test_runners.values()
-                    if len(test_runner.get("iuts")) != test_runner["number_of_iuts"]
-                ]
-                if not unfinished:
-                    break
-            except IndexError:
-                break
-        return iuts
+            for iut in iuts[assigned : assigned + number_of_iuts]:
+                test_runner["iuts"][iut] = {"recipes": [], "executor": None}
+            assigned += number_of_iuts
+        return iuts[assigned:]
@@ -0,0 +1,110 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider split strategies."""
+import heapq
+from abc import ABC, abstractmethod
+
+# pylint:disable=too-few-public-methods
+
+
+class SplitStrategy(ABC):
+    """Base split strategy, assigning recipes to IUTs."""
+
+    def __init__(self, durations=None):
+        """Initialize with expected recipe durations.
+
+        :param durations: Expected duration, in seconds, of test cases by test case ID.
+        :type durations: dict
+        """
+        self.durations = durations or {}
+
+    @abstractmethod
+    def split(self, iuts, recipes):
+        """Assign recipes to IUTs.
+
+        :param iuts: IUT dictionaries to add recipes to.
+        :type iuts: list
+        :param recipes: Recipes to assign.
+        :type recipes: list
+        """
+
+
+class RoundRobin(SplitStrategy):
+    """Assign recipes to IUTs in a round-robin fashion.
+
+    Recipe number N is assigned to IUT number N modulo the number of IUTs.
+    """
+
+    def split(self, iuts, recipes):
+        """Assign recipes to IUTs in a round-robin fashion.
+
+        :param iuts: IUT dictionaries to add recipes to.
+        :type iuts: list
+        :param recipes: Recipes to assign.
+        :type recipes: list
+        """
+        number_of_iuts = len(iuts)
+        for index, iut_dict in enumerate(iuts):
+            iut_dict["recipes"].extend(recipes[index::number_of_iuts])
+
+
+class LongestProcessingTimeFirst(SplitStrategy):
+    """Assign the longest recipes first, each to the IUT with the least work so far.
+
+    Recipes without a known duration are expected to take as long as the average
+    of the recipes with a known duration.
+    """
+
+    def duration(self, recipe, default):
+        """Get the expected duration of a recipe.
+
+        :param recipe: Recipe to get expected duration for.
+        :type recipe: dict
+        :param default: Duration to use if the duration of the recipe is unknown.
+        :type default: float
+        :return: Expected duration of recipe.
+        :rtype: float
+        """
+        return self.durations.get(recipe.get("testCase", {}).get("id"), default)
+
+    def split(self, iuts, recipes):
+        """Assign recipes to IUTs, longest recipe first, to the least loaded IUT.
+
+        :param iuts: IUT dictionaries to add recipes to.
+        :type iuts: list
+        :param recipes: Recipes to assign.
+        :type recipes: list
+        """
+        known = [
+            duration
+            for duration in (self.duration(recipe, None) for recipe in recipes)
+            if duration is not None
+        ]
+        default = sum(known) / len(known) if known else 1.0
+        durations = [self.duration(recipe, default) for recipe in recipes]
+        order = sorted(range(len(recipes)), key=lambda index: -durations[index])
+        # The IUT index breaks ties, so that IUTs with equal load are used in order.
+        loads = [(0.0, index) for index in range(len(iuts))]
+        for recipe_index in order:
+            load, iut_index = heapq.heappop(loads)
+            iuts[iut_index]["recipes"].append(recipes[recipe_index])
+            heapq.heappush(loads, (load + durations[recipe_index], iut_index))
+
+
+STRATEGIES = {
+    "round_robin": RoundRobin,
+    "lpt": LongestProcessingTimeFirst,
+}
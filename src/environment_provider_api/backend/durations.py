@@ -0,0 +1,64 @@
+# Copyright 2021 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Backend services for the durations endpoint."""
+import falcon
+
+
+def get_test_runner(request):
+    """Get the test runner that executed the test cases from the request.
+
+    :raises: falcon.HTTPBadRequest if test runner is missing.
+
+    :param request: The falcon request object.
+    :type request: :obj:`falcon.request`
+    :return: A test runner.
+    :rtype: str
+    """
+    test_runner = request.media.get("test_runner")
+    if not isinstance(test_runner, str) or not test_runner:
+        raise falcon.HTTPBadRequest(
+            "Missing parameter", "'test_runner' is a required parameter."
+        )
+    return test_runner
+
+
+def get_durations(request):
+    """Get the durations of the executed test cases from the request.
+
+    :raises: falcon.HTTPBadRequest if durations are missing or invalid.
+
+    :param request: The falcon request object.
+    :type request: :obj:`falcon.request`
+    :return: Durations, in seconds, by test case ID.
+    :rtype: dict
+    """
+    durations = request.media.get("durations")
+    if not isinstance(durations, dict):
+        raise falcon.HTTPBadRequest(
+            "Missing parameter",
+            "'durations' is a required parameter and shall map test case IDs to seconds.",
+        )
+    for test_case, duration in durations.items():
+        if (
+            isinstance(duration, bool)
+            or not isinstance(duration, (int, float))
+            or duration < 0
+        ):
+            raise falcon.HTTPBadRequest(
+                "Bad request",
+                f"Duration of {test_case!r} is not a positive number: {duration!r}",
+            )
+    return durations
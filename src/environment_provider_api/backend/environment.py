@@ -15,6 +15,11 @@
 # limitations under the License.
 """Backend for the environment requests."""
 import traceback
+from uuid import UUID
+from multiprocessing.pool import ThreadPool
+
+import falcon
+from jsontas.jsontas import JsonTas
 
 from log_area_provider import LogAreaProvider
 from log_area_provider.log_area import LogArea
@@ -26,6 +31,10 @@ from execution_space_provider import ExecutionSpaceProvider
 from execution_space_provider.execution_space import ExecutionSpace
 
 from environment_provider.environment_provider import get_environment
+from environment_provider.lib.database_batch import DatabaseBatch
+from environment_provider.lib.leases import LeaseStore
+from environment_provider.lib.sub_suite_store import SubSuiteStore
+from environment_provider.lib.warm_pool import WarmPool
 
 
 def get_environment_id(request):
@@ -61,6 +70,52 @@ def get_single_release_id(request):
     return request.get_param("single_release")
 
 
+def get_release_ids(request):
+    """Get the environment IDs to release, from a bulk release request.
+
+    :raises: falcon.HTTPBadRequest if the environment IDs are missing or invalid.
+
+    :param request: The falcon request object.
+    :type request: :obj:`falcon.request`
+    :return: The IDs of the environments to release.
+    :rtype: list
+    """
+    environment_ids = request.media.get("environment_ids")
+    if (
+        not isinstance(environment_ids, list)
+        or not environment_ids
+        or not all(isinstance(_id, str) for _id in environment_ids)
+    ):
+        raise falcon.HTTPBadRequest(
+            "Missing parameter",
+            "'environment_ids' is a required parameter and shall be a list of IDs.",
+        )
+    return environment_ids
+
+
+def get_lease_ids(request):
+    """Get the sub suite identifiers to renew the leases of, from a lease request.
+
+    :raises: falcon.HTTPBadRequest if the identifiers are missing or invalid.
+
+    :param request: The falcon request object.
+    :type request: :obj:`falcon.request`
+    :return: The identifiers of the sub suites to renew the leases of.
+    :rtype: list
+    """
+    identifiers = request.media.get("identifiers")
+    if (
+        not isinstance(identifiers, list)
+        or not identifiers
+        or not all(isinstance(identifier, str) for identifier in identifiers)
+    ):
+        raise falcon.HTTPBadRequest(
+            "Missing parameter",
+            "'identifiers' is a required parameter and shall be a list of IDs.",
+        )
+    return identifiers
+
+
 def checkin_provider(item, provider):
     """Check in a provider.
 
@@ -81,64 +136,282 @@ def checkin_provider(item, provider):
     return not failure, failure
 
 
-def release_environment(etos, jsontas, provider_registry, sub_suite):
-    """Release a single sub-suite environment.
+def get_provider_ruleset(provider_registry, resource_type, provider_id):
+    """Get the ruleset of the provider that a sub suite resource was checked out from.
+
+    :param provider_registry: The provider registry to get provider rulesets from.
+    :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
+    :param resource_type: Type of resource, 'iut', 'executor' or 'log_area'.
+    :type resource_type: str
+    :param provider_id: ID of the provider.
+    :type provider_id: str
+    :return: Provider ruleset.
+    :rtype: dict
+    """
+    if resource_type == "iut":
+        return provider_registry.get_iut_provider_by_id(provider_id).get("iut")
+    if resource_type == "executor":
+        return provider_registry.get_execution_space_provider_by_id(provider_id).get(
+            "execution_space"
+        )
+    return provider_registry.get_log_area_provider_by_id(provider_id).get("log")
+
+
+def create_provider(etos, jsontas, resource_type, ruleset):
+    """Create a provider for a type of sub suite resource.
 
     :param etos: ETOS library instance.
     :type etos: :obj:`etos_lib.ETOS`
     :param jsontas: JSONTas instance.
     :type jsontas: :obj:`jsontas.jsontas.JsonTas`
-    :param provider_registry: The provider registry to get environments from.
-    :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
-    :param sub_suite: The sub suite environment to release.
-    :type sub_suite: dict
-    :return: Whether or not the release was successful
-    :rtype bool
-    """
-    etos.config.set("SUITE_ID", sub_suite.get("suite_id"))
-    iut = sub_suite.get("iut")
-    iut_ruleset = provider_registry.get_iut_provider_by_id(iut.get("provider_id")).get(
-        "iut"
-    )
-    executor = sub_suite.get("executor")
-    executor_ruleset = provider_registry.get_execution_space_provider_by_id(
-        executor.get("provider_id")
-    ).get("execution_space")
-    log_area = sub_suite.get("log_area")
-    log_area_ruleset = provider_registry.get_log_area_provider_by_id(
-        log_area.get("provider_id")
-    ).get("log")
+    :param resource_type: Type of resource, 'iut', 'executor' or 'log_area'.
+    :type resource_type: str
+    :param ruleset: Provider ruleset.
+    :type ruleset: dict
+    :return: The provider and the class of its resources.
+    :rtype: tuple
+    """
+    if resource_type == "iut":
+        return IutProvider(etos, jsontas, ruleset), Iut
+    if resource_type == "executor":
+        return ExecutionSpaceProvider(etos, jsontas, ruleset), ExecutionSpace
+    return LogAreaProvider(etos, jsontas, ruleset), LogArea
 
-    failure = None
-    success, exception = checkin_provider(
-        Iut(**iut), IutProvider(etos, jsontas, iut_ruleset)
-    )
-    if not success:
-        failure = exception
 
+def group_by_provider(sub_suites):
+    """Group the resources of sub suites by the provider they were checked out from.
+
+    Resources are also grouped by suite ID, since the suite ID is sent to
+    external providers when checking in.
+
+    :param sub_suites: Sub suites to group the resources of, by release ID.
+    :type sub_suites: dict
+    :return: Release ID and resource tuples, by resource type, provider ID and suite ID.
+    :rtype: dict
+    """
+    groups = {}
+    for release_id, sub_suite in sub_suites.items():
+        for resource_type in ("iut", "log_area", "executor"):
+            resource = sub_suite.get(resource_type)
+            # Resource leases only hold a single resource.
+            if resource is None:
+                continue
+            group = (
+                resource_type,
+                resource.get("provider_id"),
+                sub_suite.get("suite_id"),
+            )
+            groups.setdefault(group, []).append((release_id, resource))
+    return groups
+
+
+def checkin_resources(provider, resource_class, resources):
+    """Check in resources to a provider, one at a time.
+
+    :param provider: The provider to check in to.
+    :type provider: cls
+    :param resource_class: Class to create the resources with.
+    :type resource_class: cls
+    :param resources: Release ID and resource tuples to check in.
+    :type resources: list
+    :return: Exceptions of the failed check ins, by release ID.
+    :rtype: dict
+    """
+    failures = {}
+    for release_id, resource in resources:
+        success, exception = checkin_provider(resource_class(**resource), provider)
+        if not success:
+            failures[release_id] = exception
+    return failures
+
+
+def checkin_resource_batch(provider, resource_class, resources):
+    """Check in resources to a provider that supports check in of several at once.
+
+    :param provider: The provider to check in to.
+    :type provider: cls
+    :param resource_class: Class to create the resources with.
+    :type resource_class: cls
+    :param resources: Release ID and resource tuples to check in.
+    :type resources: list
+    :return: Exceptions of the failed check ins, by release ID.
+    :rtype: dict
+    """
     success, exception = checkin_provider(
-        LogArea(**log_area), LogAreaProvider(etos, jsontas, log_area_ruleset)
-    )
-    if not success:
-        failure = exception
-    success, exception = checkin_provider(
-        ExecutionSpace(**executor),
-        ExecutionSpaceProvider(etos, jsontas, executor_ruleset),
+        [resource_class(**resource) for _, resource in resources], provider
     )
-    if not success:
-        failure = exception
-    return failure
+    if success:
+        return {}
+    return {release_id: exception for release_id, _ in resources}
 
 
-def release_full_environment(
-    etos, jsontas, provider_registry, task_result, release_id
+def checkin_sub_suites(
+    etos, provider_registry, sub_suites, processes=10
 ):  # pylint:disable=too-many-locals
+    """Check in the resources of several sub suites, grouped by provider and in parallel.
+
+    Each provider is created once. Resources of external providers are checked in with
+    a single request per provider. Resources of JSONTas providers are checked in one at
+    a time, with a JSONTas instance per provider, since the check in is evaluated in
+    the JSONTas dataset. Different providers check in in parallel.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param provider_registry: The provider registry to get provider rulesets from.
+    :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
+    :param sub_suites: Sub suites to check in the resources of, by release ID.
+    :type sub_suites: dict
+    :param processes: Maximum number of check ins to run in parallel.
+    :type processes: int
+    :return: Exceptions of the failed check ins, by release ID.
+    :rtype: dict
+    """
+    failures = {}
+    tasks = []
+    for (resource_type, provider_id, suite_id), resources in group_by_provider(
+        sub_suites
+    ).items():
+        # External providers read the suite ID when they are created.
+        etos.config.set("SUITE_ID", suite_id)
+        try:
+            ruleset = get_provider_ruleset(
+                provider_registry, resource_type, provider_id
+            )
+            provider, resource_class = create_provider(
+                etos, JsonTas(), resource_type, ruleset
+            )
+        except Exception as exception:  # pylint:disable=broad-except
+            for release_id, _ in resources:
+                failures[release_id] = exception
+            continue
+        if ruleset.get("type", "jsontas") == "external":
+            checkin = checkin_resource_batch
+        else:
+            checkin = checkin_resources
+        tasks.append((checkin, (provider, resource_class, resources)))
+    if not tasks:
+        return failures
+    thread_pool = ThreadPool(processes=min(processes, len(tasks)))
+    try:
+        results = [thread_pool.apply_async(checkin, args) for checkin, args in tasks]
+        for result in results:
+            failures.update(result.get())
+    finally:
+        thread_pool.close()
+        thread_pool.join()
+    return failures
+
+
+def format_failure(failure):
+    """Format the traceback of a failed release.
+
+    :param failure: Exception that made the release fail.
+    :type failure: :obj:`BaseException`
+    :return: The traceback of the exception.
+    :rtype: str
+    """
+    return "".join(
+        traceback.format_exception(failure, value=failure, tb=failure.__traceback__)
+    )
+
+
+def release_failure(details):
+    """Create the result of an environment that could not be released.
+
+    :param details: Details on why the environment could not be released.
+    :type details: str
+    :return: Release result.
+    :rtype: dict
+    """
+    return {
+        "error": "Failed to release environment",
+        "details": details,
+        "status": "FAILURE",
+    }
+
+
+def read_sub_suites(database, environment_ids):
+    """Read the sub suites of environments, by the ID of their environment events.
+
+    Identifiers and sub suites are read with one database request each, regardless
+    of how many environments there are.
+
+    :param database: ETOS database to read sub suites from.
+    :type database: :obj:`etos_lib.lib.database.Database`
+    :param environment_ids: IDs of the environments to read sub suites for.
+    :type environment_ids: list
+    :return: Identifiers and sub suites, by environment ID, and the release results
+             of the environments that could not be read.
+    :rtype: tuple
+    """
+    pipeline = database.reader.pipeline(transaction=False)
+    for environment_id in environment_ids:
+        pipeline.get(environment_id)
+
+    results = {}
+    identifiers = {}
+    for environment_id, identifier in zip(environment_ids, pipeline.execute()):
+        if isinstance(identifier, bytes):
+            identifier = identifier.decode("utf-8")
+        try:
+            UUID(identifier, version=4)
+        except (ValueError, TypeError):
+            results[environment_id] = release_failure(
+                f"Could not find a valid identifier for {environment_id}"
+            )
+            continue
+        identifiers[environment_id] = identifier
+
+    sub_suites = {}
+    stored = SubSuiteStore(database).read_many(list(identifiers.values()))
+    for (environment_id, identifier), sub_suite in zip(
+        list(identifiers.items()), stored
+    ):
+        if sub_suite is None:
+            results[environment_id] = release_failure(
+                f"SubSuite:{identifier} could not be found in database"
+            )
+            del identifiers[environment_id]
+            continue
+        sub_suites[environment_id] = sub_suite
+    return identifiers, sub_suites, results
+
+
+def release_environments(etos, provider_registry, environment_ids, processes=10):
+    """Release several sub suite environments, by the ID of their environment events.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param provider_registry: The provider registry to get environments from.
+    :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
+    :param environment_ids: IDs of the environments to release.
+    :type environment_ids: list
+    :param processes: Maximum number of check ins to run in parallel.
+    :type processes: int
+    :return: Result of the release, by environment ID.
+    :rtype: dict
+    """
+    database = provider_registry.database
+    identifiers, sub_suites, results = read_sub_suites(database, environment_ids)
+    failures = checkin_sub_suites(etos, provider_registry, sub_suites, processes)
+    released = []
+    for environment_id, identifier in identifiers.items():
+        failure = failures.get(environment_id)
+        if failure:
+            results[environment_id] = release_failure(format_failure(failure))
+            continue
+        released.append(identifier)
+        results[environment_id] = {"status": "SUCCESS"}
+    SubSuiteStore(database).remove(*released)
+    LeaseStore(database).release(*released)
+    return results
+
+
+def release_full_environment(etos, provider_registry, task_result, release_id):
     """Release an already requested environment.
 
     :param etos: ETOS library instance.
     :type etos: :obj:`etos_lib.ETOS`
-    :param jsontas: JSONTas instance.
-    :type jsontas: :obj:`jsontas.jsontas.JsonTas`
     :param provider_registry: The provider registry to get environments from.
     :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
     :param task_result: The result from the task.
@@ -151,39 +424,117 @@ def release_full_environment(
     """
     if task_result is None or not task_result.result:
         return False, f"Nothing to release with task_id {release_id}"
-    failure = None
-    for suite in task_result.result.get("suites", {}):
-        for sub_suite in suite.get("sub_suites", []):
-            try:
-                identifier = (
-                    f"SubSuite:{sub_suite['executor']['instructions']['identifier']}"
-                )
-            except KeyError:
-                identifier = None
-            if identifier is not None:
-                event_id = provider_registry.database.reader.hget(identifier, "EventID")
-                event_suite = provider_registry.database.reader.hget(
-                    identifier, "Suite"
-                )
-                # Has already been checked in.
-                if not event_suite:
-                    continue
-
-            failure = release_environment(etos, jsontas, provider_registry, sub_suite)
-
-            if identifier is not None:
-                provider_registry.database.writer.hdel(identifier, "EventID")
-                provider_registry.database.writer.hdel(identifier, "Suite")
-                provider_registry.database.remove(event_id)
+    sub_suite_store = SubSuiteStore(provider_registry.database)
+    sub_suites = [
+        sub_suite
+        for suite in task_result.result.get("suites", {})
+        for sub_suite in suite.get("sub_suites", [])
+    ]
+    identifiers = []
+    for sub_suite in sub_suites:
+        try:
+            identifiers.append(sub_suite["executor"]["instructions"]["identifier"])
+        except KeyError:
+            identifiers.append(None)
+    known_identifiers = [
+        identifier for identifier in identifiers if identifier is not None
+    ]
+    stored = dict(
+        zip(known_identifiers, sub_suite_store.exists_many(known_identifiers))
+    )
+    # Sub suites that are no longer stored have already been checked in.
+    to_release = {
+        index: sub_suite
+        for index, (identifier, sub_suite) in enumerate(zip(identifiers, sub_suites))
+        if identifier is None or stored[identifier]
+    }
+    failures = checkin_sub_suites(etos, provider_registry, to_release)
+    released = [
+        identifiers[index] for index in to_release if identifiers[index] is not None
+    ]
+    sub_suite_store.remove(*released)
+    LeaseStore(provider_registry.database).release(*released)
     task_result.forget()
-    if failure:
-        # Return the traceback from exception stored in failure.
-        return False, "".join(
-            traceback.format_exception(failure, value=failure, tb=failure.__traceback__)
-        )
+    if failures:
+        # Return the traceback from one of the exceptions.
+        return False, format_failure(next(iter(failures.values())))
     return True, ""
 
 
+def reap_expired_leases(etos, provider_registry, lease_store, processes=10):
+    """Check in the resources of sub suites and resource leases that have expired.
+
+    Expired leases are claimed, so that they are reaped only once, and the resources
+    of their sub suites are checked in grouped by provider, same as a release.
+    Resources that were leased when they were checked out, and never became part of a
+    stored sub suite, are checked in the same way.
+    Leases that failed to check in are granted again, so that the check in is retried
+    when they expire.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param provider_registry: The provider registry to get provider rulesets from.
+    :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
+    :param lease_store: Store of the leases to reap.
+    :type lease_store: :obj:`environment_provider.lib.leases.LeaseStore`
+    :param processes: Maximum number of check ins to run in parallel.
+    :type processes: int
+    :return: Identifiers of the reaped sub suites and exceptions of the failed check
+             ins, by identifier.
+    :rtype: tuple
+    """
+    identifiers = lease_store.claim_expired()
+    if not identifiers:
+        return [], {}
+    sub_suite_store = SubSuiteStore(provider_registry.database)
+    sub_suites = lease_store.read_resources(identifiers)
+    identifiers = [
+        identifier for identifier in identifiers if identifier not in sub_suites
+    ]
+    for identifier, sub_suite in zip(
+        identifiers, sub_suite_store.read_many(identifiers)
+    ):
+        # Sub suites that are no longer stored have already been checked in.
+        if sub_suite is not None:
+            sub_suites[identifier] = sub_suite
+    failures = checkin_sub_suites(etos, provider_registry, sub_suites, processes)
+    reaped = [identifier for identifier in sub_suites if identifier not in failures]
+    sub_suite_store.remove(*reaped)
+    lease_store.release(*reaped)
+    with DatabaseBatch(lease_store.database) as batch:
+        lease_store.grant(batch, *failures)
+    return reaped, failures
+
+
+def evict_warm_pools(etos, provider_registry, max_age, processes=10):
+    """Check in the resources that have been in any warm pool for too long.
+
+    Evicted resources are checked in grouped by provider, same as a release. Resources
+    that fail to check in are not put back in their pools.
+
+    :param etos: ETOS library instance.
+    :type etos: :obj:`etos_lib.ETOS`
+    :param provider_registry: The provider registry to get provider rulesets from.
+    :type provider_registry: :obj:`environment_provider.lib.registry.ProviderRegistry`
+    :param max_age: Seconds that a resource may stay in a warm pool.
+    :type max_age: int
+    :param processes: Maximum number of check ins to run in parallel.
+    :type processes: int
+    :return: Number of evicted resources and exceptions of the failed check ins, by
+             pool ID and index of the resource in the pool.
+    :rtype: tuple
+    """
+    resources = {}
+    for pool, evicted in WarmPool.evict_all(provider_registry.database, max_age):
+        for index, resource in enumerate(evicted):
+            resources[(pool.pool_id, index)] = {pool.resource_type: resource}
+    if not resources:
+        return 0, {}
+    return len(resources), checkin_sub_suites(
+        etos, provider_registry, resources, processes
+    )
+
+
 def check_environment_status(celery_worker, environment_id):
     """Check the status of the environment that is being requested.
 
@@ -14,9 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Backend services for the sub suite endpoint."""
-import json
-
 import falcon
+from environment_provider.lib.sub_suite_store import SubSuiteStore
 
 
 def get_sub_suite(database, sub_suite_id):
@@ -29,10 +28,87 @@ def get_sub_suite(database, sub_suite_id):
     :return: Sub suite or None.
     :rtype: dict
     """
-    suite = database.read(sub_suite_id)
-    if suite is None:
-        return suite
-    return json.loads(suite)
+    return SubSuiteStore(database).read(sub_suite_id)
+
+
+def accepts_deflate(request):
+    """Check whether the client accepts responses with the 'deflate' content coding.
+
+    :param request: The falcon request object.
+    :type request: :obj:`falcon.request`
+    :return: Whether or not a deflate compressed response is acceptable.
+    :rtype: bool
+    """
+    for coding in (request.get_header("Accept-Encoding") or "").split(","):
+        name, *parameters = coding.split(";")
+        if name.strip().lower() not in ("deflate", "*"):
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            return True
+    return False
+
+
+def representation_etag(etag, deflate):
+    """Entity tag of a sub suite response.
+
+    The compressed and uncompressed responses are different representations and must
+    not share entity tag.
+
+    :param etag: Entity tag of the sub suite.
+    :type etag: str
+    :param deflate: Whether or not the response is deflate compressed.
+    :type deflate: bool
+    :return: Entity tag of the response.
+    :rtype: str
+    """
+    if deflate:
+        return f"{etag}-deflate"
+    return etag
+
+
+def is_not_modified(request, etag):
+    """Check whether the client already has the response with an entity tag.
+
+    :param request: The falcon request object.
+    :type request: :obj:`falcon.request`
+    :param etag: Entity tag of the response.
+    :type etag: str
+    :return: Whether or not any of the entity tags in 'If-None-Match' match.
+    :rtype: bool
+    """
+    return any(tag in ("*", etag) for tag in request.if_none_match or [])
+
+
+def get_encoded_sub_suite(sub_suite_store, sub_suite_id, deflate):
+    """Get a sub suite response body, as stored in the database, without parsing it.
+
+    :param sub_suite_store: The storage to get sub suites from.
+    :type sub_suite_store: :obj:`environment_provider.lib.sub_suite_store.SubSuiteStore`
+    :param sub_suite_id: The suite ID of the sub suite in database.
+    :type sub_suite_id: str
+    :param deflate: Whether or not the client accepts a deflate compressed response.
+    :type deflate: bool
+    :return: Response body, whether or not it is deflate compressed and its entity tag,
+             or None if there is no such sub suite.
+    :rtype: tuple or None
+    """
+    stored = sub_suite_store.read_encoded(sub_suite_id)
+    if stored is None:
+        return None
+    data, encoding, etag = stored
+    # zlib compressed data is exactly what the 'deflate' content coding is.
+    deflate = deflate and encoding == "zlib"
+    if not deflate:
+        data = sub_suite_store.to_json(data, encoding)
+    return data, deflate, representation_etag(etag, deflate)
 
 
 def get_id(request):
@@ -0,0 +1,102 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""ETOS Environment Provider webserver request contexts."""
+import os
+import logging
+from queue import LifoQueue, Empty
+from copy import deepcopy
+from contextlib import contextmanager
+
+from etos_lib.etos import ETOS
+from jsontas.dataset import Dataset
+from jsontas.jsontas import JsonTas
+
+from environment_provider.lib.registry import ProviderRegistry
+
+# pylint:disable=too-few-public-methods
+
+
+class RequestContext:
+    """ETOS library, JsonTas, database and provider registry for handling requests.
+
+    The ETOS library configuration is a copy, so that configuration set while handling
+    one request is not visible when handling other requests.
+    """
+
+    def __init__(self, database):
+        """Build a new request context.
+
+        :param database: ETOS database to use.
+        :type database: :obj:`etos_lib.lib.database.Database`
+        """
+        self.etos = ETOS(
+            "ETOS Environment Provider", os.getenv("HOSTNAME"), "Environment Provider"
+        )
+        self.etos.config.config = deepcopy(self.etos.config.config)
+        self.jsontas = JsonTas()
+        self.database = database
+        self.registry = ProviderRegistry(self.etos, self.jsontas, database)
+        self.defaults = deepcopy(self.etos.config.config)
+
+    def reset(self):
+        """Reset configuration and dataset to what they were when the context was built."""
+        self.etos.config.config = deepcopy(self.defaults)
+        self.jsontas.dataset = Dataset()
+
+
+class ContextPool:
+    """Pool of request contexts, so that they are not built for every request.
+
+    Each webserver worker process imports the webserver and gets its own pool.
+    A new context is built if all pooled contexts are in use and at most 'size'
+    contexts are kept in the pool when they are returned.
+    """
+
+    logger = logging.getLogger("ContextPool")
+
+    def __init__(self, database, size=None):
+        """Initialize with database class and pool size.
+
+        :param database: Database class to create databases for the contexts with.
+        :type database: class
+        :param size: Maximum number of contexts to keep in the pool.
+                     Default is ETOS_WEBSERVER_CONTEXT_POOL_SIZE or 10.
+        :type size: int
+        """
+        self.database = database
+        if size is None:
+            size = int(os.getenv("ETOS_WEBSERVER_CONTEXT_POOL_SIZE", "10"))
+        self.size = size
+        self.contexts = LifoQueue()
+
+    @contextmanager
+    def context(self):
+        """Get a request context from the pool, returning it when done.
+
+        :return: A request context that is not used by anyone else.
+        :rtype: :obj:`RequestContext`
+        """
+        try:
+            context = self.contexts.get_nowait()
+        except Empty:
+            self.logger.debug("Building a new request context")
+            context = RequestContext(self.database())
+        try:
+            yield context
+        finally:
+            context.reset()
+            if self.contexts.qsize() < self.size:
+                self.contexts.put(context)
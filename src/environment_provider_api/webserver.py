@@ -15,20 +15,23 @@
 # limitations under the License.
 """ETOS Environment Provider webserver module."""
 import os
-import logging
-import traceback
 import json
-from uuid import UUID
+import time
+import logging
+from threading import Thread
+
 import falcon
 
-from etos_lib.etos import ETOS
 from etos_lib.lib.database import Database
 from etos_lib.logging.logger import FORMAT_CONFIG
-from jsontas.jsontas import JsonTas
 
 from environment_provider.lib.celery import APP
-from environment_provider.lib.registry import ProviderRegistry
+from environment_provider.lib.durations import DurationHistory
+from environment_provider.lib.leases import LeaseStore
+from environment_provider.lib.sub_suite_store import SubSuiteStore
+from environment_provider.lib.warm_pool import WarmPool
 
+from .context import ContextPool
 from .middleware import RequireJSON, JSONTranslator
 
 from .backend.environment import (
@@ -36,8 +39,12 @@ from .backend.environment import (
     get_environment_id,
     get_release_id,
     get_single_release_id,
+    get_release_ids,
+    get_lease_ids,
+    evict_warm_pools,
+    reap_expired_leases,
     release_full_environment,
-    release_environment,
+    release_environments,
     request_environment,
 )
 from .backend.register import (
@@ -54,7 +61,14 @@ from .backend.configure import (
     get_iut_provider_id,
     get_log_area_provider_id,
 )
-from .backend.subsuite import get_sub_suite, get_id
+from .backend.subsuite import (
+    accepts_deflate,
+    get_encoded_sub_suite,
+    get_id,
+    is_not_modified,
+    representation_etag,
+)
+from .backend.durations import get_durations, get_test_runner
 from .backend.common import get_suite_id, get_suite_runner_ids
 
 
@@ -71,6 +85,7 @@ class Webserver:
         """
         self.database = database
         self.celery_worker = celery_worker
+        self.contexts = ContextPool(database)
 
     def release_single(self, response, environment_id):
         """Release a single environment.
@@ -80,61 +95,13 @@ class Webserver:
         :param environment_id: Environment to release.
         :type environment_id: str
         """
-        etos = ETOS(
-            "ETOS Environment Provider",
-            os.getenv("HOSTNAME"),
-            "Environment Provider",
-        )
-        jsontas = JsonTas()
-        database = self.database()
-        registry = ProviderRegistry(etos, jsontas, database)
-
-        identifier = database.read(environment_id)
-        if not identifier:
-            response.media = {
-                "error": "Failed to release environment",
-                "details": f"Could not find a valid identifier for {environment_id}",
-                "status": "FAILURE",
-            }
-            return
-        identifier = identifier.decode("utf-8")
-        try:
-            UUID(identifier, version=4)
-        except (ValueError, TypeError):
-            response.media = {
-                "error": "Failed to release environment",
-                "details": f"Could not find a valid identifier for {environment_id}",
-                "status": "FAILURE",
-            }
-            return
-        identifier = f"SubSuite:{identifier}"
-        sub_suite = database.reader.hget(identifier, "Suite")
-        if sub_suite is None:
-            response.media = {
-                "error": "Failed to release environment",
-                "details": f"{identifier} could not be found in database",
-                "status": "FAILURE",
-            }
-            return
-        sub_suite = json.loads(sub_suite)
-        failure = release_environment(etos, jsontas, registry, sub_suite)
-        if failure:
-            response.media = {
-                "error": "Failed to release environment",
-                "details": "".join(
-                    traceback.format_exception(
-                        failure, value=failure, tb=failure.__traceback__
-                    )
-                ),
-                "status": "FAILURE",
-            }
-            return
-        database.writer.hdel(identifier, "EventID")
-        database.writer.hdel(identifier, "Suite")
-        database.remove(environment_id)
-
-        response.status = falcon.HTTP_200
-        response.media = {"status": "SUCCESS"}
+        with self.contexts.context() as context:
+            result = release_environments(
+                context.etos, context.registry, [environment_id]
+            )[environment_id]
+        if result["status"] == "SUCCESS":
+            response.status = falcon.HTTP_200
+        response.media = result
 
     def release(self, response, task_id):  # pylint:disable=too-many-locals
         """Release a full environment.
@@ -144,17 +111,11 @@ class Webserver:
         :param task_id: Task to release.
         :type task_id: str
         """
-        etos = ETOS(
-            "ETOS Environment Provider",
-            os.getenv("HOSTNAME"),
-            "Environment Provider",
-        )
-        jsontas = JsonTas()
-        registry = ProviderRegistry(etos, jsontas, self.database())
         task_result = self.celery_worker.AsyncResult(task_id)
-        success, message = release_full_environment(
-            etos, jsontas, registry, task_result, task_id
-        )
+        with self.contexts.context() as context:
+            success, message = release_full_environment(
+                context.etos, context.registry, task_result, task_id
+            )
         if not success:
             response.media = {
                 "error": "Failed to release environment",
@@ -217,6 +178,45 @@ class Webserver:
         response.media = {"result": "success", "data": {"id": task_id}}
 
 
+class Release:  # pylint:disable=too-few-public-methods
+    """Release several sub suite environments at once."""
+
+    def __init__(self, database):
+        """Init with a db class.
+
+        :param database: database class.
+        :type database: class
+        """
+        self.database = database
+        self.contexts = ContextPool(database)
+
+    def on_post(self, request, response):
+        """Release sub suite environments, by the IDs of their environment events.
+
+        The resources of all environments are grouped by provider and checked in in
+        parallel, at most ETOS_RELEASE_PARALLELISM at a time.
+
+        :param request: Falcon request object.
+        :type request: :obj:`falcon.request`
+        :param response: Falcon response object.
+        :type response: :obj:`falcon.response`
+        """
+        environment_ids = get_release_ids(request)
+        with self.contexts.context() as context:
+            results = release_environments(
+                context.etos,
+                context.registry,
+                environment_ids,
+                processes=int(os.getenv("ETOS_RELEASE_PARALLELISM", "10")),
+            )
+        success = all(result["status"] == "SUCCESS" for result in results.values())
+        response.status = falcon.HTTP_200
+        response.media = {
+            "status": "SUCCESS" if success else "FAILURE",
+            "environments": results,
+        }
+
+
 class Configure:
     """Configure endpoint for environment provider. Configure an environment for checkout.
 
@@ -233,6 +233,7 @@ class Configure:
         :type database: class
         """
         self.database = database
+        self.contexts = ContextPool(database)
 
     def on_post(self, request, response):
         """Verify that all parameters are available and configure the provider registry.
@@ -242,22 +243,18 @@ class Configure:
         :param response: Falcon response object.
         :type response: :obj:`falcon.response`
         """
-        etos = ETOS(
-            "ETOS Environment Provider", os.getenv("HOSTNAME"), "Environment Provider"
-        )
-        jsontas = JsonTas()
-        registry = ProviderRegistry(etos, jsontas, self.database())
         suite_id = get_suite_id(request)
         FORMAT_CONFIG.identifier = suite_id
 
-        success, message = configure(
-            registry,
-            get_iut_provider_id(request),
-            get_execution_space_provider_id(request),
-            get_log_area_provider_id(request),
-            get_dataset(request),
-            get_suite_id(request),
-        )
+        with self.contexts.context() as context:
+            success, message = configure(
+                context.registry,
+                get_iut_provider_id(request),
+                get_execution_space_provider_id(request),
+                get_log_area_provider_id(request),
+                get_dataset(request),
+                get_suite_id(request),
+            )
         if not success:
             self.logger.error(message)
             raise falcon.HTTPBadRequest("Bad request", message)
@@ -273,20 +270,16 @@ class Configure:
         :param response: Falcon response object.
         :type response: :obj:`falcon.response`
         """
-        etos = ETOS(
-            "ETOS Environment Provider", os.getenv("HOSTNAME"), "Environment Provider"
-        )
-        jsontas = JsonTas()
-        registry = ProviderRegistry(etos, jsontas, self.database())
-
         suite_id = get_suite_id(request)
         if suite_id is None:
             raise falcon.HTTPBadRequest(
                 "Missing parameters", "'suite_id' is a required parameter."
             )
         FORMAT_CONFIG.identifier = suite_id
+        with self.contexts.context() as context:
+            configuration = get_configuration(context.registry, suite_id)
         response.status = falcon.HTTP_200
-        response.media = get_configuration(registry, suite_id)
+        response.media = configuration
 
 
 class Register:  # pylint:disable=too-few-public-methods
@@ -299,6 +292,7 @@ class Register:  # pylint:disable=too-few-public-methods
         :type database: class
         """
         self.database = database
+        self.contexts = ContextPool(database)
 
     def on_post(self, request, response):
         """Register a new provider.
@@ -308,17 +302,13 @@ class Register:  # pylint:disable=too-few-public-methods
         :param response: Falcon response object.
         :type response: :obj:`falcon.response`
         """
-        etos = ETOS(
-            "ETOS Environment Provider", os.getenv("HOSTNAME"), "Environment Provider"
-        )
-        jsontas = JsonTas()
-        registry = ProviderRegistry(etos, jsontas, self.database())
-        registered = register(
-            registry,
-            iut_provider=get_iut_provider(request),
-            log_area_provider=get_log_area_provider(request),
-            execution_space_provider=get_execution_space_provider(request),
-        )
+        with self.contexts.context() as context:
+            registered = register(
+                context.registry,
+                iut_provider=get_iut_provider(request),
+                log_area_provider=get_log_area_provider(request),
+                execution_space_provider=get_execution_space_provider(request),
+            )
         if registered is False:
             raise falcon.HTTPBadRequest(
                 "Missing parameters",
@@ -342,19 +332,238 @@ class SubSuite:  # pylint:disable=too-few-public-methods
     def on_get(self, request, response):
         """Get a generated sub suite from environment provider.
 
+        The sub suite is served as it is stored in the database, deflate compressed
+        if it is stored compressed and the client accepts it.
+
         :param request: Falcon request object.
         :type request: :obj:`falcon.request`
         :param response: Falcon response object.
         :type response: :obj:`falcon.response`
         """
-        suite = get_sub_suite(self.database(), get_id(request))
-        if suite is None:
+        sub_suite_id = get_id(request)
+        sub_suite_store = SubSuiteStore(self.database())
+        deflate = accepts_deflate(request)
+        response.set_header("Vary", "Accept-Encoding")
+        if request.if_none_match:
+            # Only the entity tag is read, so that retries are cheap.
+            encoding, etag = sub_suite_store.read_metadata(sub_suite_id)
+            if etag is not None:
+                etag = representation_etag(etag, deflate and encoding == "zlib")
+                if is_not_modified(request, etag):
+                    response.etag = etag
+                    response.status = falcon.HTTP_304
+                    return
+        sub_suite = get_encoded_sub_suite(sub_suite_store, sub_suite_id, deflate)
+        if sub_suite is None:
             raise falcon.HTTPNotFound(
                 title="Sub suite not found.",
                 description=f"Could not find sub suite with ID {get_suite_id(request)}",
             )
+        data, deflated, etag = sub_suite
+        response.etag = etag
+        if is_not_modified(request, etag):
+            response.status = falcon.HTTP_304
+            return
+        if deflated:
+            response.set_header("Content-Encoding", "deflate")
+        response.status = falcon.HTTP_200
+        response.content_type = falcon.MEDIA_JSON
+        response.data = data
+
+
+class Durations:  # pylint:disable=too-few-public-methods
+    """Report test case durations, used when splitting test suites by duration."""
+
+    def __init__(self, database):
+        """Init with a db class.
+
+        :param database: database class.
+        :type database: class
+        """
+        self.database = database
+
+    def on_post(self, request, response):
+        """Update the duration history with the durations of executed test cases.
+
+        :param request: Falcon request object.
+        :type request: :obj:`falcon.request`
+        :param response: Falcon response object.
+        :type response: :obj:`falcon.response`
+        """
+        duration_history = DurationHistory(
+            self.database(),
+            weight=float(os.getenv("ETOS_DURATION_HISTORY_WEIGHT", "0.3")),
+            ttl=int(os.getenv("ETOS_DURATION_HISTORY_TTL", "2592000")),
+        )
+        duration_history.update(get_test_runner(request), get_durations(request))
+        response.status = falcon.HTTP_204
+
+
+class WarmPools:
+    """Metrics of the warm pools of execution spaces and log areas.
+
+    When ETOS_WARM_POOL_SIZES is set, resources that have been in any warm pool for
+    longer than ETOS_WARM_POOL_MAX_AGE seconds are evicted and checked in, in the
+    background, every ETOS_WARM_POOL_EVICT_INTERVAL seconds across all webserver
+    workers.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, database):
+        """Init with a db class.
+
+        :param database: database class.
+        :type database: class
+        """
+        self.database = database
+        self.contexts = ContextPool(database)
+        self.max_age = int(os.getenv("ETOS_WARM_POOL_MAX_AGE", "3600"))
+        self.evict_interval = int(os.getenv("ETOS_WARM_POOL_EVICT_INTERVAL", "60"))
+        if json.loads(os.getenv("ETOS_WARM_POOL_SIZES", "{}")) and self.max_age > 0:
+            Thread(target=self.evict_periodically, daemon=True).start()
+
+    def evict_periodically(self):
+        """Evict all warm pools every evict interval, for as long as the webserver runs.
+
+        Pools are evicted even if no resources are taken from them, so that resources
+        in pools that are no longer used are checked in too.
+        """
+        while True:
+            time.sleep(self.evict_interval)
+            try:
+                acquired = WarmPool.acquire_evictor(
+                    self.database(), self.evict_interval
+                )
+            except Exception:  # pylint:disable=broad-except
+                self.logger.exception("Failed to acquire the warm pool evictor")
+                continue
+            if acquired:
+                self.evict()
+
+    def evict(self):
+        """Check in the resources that have been in any warm pool for too long."""
+        try:
+            with self.contexts.context() as context:
+                evicted, failures = evict_warm_pools(
+                    context.etos,
+                    context.registry,
+                    self.max_age,
+                    processes=int(os.getenv("ETOS_RELEASE_PARALLELISM", "10")),
+                )
+        except Exception:  # pylint:disable=broad-except
+            self.logger.exception("Failed to evict the warm pools")
+            return
+        for (pool_id, _), exception in failures.items():
+            self.logger.error(
+                "Failed to check in a resource evicted from warm pool %r: %r",
+                pool_id,
+                exception,
+            )
+        if evicted:
+            self.logger.info(
+                "Evicted %d resources from the warm pools, %d failed to check in",
+                evicted,
+                len(failures),
+            )
+
+    def on_get(self, _request, response):
+        """Get the size, age and hit rate of every warm pool.
+
+        :param _request: Falcon request object.
+        :type _request: :obj:`falcon.request`
+        :param response: Falcon response object.
+        :type response: :obj:`falcon.response`
+        """
+        response.status = falcon.HTTP_200
+        response.media = WarmPool.all_metrics(self.database())
+
+
+class Leases:
+    """Renew the leases on the resources of sub suites.
+
+    Leases are granted when ETOS_LEASE_TTL is set and have to be renewed, by whoever
+    holds the sub suites, before they expire. Expired leases are reaped, in the
+    background, every ETOS_LEASE_REAP_INTERVAL seconds and when leases are renewed, at
+    most once every ETOS_LEASE_REAP_INTERVAL seconds across all webserver workers.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, database):
+        """Init with a db class.
+
+        :param database: database class.
+        :type database: class
+        """
+        self.database = database
+        self.contexts = ContextPool(database)
+        self.ttl = int(os.getenv("ETOS_LEASE_TTL", "0"))
+        self.reap_interval = int(os.getenv("ETOS_LEASE_REAP_INTERVAL", "30"))
+        if self.ttl > 0:
+            Thread(target=self.reap_periodically, daemon=True).start()
+
+    def reap_periodically(self):
+        """Reap expired leases every reap interval, for as long as the webserver runs.
+
+        Leases are reaped even if no leases are renewed, for instance when all test
+        runners holding sub suites have stopped.
+        """
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                acquired = LeaseStore(self.database(), ttl=self.ttl).acquire_reaper(
+                    self.reap_interval
+                )
+            except Exception:  # pylint:disable=broad-except
+                self.logger.exception("Failed to acquire the lease reaper")
+                continue
+            if acquired:
+                self.reap()
+
+    def reap(self):
+        """Check in the resources of sub suites whose leases have expired."""
+        try:
+            with self.contexts.context() as context:
+                reaped, failures = reap_expired_leases(
+                    context.etos,
+                    context.registry,
+                    LeaseStore(context.database, ttl=self.ttl),
+                    processes=int(os.getenv("ETOS_RELEASE_PARALLELISM", "10")),
+                )
+        except Exception:  # pylint:disable=broad-except
+            self.logger.exception("Failed to reap expired leases")
+            return
+        if reaped or failures:
+            self.logger.info(
+                "Reaped %d expired leases, %d failed to check in",
+                len(reaped),
+                len(failures),
+            )
+
+    def on_post(self, request, response):
+        """Renew leases, by the identifiers of their sub suites.
+
+        Leases that have expired or been released are not renewed and their sub suites
+        shall no longer be used.
+
+        :param request: Falcon request object.
+        :type request: :obj:`falcon.request`
+        :param response: Falcon response object.
+        :type response: :obj:`falcon.response`
+        """
+        identifiers = get_lease_ids(request)
+        lease_store = LeaseStore(self.database(), ttl=self.ttl)
+        renewed = lease_store.renew(*identifiers)
+        if self.ttl > 0 and lease_store.acquire_reaper(self.reap_interval):
+            Thread(target=self.reap, daemon=True).start()
         response.status = falcon.HTTP_200
-        response.media = suite
+        response.media = {
+            "renewed": renewed,
+            "expired": [
+                identifier for identifier in identifiers if identifier not in renewed
+            ],
+        }
 
 
 FALCON_APP = falcon.API(middleware=[RequireJSON(), JSONTranslator()])
@@ -362,7 +571,15 @@ WEBSERVER = Webserver(Database, APP)
 CONFIGURE = Configure(Database)
 REGISTER = Register(Database)
 SUB_SUITE = SubSuite(Database)
+RELEASE = Release(Database)
+DURATIONS = Durations(Database)
+WARM_POOLS = WarmPools(Database)
+LEASES = Leases(Database)
 FALCON_APP.add_route("/", WEBSERVER)
 FALCON_APP.add_route("/configure", CONFIGURE)
 FALCON_APP.add_route("/register", REGISTER)
 FALCON_APP.add_route("/sub_suite", SUB_SUITE)
+FALCON_APP.add_route("/release", RELEASE)
+FALCON_APP.add_route("/durations", DURATIONS)
+FALCON_APP.add_route("/warm_pool", WARM_POOLS)
+FALCON_APP.add_route("/lease", LEASES)
@@ -21,6 +21,7 @@ import logging
 from copy import deepcopy
 
 import requests
+from provider_http import get_session, poll_delays
 
 from ..exceptions import (
     ExecutionSpaceCheckinFailed,
@@ -37,7 +38,8 @@ class ExternalProvider:
 
     {
         "status": {
-            "host": "host to status endpoint"
+            "host": "host to status endpoint",
+            "long_poll": "optional, seconds for the provider to hold status requests"
         },
         "start": {
             "host": "host to start endpoint"
@@ -113,7 +115,7 @@ class ExternalProvider:
             else:
                 time.sleep(2)
             try:
-                response = requests.post(
+                response = get_session(host).post(
                     host, json=execution_spaces, headers={"X-ETOS-ID": self.identifier}
                 )
                 if response.status_code == requests.codes["no_content"]:
@@ -159,23 +161,70 @@ class ExternalProvider:
             "dataset": self.dataset.get("dataset"),
             "context": self.dataset.get("context"),
         }
-        response_iterator = self.etos.http.retry(
-            "POST",
-            self.ruleset.get("start", {}).get("host"),
-            json=data,
+        host = self.ruleset.get("start", {}).get("host")
+        timeout = time.time() + int(os.getenv("ETOS_DEFAULT_HTTP_TIMEOUT", "3600"))
+        first_iteration = True
+        while time.time() < timeout:
+            if first_iteration:
+                first_iteration = False
+            else:
+                time.sleep(2)
+            try:
+                response = get_session(host).post(
+                    host, json=data, headers={"X-ETOS-ID": self.identifier}
+                )
+                response.raise_for_status()
+                return response.json().get("id")
+            except (
+                ConnectionError,
+                JSONDecodeError,
+                requests.exceptions.RequestException,
+            ):
+                self.logger.error("Could not start external provider %r", self.id)
+                continue
+        raise TimeoutError(f"Unable to start external provider {self.id!r}")
+
+    @property
+    def wait_timeout(self):
+        """Time to wait for the external execution space provider to finish a request.
+
+        :return: Timeout in seconds.
+        :rtype: int
+        """
+        return self.etos.config.get("WAIT_FOR_EXECUTION_SPACE_TIMEOUT")
+
+    def status(self, provider_id, deadline):
+        """Send a single status request to an external execution space provider.
+
+        :raises: ExecutionSpaceCheckoutFailed: If the external provider request failed.
+
+        :param provider_id: The ID of the external execution space provider request.
+        :type provider_id: str
+        :param deadline: Time, as returned by :func:`time.time`, to stop waiting at.
+        :type deadline: float
+        :return: The response from the external execution space provider.
+        :rtype: dict
+        """
+        host = self.ruleset.get("status", {}).get("host")
+        params = {"id": provider_id}
+        request_timeout = None
+        # With long polling the provider holds the status request until the status
+        # changes, or for at most 'long_poll' seconds.
+        long_poll = self.ruleset.get("status", {}).get("long_poll")
+        if long_poll is not None:
+            params["wait"] = max(1, min(long_poll, int(deadline - time.time())))
+            request_timeout = params["wait"] + 10
+        response = get_session(host).get(
+            host,
+            params=params,
             headers={"X-ETOS-ID": self.identifier},
+            timeout=request_timeout,
         )
-        try:
-            for response in response_iterator:
-                return response.get("id")
-        except ConnectionError as http_error:
-            self.logger.error(
-                "Could not start external provider due to a connection error"
-            )
-            raise TimeoutError(
-                f"Unable to start external provider {self.id!r}"
-            ) from http_error
-        raise TimeoutError(f"Unable to start external provider {self.id!r}")
+        self.check_error(response)
+        response = response.json()
+        if response.get("status") == "FAILED":
+            raise ExecutionSpaceCheckoutFailed(response.get("description"))
+        return response
 
     def wait(self, provider_id):
         """Wait for external execution space provider to finish its request.
@@ -187,41 +236,25 @@ class ExternalProvider:
         """
         self.logger.debug(
             "Waiting for external execution space provider (%ds timeout)",
-            self.etos.config.get("WAIT_FOR_EXECUTION_SPACE_TIMEOUT"),
+            self.wait_timeout,
         )
-
-        host = self.ruleset.get("status", {}).get("host")
-        timeout = time.time() + self.etos.config.get("WAIT_FOR_EXECUTION_SPACE_TIMEOUT")
-
-        response = None
-        first_iteration = True
-        while time.time() < timeout:
-            if first_iteration:
-                first_iteration = False
-            else:
-                time.sleep(2)
+        deadline = time.time() + self.wait_timeout
+        delays = poll_delays()
+        polled = time.time()
+        while time.time() < deadline:
+            # Time spent waiting for the previous poll counts towards the delay.
+            time.sleep(max(0, next(delays) - (time.time() - polled)))
+            polled = time.time()
             try:
-                response = requests.get(
-                    host,
-                    params={"id": provider_id},
-                    headers={"X-ETOS-ID": self.identifier},
+                response = self.status(provider_id, deadline)
+            except (ConnectionError, requests.exceptions.Timeout):
+                self.logger.error(
+                    "Error connecting to %r", self.ruleset.get("status", {}).get("host")
                 )
-                self.check_error(response)
-                response = response.json()
-            except ConnectionError:
-                self.logger.error("Error connecting to %r", host)
                 continue
-
-            if response.get("status") == "FAILED":
-                raise ExecutionSpaceCheckoutFailed(response.get("description"))
             if response.get("status") == "DONE":
-                break
-        else:
-            raise TimeoutError(
-                "Status request timed out after "
-                f"{self.etos.config.get('WAIT_FOR_EXECUTION_SPACE_TIMEOUT')}s"
-            )
-        return response
+                return response
+        raise TimeoutError(f"Status request timed out after {self.wait_timeout}s")
 
     def check_error(self, response):
         """Check response for errors and try to translate them to something usable.
@@ -262,6 +295,38 @@ class ExternalProvider:
             for execution_space in response.get("execution_spaces", [])
         ]
 
+    def checkout_response(self, response, minimum_amount, maximum_amount):
+        """Check out the execution spaces from an external execution space provider response.
+
+        Execution spaces above the maximum amount are checked in again.
+
+        :param response: The response from the external execution space provider.
+        :type response: dict
+        :param minimum_amount: Minimum amount of execution spaces to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of execution spaces to checkout.
+        :type maximum_amount: int
+        :return: List of checked out execution spaces.
+        :rtype: list
+        """
+        execution_spaces = self.build_execution_spaces(response)
+        if len(execution_spaces) < minimum_amount:
+            raise ExecutionSpaceNotAvailable(self.id)
+        if len(execution_spaces) > maximum_amount:
+            self.logger.warning(
+                "Too many execution spaces from external execution space provider "
+                "%r. (Expected: %d, Got %d)",
+                self.id,
+                maximum_amount,
+                len(execution_spaces),
+            )
+            extra = execution_spaces[maximum_amount:]
+            execution_spaces = execution_spaces[:maximum_amount]
+            for execution_space in extra:
+                self.checkin(execution_space)
+        self.dataset.add("execution_spaces", deepcopy(execution_spaces))
+        return execution_spaces
+
     def request_and_wait_for_execution_spaces(
         self, minimum_amount=0, maximum_amount=100
     ):
@@ -280,22 +345,9 @@ class ExternalProvider:
         try:
             provider_id = self.start(minimum_amount, maximum_amount)
             response = self.wait(provider_id)
-            execution_spaces = self.build_execution_spaces(response)
-            if len(execution_spaces) < minimum_amount:
-                raise ExecutionSpaceNotAvailable(self.id)
-            if len(execution_spaces) > maximum_amount:
-                self.logger.warning(
-                    "Too many execution spaces from external execution space provider "
-                    "%r. (Expected: %d, Got %d)",
-                    self.id,
-                    maximum_amount,
-                    len(execution_spaces),
-                )
-                extra = execution_spaces[maximum_amount:]
-                execution_spaces = execution_spaces[:maximum_amount]
-                for execution_space in extra:
-                    self.checkin(execution_space)
-            self.dataset.add("execution_spaces", deepcopy(execution_spaces))
+            execution_spaces = self.checkout_response(
+                response, minimum_amount, maximum_amount
+            )
         except:  # pylint:disable=bare-except
             self.checkin_all()
             raise
@@ -22,6 +22,7 @@ from copy import deepcopy
 
 import requests
 from packageurl import PackageURL
+from provider_http import get_session, poll_delays
 
 from ..exceptions import (
     IutCheckinFailed,
@@ -38,7 +39,8 @@ class ExternalProvider:
 
     {
         "status": {
-            "host": "host to status endpoint"
+            "host": "host to status endpoint",
+            "long_poll": "optional, seconds for the provider to hold status requests"
         },
         "start": {
             "host": "host to start endpoint"
@@ -107,7 +109,7 @@ class ExternalProvider:
             else:
                 time.sleep(2)
             try:
-                response = requests.post(
+                response = get_session(host).post(
                     host, json=iuts, headers={"X-ETOS-ID": self.identifier}
                 )
                 if response.status_code == requests.codes["no_content"]:
@@ -152,23 +154,70 @@ class ExternalProvider:
             "dataset": self.dataset.get("dataset"),
             "context": self.dataset.get("context"),
         }
-        response_iterator = self.etos.http.retry(
-            "POST",
-            self.ruleset.get("start", {}).get("host"),
-            json=data,
+        host = self.ruleset.get("start", {}).get("host")
+        timeout = time.time() + int(os.getenv("ETOS_DEFAULT_HTTP_TIMEOUT", "3600"))
+        first_iteration = True
+        while time.time() < timeout:
+            if first_iteration:
+                first_iteration = False
+            else:
+                time.sleep(2)
+            try:
+                response = get_session(host).post(
+                    host, json=data, headers={"X-ETOS-ID": self.identifier}
+                )
+                response.raise_for_status()
+                return response.json().get("id")
+            except (
+                ConnectionError,
+                JSONDecodeError,
+                requests.exceptions.RequestException,
+            ):
+                self.logger.error("Could not start external provider %r", self.id)
+                continue
+        raise TimeoutError(f"Unable to start external provider {self.id!r}")
+
+    @property
+    def wait_timeout(self):
+        """Time to wait for the external IUT provider to finish a request.
+
+        :return: Timeout in seconds.
+        :rtype: int
+        """
+        return self.etos.config.get("WAIT_FOR_IUT_TIMEOUT")
+
+    def status(self, provider_id, deadline):
+        """Send a single status request to an external IUT provider.
+
+        :raises: IutCheckoutFailed: If the external IUT provider request failed.
+
+        :param provider_id: The ID of the external IUT provider request.
+        :type provider_id: str
+        :param deadline: Time, as returned by :func:`time.time`, to stop waiting at.
+        :type deadline: float
+        :return: The response from the external IUT provider.
+        :rtype: dict
+        """
+        host = self.ruleset.get("status", {}).get("host")
+        params = {"id": provider_id}
+        request_timeout = None
+        # With long polling the provider holds the status request until the status
+        # changes, or for at most 'long_poll' seconds.
+        long_poll = self.ruleset.get("status", {}).get("long_poll")
+        if long_poll is not None:
+            params["wait"] = max(1, min(long_poll, int(deadline - time.time())))
+            request_timeout = params["wait"] + 10
+        response = get_session(host).get(
+            host,
+            params=params,
             headers={"X-ETOS-ID": self.identifier},
+            timeout=request_timeout,
         )
-        try:
-            for response in response_iterator:
-                return response.get("id")
-        except ConnectionError as http_error:
-            self.logger.error(
-                "Could not start external provider due to a connection error"
-            )
-            raise TimeoutError(
-                f"Unable to start external provider {self.id!r}"
-            ) from http_error
-        raise TimeoutError(f"Unable to start external provider {self.id!r}")
+        self.check_error(response)
+        response = response.json()
+        if response.get("status") == "FAILED":
+            raise IutCheckoutFailed(response.get("description"))
+        return response
 
     def wait(self, provider_id):
         """Wait for external IUT provider to finish its request.
@@ -179,37 +228,25 @@ class ExternalProvider:
         :rtype: dict
         """
         self.logger.debug(
-            "Waiting for external IUT provider (%ds timeout)",
-            self.etos.config.get("WAIT_FOR_IUT_TIMEOUT"),
+            "Waiting for external IUT provider (%ds timeout)", self.wait_timeout
         )
-
-        host = self.ruleset.get("status", {}).get("host")
-        timeout = time.time() + self.etos.config.get("WAIT_FOR_IUT_TIMEOUT")
-
-        response = None
-        while time.time() < timeout:
-            time.sleep(2)
+        deadline = time.time() + self.wait_timeout
+        delays = poll_delays()
+        polled = time.time()
+        while time.time() < deadline:
+            # Time spent waiting for the previous poll counts towards the delay.
+            time.sleep(max(0, next(delays) - (time.time() - polled)))
+            polled = time.time()
             try:
-                response = requests.get(
-                    host,
-                    params={"id": provider_id},
-                    headers={"X-ETOS-ID": self.identifier},
+                response = self.status(provider_id, deadline)
+            except (ConnectionError, requests.exceptions.Timeout):
+                self.logger.error(
+                    "Error connecting to %r", self.ruleset.get("status", {}).get("host")
                 )
-                self.check_error(response)
-                response = response.json()
-            except ConnectionError:
-                self.logger.error("Error connecting to %r", host)
                 continue
-
-            if response.get("status") == "FAILED":
-                raise IutCheckoutFailed(response.get("description"))
             if response.get("status") == "DONE":
-                break
-        else:
-            raise TimeoutError(
-                f"Status request timed out after {self.etos.config.get('WAIT_FOR_IUT_TIMEOUT')}s"
-            )
-        return response
+                return response
+        raise TimeoutError(f"Status request timed out after {self.wait_timeout}s")
 
     def check_error(self, response):
         """Check response for errors and try to translate them to something usable.
@@ -254,6 +291,37 @@ class ExternalProvider:
             iuts.append(Iut(provider_id=self.id, **iut))
         return iuts
 
+    def checkout_response(self, response, minimum_amount, maximum_amount):
+        """Check out the IUTs from the response of an external IUT provider.
+
+        IUTs above the maximum amount are checked in again.
+
+        :param response: The response from the external IUT provider.
+        :type response: dict
+        :param minimum_amount: Minimum amount of IUTs to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of IUTs to checkout.
+        :type maximum_amount: int
+        :return: List of checked out IUTs.
+        :rtype: list
+        """
+        iuts = self.build_iuts(response)
+        if len(iuts) < minimum_amount:
+            raise IutNotAvailable(self.identity.to_string())
+        if len(iuts) > maximum_amount:
+            self.logger.warning(
+                "Too many IUTs from external IUT provider %r. (Expected: %d, Got %d)",
+                self.id,
+                maximum_amount,
+                len(iuts),
+            )
+            extra = iuts[maximum_amount:]
+            iuts = iuts[:maximum_amount]
+            for iut in extra:
+                self.checkin(iut)
+        self.dataset.add("iuts", deepcopy(iuts))
+        return iuts
+
     def request_and_wait_for_iuts(self, minimum_amount=0, maximum_amount=100):
         """Wait for IUTs from an external IUT provider.
 
@@ -269,21 +337,7 @@ class ExternalProvider:
         try:
             provider_id = self.start(minimum_amount, maximum_amount)
             response = self.wait(provider_id)
-            iuts = self.build_iuts(response)
-            if len(iuts) < minimum_amount:
-                raise IutNotAvailable(self.identity.to_string())
-            if len(iuts) > maximum_amount:
-                self.logger.warning(
-                    "Too many IUTs from external IUT provider %r. (Expected: %d, Got %d)",
-                    self.id,
-                    maximum_amount,
-                    len(iuts),
-                )
-                extra = iuts[maximum_amount:]
-                iuts = iuts[:maximum_amount]
-                for iut in extra:
-                    self.checkin(iut)
-            self.dataset.add("iuts", deepcopy(iuts))
+            iuts = self.checkout_response(response, minimum_amount, maximum_amount)
         except:  # pylint:disable=bare-except
             self.checkin_all()
             raise
@@ -42,7 +42,9 @@ class LogAreaProvider:
         """Check in all checked out log areas."""
 
     @abstractmethod
-    def wait_for_and_checkout_log_areas(self, minimum_amount=0, maximum_amount=100):
+    def wait_for_and_checkout_log_areas(
+        self, minimum_amount=0, maximum_amount=100, contexts=None
+    ):
         """Wait for and checkout log areas from an log area provider.
 
         :raises: LogAreaNotAvailable: If there are no available log areas after timeout.
@@ -51,6 +53,11 @@ class LogAreaProvider:
         :type minimum_amount: int
         :param maximum_amount: Maximum amount of log areas to checkout.
         :type maximum_amount: int
-        :return: List of checked out log areas.
+        :param contexts: Dataset values, such as 'iut' and 'executor', for each log area
+                         that is to be checked out.
+        :type contexts: list
+        :return: List of checked out log areas or, if contexts are given, of context and
+                 log area pairs, so that each log area is matched with the context it
+                 was checked out for.
         :rtype: list
         """
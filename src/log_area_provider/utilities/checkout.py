@@ -36,7 +36,7 @@ class Checkout:  # pylint:disable=too-few-public-methods
         self.jsontas = jsontas
         self.dataset = self.jsontas.dataset
 
-    def checkout(self, log_areas):
+    def checkout(self, log_areas, contexts=None):
         """Checkout a number of log areas from an log area provider.
 
         :raises: LogAreaCheckoutFailed: If checkout failed due to any reason.
@@ -44,27 +44,42 @@ class Checkout:  # pylint:disable=too-few-public-methods
 
         :param log_areas: Log areas to checkout.
         :type log_areas: list
-        :return: Checked out log areas.
+        :param contexts: Dataset values to add when checking out each log area.
+                         Matched, by index, against the log areas.
+        :type contexts: list
+        :return: Checked out log areas or, if contexts are given, context and log area
+                 pairs for the log areas that were checked out.
         :rtype: list
         """
+        if contexts is None:
+            pairs = [({}, log_area) for log_area in log_areas]
+        else:
+            pairs = list(zip(contexts, log_areas))
         # Definition does not have the 'checkout' key. Just return log areas provided.
         if not self.checkout_ruleset:
             self.logger.info("No defined checkout rule.")
-            self.dataset.add("log_areas", log_areas)
-            return log_areas
-
-        fail_message = ""
-        for log_area in reversed(log_areas):
-            self.logger.debug("Checking out log area %r.", log_area)
-            self.dataset.add("log_area", log_area)
-            response = self.jsontas.run(self.checkout_ruleset)
-            if isinstance(response, dict):
-                log_area.update(**response)
-            else:
-                fail_message = response
-                self.logger.error("Unable to checkout %r.", log_area)
-                log_areas.remove(log_area)
+            checked_out = pairs
+        else:
+            checked_out = []
+            fail_message = ""
+            for context, log_area in pairs:
+                self.logger.debug("Checking out log area %r.", log_area)
+                for key, value in context.items():
+                    self.dataset.add(key, value)
+                self.dataset.add("log_area", log_area)
+                response = self.jsontas.run(self.checkout_ruleset)
+                if isinstance(response, dict):
+                    log_area.update(**response)
+                    checked_out.append((context, log_area))
+                else:
+                    fail_message = response
+                    self.logger.error("Unable to checkout %r.", log_area)
+            if not checked_out:
+                raise LogAreaCheckoutFailed(
+                    f"All LogAreas failed checkout. {fail_message}"
+                )
+        log_areas = [log_area for _, log_area in checked_out]
         self.dataset.add("log_areas", deepcopy(log_areas))
-        if not log_areas:
-            raise LogAreaCheckoutFailed(f"All LogAreas failed checkout. {fail_message}")
-        return log_areas
+        if contexts is None:
+            return log_areas
+        return checked_out
@@ -21,6 +21,7 @@ import logging
 from copy import deepcopy
 
 import requests
+from provider_http import get_session, poll_delays
 
 from ..exceptions import (
     LogAreaCheckinFailed,
@@ -37,7 +38,8 @@ class ExternalProvider:
 
     {
         "status": {
-            "host": "host to status endpoint"
+            "host": "host to status endpoint",
+            "long_poll": "optional, seconds for the provider to hold status requests"
         },
         "start": {
             "host": "host to start endpoint"
@@ -106,7 +108,7 @@ class ExternalProvider:
             else:
                 time.sleep(2)
             try:
-                response = requests.post(
+                response = get_session(host).post(
                     host, json=log_areas, headers={"X-ETOS-ID": self.identifier}
                 )
                 if response.status_code == requests.codes["no_content"]:
@@ -129,13 +131,15 @@ class ExternalProvider:
         self.logger.debug("Checking in all checked out log areas")
         self.checkin(self.dataset.get("logs", []))
 
-    def start(self, minimum_amount, maximum_amount):
+    def start(self, minimum_amount, maximum_amount, contexts=None):
         """Send a start request to an external log area provider.
 
         :param minimum_amount: Minimum amount of log areas to request.
         :type minimum_amount: int
         :param maximum_amount: Maximum amount of log areas to request.
         :type maximum_amount: int
+        :param contexts: Dataset values, such as 'iut' and 'executor', for each log area.
+        :type contexts: list
         :return: The ID of the external log area provider request.
         :rtype: str
         """
@@ -151,23 +155,78 @@ class ExternalProvider:
             "dataset": self.dataset.get("dataset"),
             "context": self.dataset.get("context"),
         }
-        response_iterator = self.etos.http.retry(
-            "POST",
-            self.ruleset.get("start", {}).get("host"),
-            json=data,
+        if contexts is not None:
+            data["contexts"] = [
+                {
+                    key: getattr(value, "as_dict", value)
+                    for key, value in context.items()
+                }
+                for context in contexts
+            ]
+        host = self.ruleset.get("start", {}).get("host")
+        timeout = time.time() + int(os.getenv("ETOS_DEFAULT_HTTP_TIMEOUT", "3600"))
+        first_iteration = True
+        while time.time() < timeout:
+            if first_iteration:
+                first_iteration = False
+            else:
+                time.sleep(2)
+            try:
+                response = get_session(host).post(
+                    host, json=data, headers={"X-ETOS-ID": self.identifier}
+                )
+                response.raise_for_status()
+                return response.json().get("id")
+            except (
+                ConnectionError,
+                JSONDecodeError,
+                requests.exceptions.RequestException,
+            ):
+                self.logger.error("Could not start external provider %r", self.id)
+                continue
+        raise TimeoutError(f"Unable to start external provider {self.id!r}")
+
+    @property
+    def wait_timeout(self):
+        """Time to wait for the external log area provider to finish a request.
+
+        :return: Timeout in seconds.
+        :rtype: int
+        """
+        return self.etos.config.get("WAIT_FOR_LOG_AREA_TIMEOUT")
+
+    def status(self, provider_id, deadline):
+        """Send a single status request to an external log area provider.
+
+        :raises: LogAreaCheckoutFailed: If the external provider request failed.
+
+        :param provider_id: The ID of the external log area provider request.
+        :type provider_id: str
+        :param deadline: Time, as returned by :func:`time.time`, to stop waiting at.
+        :type deadline: float
+        :return: The response from the external log area provider.
+        :rtype: dict
+        """
+        host = self.ruleset.get("status", {}).get("host")
+        params = {"id": provider_id}
+        request_timeout = None
+        # With long polling the provider holds the status request until the status
+        # changes, or for at most 'long_poll' seconds.
+        long_poll = self.ruleset.get("status", {}).get("long_poll")
+        if long_poll is not None:
+            params["wait"] = max(1, min(long_poll, int(deadline - time.time())))
+            request_timeout = params["wait"] + 10
+        response = get_session(host).get(
+            host,
+            params=params,
             headers={"X-ETOS-ID": self.identifier},
+            timeout=request_timeout,
         )
-        try:
-            for response in response_iterator:
-                return response.get("id")
-        except ConnectionError as http_error:
-            self.logger.error(
-                "Could not start external provider due to a connection error"
-            )
-            raise TimeoutError(
-                f"Unable to start external provider {self.id!r}"
-            ) from http_error
-        raise TimeoutError(f"Unable to start external provider {self.id!r}")
+        self.check_error(response)
+        response = response.json()
+        if response.get("status") == "FAILED":
+            raise LogAreaCheckoutFailed(response.get("description"))
+        return response
 
     def wait(self, provider_id):
         """Wait for external log area provider to finish its request.
@@ -178,42 +237,25 @@ class ExternalProvider:
         :rtype: dict
         """
         self.logger.debug(
-            "Waiting for external log area provider (%ds timeout)",
-            self.etos.config.get("WAIT_FOR_LOG_AREA_TIMEOUT"),
+            "Waiting for external log area provider (%ds timeout)", self.wait_timeout
         )
-
-        host = self.ruleset.get("status", {}).get("host")
-        timeout = time.time() + self.etos.config.get("WAIT_FOR_LOG_AREA_TIMEOUT")
-
-        response = None
-        first_iteration = True
-        while time.time() < timeout:
-            if first_iteration:
-                first_iteration = False
-            else:
-                time.sleep(2)
+        deadline = time.time() + self.wait_timeout
+        delays = poll_delays()
+        polled = time.time()
+        while time.time() < deadline:
+            # Time spent waiting for the previous poll counts towards the delay.
+            time.sleep(max(0, next(delays) - (time.time() - polled)))
+            polled = time.time()
             try:
-                response = requests.get(
-                    host,
-                    params={"id": provider_id},
-                    headers={"X-ETOS-ID": self.identifier},
+                response = self.status(provider_id, deadline)
+            except (ConnectionError, requests.exceptions.Timeout):
+                self.logger.error(
+                    "Error connecting to %r", self.ruleset.get("status", {}).get("host")
                 )
-                self.check_error(response)
-                response = response.json()
-            except ConnectionError:
-                self.logger.error("Error connecting to %r", host)
                 continue
-
-            if response.get("status") == "FAILED":
-                raise LogAreaCheckoutFailed(response.get("description"))
             if response.get("status") == "DONE":
-                break
-        else:
-            raise TimeoutError(
-                "Status request timed out after "
-                f"{self.etos.config.get('WAIT_FOR_LOG_AREA_TIMEOUT')}s"
-            )
-        return response
+                return response
+        raise TimeoutError(f"Status request timed out after {self.wait_timeout}s")
 
     def check_error(self, response):
         """Check response for errors and try to translate them to something usable.
@@ -254,41 +296,108 @@ class ExternalProvider:
             for log_area in response.get("log_areas", [])
         ]
 
-    def request_and_wait_for_log_areas(self, minimum_amount=0, maximum_amount=100):
+    def checkout_response(
+        self, response, minimum_amount, maximum_amount, contexts=None
+    ):
+        """Check out the log areas from the response of an external log area provider.
+
+        Log areas above the maximum amount are checked in again.
+
+        :raises: LogAreaCheckoutFailed: If contexts are given and the log areas cannot
+                                        be matched with them.
+
+        :param response: The response from the external log area provider.
+        :type response: dict
+        :param minimum_amount: Minimum amount of log areas to checkout.
+        :type minimum_amount: int
+        :param maximum_amount: Maximum amount of log areas to checkout.
+        :type maximum_amount: int
+        :param contexts: Contexts that the log areas were requested for.
+        :type contexts: list
+        :return: List of checked out log areas or, if contexts are given, of context and
+                 log area pairs.
+        :rtype: list
+        """
+        indexes = [
+            log_area.pop("context", None) for log_area in response.get("log_areas", [])
+        ]
+        log_areas = self.build_log_areas(response)
+        if len(log_areas) < minimum_amount:
+            raise LogAreaNotAvailable(self.id)
+        if len(log_areas) > maximum_amount:
+            self.logger.warning(
+                "Too many log areas from external log area provider "
+                "%r. (Expected: %d, Got %d)",
+                self.id,
+                maximum_amount,
+                len(log_areas),
+            )
+            extra = log_areas[maximum_amount:]
+            log_areas = log_areas[:maximum_amount]
+            for log_area in extra:
+                self.checkin(log_area)
+        self.dataset.add("logs", deepcopy(log_areas))
+        if contexts is None:
+            return log_areas
+        return self.match_contexts(log_areas, indexes[: len(log_areas)], contexts)
+
+    def match_contexts(self, log_areas, indexes, contexts):
+        """Match checked out log areas with the contexts they were checked out for.
+
+        :raises: LogAreaCheckoutFailed: If a log area does not have the index of a
+                                        context, or if two log areas have the same.
+
+        :param log_areas: Checked out log areas.
+        :type log_areas: list
+        :param indexes: Index of the context of each log area, from the response.
+        :type indexes: list
+        :param contexts: Contexts that the log areas were requested for.
+        :type contexts: list
+        :return: Context and log area pairs.
+        :rtype: list
+        """
+        valid = all(
+            isinstance(index, int) and 0 <= index < len(contexts) for index in indexes
+        )
+        if not valid or len(set(indexes)) != len(indexes):
+            raise LogAreaCheckoutFailed(
+                f"External provider {self.id!r} did not return one log area per "
+                f"context, got context indexes {indexes} for {len(contexts)} contexts"
+            )
+        return [
+            (contexts[index], log_area) for index, log_area in zip(indexes, log_areas)
+        ]
+
+    def request_and_wait_for_log_areas(
+        self, minimum_amount=0, maximum_amount=100, contexts=None
+    ):
         """Wait for log areas from an external log area provider.
 
         :raises: LogAreaNotAvailable: If there are not available log areas after timeout.
+        :raises: LogAreaCheckoutFailed: If contexts are given and the log areas cannot
+                                        be matched with them.
 
         :param minimum_amount: Minimum amount of log areas to checkout.
         :type minimum_amount: int
         :param maximum_amount: Maximum amount of log areas to checkout.
         :type maximum_amount: int
-        :return: List of checked out log areas.
+        :param contexts: Dataset values, such as 'iut' and 'executor', for each log area.
+                         The external log area provider shall return each log area with
+                         a 'context' key, the index of the context it was checked out for.
+        :type contexts: list
+        :return: List of checked out log areas or, if contexts are given, of context and
+                 log area pairs.
         :rtype: list
         """
         try:
-            provider_id = self.start(minimum_amount, maximum_amount)
+            provider_id = self.start(minimum_amount, maximum_amount, contexts)
             response = self.wait(provider_id)
-            log_areas = self.build_log_areas(response)
-            if len(log_areas) < minimum_amount:
-                raise LogAreaNotAvailable(self.id)
-            if len(log_areas) > maximum_amount:
-                self.logger.warning(
-                    "Too many log areas from external log area provider "
-                    "%r. (Expected: %d, Got %d)",
-                    self.id,
-                    maximum_amount,
-                    len(log_areas),
-                )
-                extra = log_areas[maximum_amount:]
-                log_areas = log_areas[:maximum_amount]
-                for log_area in extra:
-                    self.checkin(log_area)
-            self.dataset.add("logs", deepcopy(log_areas))
+            return self.checkout_response(
+                response, minimum_amount, maximum_amount, contexts
+            )
         except:  # pylint:disable=bare-except
             self.checkin_all()
             raise
-        return log_areas
 
     # Compatibility with the JSONTas providers.
     wait_for_and_checkout_log_areas = request_and_wait_for_log_areas
@@ -49,16 +49,18 @@ class JSONTasProvider:
         self.id = self.ruleset.get("id")  # pylint:disable=invalid-name
         self.logger.info("Initialized log area provider %r", self.id)
 
-    def checkout(self, available_log_areas):
+    def checkout(self, available_log_areas, contexts=None):
         """Checkout a number of log areas from an log area provider.
 
         :param available_log_areas: Log areas to checkout.
         :type available_log_areas: list
+        :param contexts: Dataset values to add when checking out each log area.
+        :type contexts: list
         :return: Checked out log areas.
         :rtype: list
         """
         checkout_log_areas = Checkout(self.jsontas, self.ruleset.get("checkout"))
-        return checkout_log_areas.checkout(available_log_areas)
+        return checkout_log_areas.checkout(available_log_areas, contexts)
 
     def list(self, amount):
         """List log areas in order to find out which are available or not.
@@ -85,7 +87,9 @@ class JSONTasProvider:
         checkin_log_areas = Checkin(self.jsontas, self.ruleset.get("checkin"))
         checkin_log_areas.checkin(log_area)
 
-    def wait_for_and_checkout_log_areas(self, minimum_amount=0, maximum_amount=100):
+    def wait_for_and_checkout_log_areas(
+        self, minimum_amount=0, maximum_amount=100, contexts=None
+    ):
         """Wait for and checkout log areas from an log area provider.
 
         :raises: LogAreaNotAvailable: If there are no available log areas after timeout.
@@ -94,7 +98,10 @@ class JSONTasProvider:
         :type minimum_amount: int
         :param maximum_amount: Maximum amount of log areas to checkout.
         :type maximum_amount: int
-        :return: List of checked out log areas.
+        :param contexts: Dataset values to add when checking out each log area.
+        :type contexts: list
+        :return: List of checked out log areas or, if contexts are given, of context and
+                 log area pairs.
         :rtype: list
         """
         timeout = time.time() + self.etos.config.get("WAIT_FOR_LOG_AREA_TIMEOUT")
@@ -115,7 +122,7 @@ class JSONTasProvider:
                     )
                     raise NotEnoughLogAreasAvailable(self.id)
 
-                checked_out_log_areas = self.checkout(available_log_areas)
+                checked_out_log_areas = self.checkout(available_log_areas, contexts)
                 self.logger.info("Checked out log areas:")
                 for log_area in checked_out_log_areas:
                     self.logger.info(log_area)
@@ -0,0 +1,83 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Pooled HTTP sessions and status polling schedule for external providers."""
+import os
+import random
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SESSIONS = {}
+LOCK = Lock()
+
+
+def get_session(url):
+    """Get the pooled HTTP session shared by all requests to the host of a URL.
+
+    The number of pooled connections per host is set with
+    'ETOS_EXTERNAL_PROVIDER_POOL_SIZE' and keep-alive can be disabled by setting
+    'ETOS_EXTERNAL_PROVIDER_KEEP_ALIVE' to 'false'.
+
+    :param url: URL to get a session for.
+    :type url: str
+    :return: HTTP session for the host of the URL.
+    :rtype: :obj:`requests.Session`
+    """
+    parsed = urlsplit(url)
+    key = (parsed.scheme, parsed.netloc)
+    with LOCK:
+        session = SESSIONS.get(key)
+        if session is None:
+            pool_size = int(os.getenv("ETOS_EXTERNAL_PROVIDER_POOL_SIZE", "10"))
+            session = requests.Session()
+            session.mount(
+                f"{parsed.scheme}://",
+                HTTPAdapter(pool_connections=1, pool_maxsize=pool_size),
+            )
+            if os.getenv("ETOS_EXTERNAL_PROVIDER_KEEP_ALIVE", "true").lower() != "true":
+                session.headers["Connection"] = "close"
+            SESSIONS[key] = session
+    return session
+
+
+def poll_delays(minimum=None, maximum=None, factor=2):
+    """Delays between status polls, growing exponentially with jitter.
+
+    The first delay is 'minimum' seconds and every following delay is 'factor' times
+    longer, up to 'maximum' seconds. Each delay is randomized to between half of and
+    the full delay, so that providers are not polled in lockstep.
+    The defaults are set with 'ETOS_EXTERNAL_PROVIDER_POLL_MINIMUM' and
+    'ETOS_EXTERNAL_PROVIDER_POLL_MAXIMUM'.
+
+    :param minimum: Delay, in seconds, before the first poll.
+    :type minimum: float
+    :param maximum: Longest delay, in seconds, between two polls.
+    :type maximum: float
+    :param factor: How much longer each delay is than the one before.
+    :type factor: float
+    :return: Infinite generator of delays, in seconds.
+    :rtype: generator
+    """
+    if minimum is None:
+        minimum = float(os.getenv("ETOS_EXTERNAL_PROVIDER_POLL_MINIMUM", "0.2"))
+    if maximum is None:
+        maximum = float(os.getenv("ETOS_EXTERNAL_PROVIDER_POLL_MAXIMUM", "10"))
+    delay = minimum
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * factor, maximum)
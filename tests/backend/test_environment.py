@@ -16,6 +16,7 @@
 """Tests for the environment backend system."""
 import logging
 import json
+import time
 from typing import OrderedDict
 import unittest
 
@@ -25,13 +26,21 @@ from jsontas.jsontas import JsonTas
 
 from environment_provider_api.backend.environment import (
     check_environment_status,
+    evict_warm_pools,
     get_environment_id,
     get_release_id,
+    reap_expired_leases,
+    release_environments,
     release_full_environment,
     request_environment,
 )
 from environment_provider_api.backend.common import get_suite_id
+from environment_provider.lib.database_batch import DatabaseBatch
+from environment_provider.lib.leases import LeaseStore
 from environment_provider.lib.registry import ProviderRegistry
+from environment_provider.lib.sub_suite_store import SubSuiteStore
+from environment_provider.lib.warm_pool import WarmPool
+from log_area_provider.log_area import LogArea
 from tests.library.fake_celery import FakeCelery, Task
 from tests.library.fake_request import FakeRequest
 from tests.library.fake_database import FakeDatabase
@@ -161,7 +170,6 @@ class TestEnvironmentBackend(unittest.TestCase):
         self.logger.info("STEP: Attempt to release an environment.")
         success, _ = release_full_environment(
             etos,
-            jsontas,
             registry,
             worker.AsyncResult(test_release_id),
             test_release_id,
@@ -261,7 +269,6 @@ class TestEnvironmentBackend(unittest.TestCase):
         )
         success, _ = release_full_environment(
             etos,
-            jsontas,
             registry,
             worker.AsyncResult(test_release_id),
             test_release_id,
@@ -271,6 +278,237 @@ class TestEnvironmentBackend(unittest.TestCase):
         self.assertFalse(success)
         self.assertIsNone(worker.AsyncResult(test_release_id))
 
+    def test_release_environments(self):
+        """Test that several environments can be released at once, with a result per ID.
+
+        Approval criteria:
+            - Each environment shall get its own release result.
+            - Only successfully released environments shall be removed from the database.
+
+        Test steps:
+            1. Store two environments, one with a provider that fails to check in.
+            2. Release both environments and one environment that does not exist.
+            3. Verify that each environment got the correct result.
+            4. Verify that only the released environment was removed.
+        """
+        database = FakeDatabase()
+        providers = [
+            ("EnvironmentProvider:IUTProviders", "iut", "iut_provider_test"),
+            ("EnvironmentProvider:LogAreaProviders", "log", "log_area_provider_test"),
+            (
+                "EnvironmentProvider:ExecutionSpaceProviders",
+                "execution_space",
+                "execution_space_provider_test",
+            ),
+        ]
+        for key, name, provider_id in providers:
+            database.writer.hset(
+                key,
+                provider_id,
+                json.dumps(
+                    {
+                        name: {
+                            "id": provider_id,
+                            "list": {"available": [], "possible": []},
+                        }
+                    }
+                ),
+            )
+        database.writer.hset(
+            "EnvironmentProvider:ExecutionSpaceProviders",
+            "failing_execution_space_provider",
+            json.dumps(
+                {
+                    "execution_space": {
+                        "id": "failing_execution_space_provider",
+                        "list": {"available": [], "possible": []},
+                        "checkin": False,
+                    }
+                }
+            ),
+        )
+        etos = ETOS("", "", "")
+        registry = ProviderRegistry(etos, JsonTas(), database)
+        sub_suite_store = SubSuiteStore(database)
+
+        self.logger.info(
+            "STEP: Store two environments, one with a provider that fails to check in."
+        )
+        environments = {
+            "released": "a8e0dd9e-6c6e-4d6e-8a4c-0c1b1a6e1c0b",
+            "failing": "2b7c0bd4-8f1b-4b4c-9d6a-3c2a7f0a5e2d",
+        }
+        with DatabaseBatch(database) as batch:
+            for environment_id, identifier in environments.items():
+                sub_suite_store.write(
+                    batch,
+                    identifier,
+                    {
+                        "suite_id": "suite_id",
+                        "iut": {"id": "iut", "provider_id": "iut_provider_test"},
+                        "log_area": {
+                            "id": "log_area",
+                            "provider_id": "log_area_provider_test",
+                        },
+                        "executor": {
+                            "id": "executor",
+                            "provider_id": (
+                                "execution_space_provider_test"
+                                if environment_id == "released"
+                                else "failing_execution_space_provider"
+                            ),
+                        },
+                    },
+                )
+                sub_suite_store.write_event_id(batch, identifier, environment_id)
+
+        self.logger.info(
+            "STEP: Release both environments and one environment that does not exist."
+        )
+        results = release_environments(
+            etos, registry, ["released", "failing", "missing"]
+        )
+
+        self.logger.info("STEP: Verify that each environment got the correct result.")
+        self.assertDictEqual(results["released"], {"status": "SUCCESS"})
+        self.assertEqual(results["failing"]["status"], "FAILURE")
+        self.assertEqual(results["failing"]["error"], "Failed to release environment")
+        self.assertEqual(results["missing"]["status"], "FAILURE")
+
+        self.logger.info("STEP: Verify that only the released environment was removed.")
+        self.assertFalse(sub_suite_store.exists(environments["released"]))
+        self.assertTrue(sub_suite_store.exists(environments["failing"]))
+
+    def test_reap_expired_leases(self):
+        """Test that the resources of sub suites with expired leases are checked in.
+
+        Approval criteria:
+            - Sub suites with expired leases shall be checked in and removed.
+            - Sub suites with leases that have not expired shall be kept.
+            - Resources with expired leases shall be checked in and released.
+
+        Test steps:
+            1. Store two sub suites and lease them, expiring one of the leases.
+            2. Lease a checked out log area and expire its lease.
+            3. Reap expired leases.
+            4. Verify that only the sub suite and log area with expired leases were reaped.
+        """
+        database = FakeDatabase()
+        providers = [
+            ("EnvironmentProvider:IUTProviders", "iut", "iut_provider_test"),
+            ("EnvironmentProvider:LogAreaProviders", "log", "log_area_provider_test"),
+            (
+                "EnvironmentProvider:ExecutionSpaceProviders",
+                "execution_space",
+                "execution_space_provider_test",
+            ),
+        ]
+        for key, name, provider_id in providers:
+            database.writer.hset(
+                key,
+                provider_id,
+                json.dumps(
+                    {
+                        name: {
+                            "id": provider_id,
+                            "list": {"available": [], "possible": []},
+                        }
+                    }
+                ),
+            )
+        etos = ETOS("", "", "")
+        registry = ProviderRegistry(etos, JsonTas(), database)
+        sub_suite_store = SubSuiteStore(database)
+        lease_store = LeaseStore(database, ttl=60)
+
+        self.logger.info(
+            "STEP: Store two sub suites and lease them, expiring one of the leases."
+        )
+        with DatabaseBatch(database) as batch:
+            for identifier in ("expired", "active"):
+                sub_suite_store.write(
+                    batch,
+                    identifier,
+                    {
+                        "suite_id": "suite_id",
+                        "iut": {"id": "iut", "provider_id": "iut_provider_test"},
+                        "log_area": {
+                            "id": "log_area",
+                            "provider_id": "log_area_provider_test",
+                        },
+                        "executor": {
+                            "id": "executor",
+                            "provider_id": "execution_space_provider_test",
+                        },
+                    },
+                )
+            lease_store.grant(batch, "expired", "active")
+        database.writer.zadd(LeaseStore.index, {"expired": 0})
+
+        self.logger.info("STEP: Lease a checked out log area and expire its lease.")
+        resource_lease = lease_store.grant_resources(
+            "suite_id",
+            "log_area",
+            LogArea(provider_id="log_area_provider_test", id="log_area"),
+        )[0]
+        database.writer.zadd(LeaseStore.index, {resource_lease: 0})
+
+        self.logger.info("STEP: Reap expired leases.")
+        reaped, failures = reap_expired_leases(etos, registry, lease_store)
+
+        self.logger.info(
+            "STEP: Verify that only the sub suite and log area with expired leases were reaped."
+        )
+        self.assertCountEqual(reaped, ["expired", resource_lease])
+        self.assertDictEqual(failures, {})
+        self.assertDictEqual(lease_store.read_resources([resource_lease]), {})
+        self.assertFalse(sub_suite_store.exists("expired"))
+        self.assertTrue(sub_suite_store.exists("active"))
+
+    def test_evict_warm_pools(self):
+        """Test that resources that are too old are evicted from warm pools and checked in.
+
+        Approval criteria:
+            - Resources older than the maximum age shall be checked in.
+            - Resources that are not too old shall be kept in the pool.
+
+        Test steps:
+            1. Put an old and a new log area in a warm pool.
+            2. Evict the warm pools.
+            3. Verify that only the old log area was evicted and checked in.
+        """
+        database = FakeDatabase()
+        database.writer.hset(
+            "EnvironmentProvider:LogAreaProviders",
+            "log_area_provider_test",
+            json.dumps(
+                {
+                    "log": {
+                        "id": "log_area_provider_test",
+                        "list": {"available": [], "possible": []},
+                    }
+                }
+            ),
+        )
+        etos = ETOS("", "", "")
+        registry = ProviderRegistry(etos, JsonTas(), database)
+        pool = WarmPool(database, "log_area:log_area_provider_test:1", 2, max_age=60)
+
+        self.logger.info("STEP: Put an old and a new log area in a warm pool.")
+        pool.put([{"id": "new", "provider_id": "log_area_provider_test"}])
+        old = json.dumps({"id": "old", "provider_id": "log_area_provider_test"})
+        database.writer.zadd(pool.key, {old: time.time() - 120})
+
+        self.logger.info("STEP: Evict the warm pools.")
+        evicted, failures = evict_warm_pools(etos, registry, 60)
+
+        self.logger.info(
+            "STEP: Verify that only the old log area was evicted and checked in."
+        )
+        self.assertEqual(evicted, 1)
+        self.assertDictEqual(failures, {})
+        self.assertListEqual([resource["id"] for resource in pool.take(2)], ["new"])
+
     def test_release_full_environment_no_task_result(self):
         """Test that it is not possible to release an environment without task results.
 
@@ -290,7 +528,6 @@ class TestEnvironmentBackend(unittest.TestCase):
         self.logger.info("STEP: Attempt to release an environment without a task ID.")
         success, _ = release_full_environment(
             etos,
-            jsontas,
             registry,
             worker.AsyncResult(test_release_id),
             test_release_id,
@@ -20,7 +20,11 @@ import json
 
 import falcon
 
-from environment_provider_api.backend.subsuite import get_id, get_sub_suite
+from environment_provider_api.backend.subsuite import (
+    accepts_deflate,
+    get_id,
+    get_sub_suite,
+)
 from tests.library.fake_request import FakeRequest
 from tests.library.fake_database import FakeDatabase
 
@@ -105,3 +109,33 @@ class TestSubSuiteBackend(unittest.TestCase):
         suite = get_sub_suite(FakeDatabase(), 1)
         self.logger.info("STEP: Verify that the sub suite returned is None.")
         self.assertIsNone(suite)
+
+    def test_accepts_deflate(self):
+        """Test that the subsuite backend can tell whether a client accepts deflate.
+
+        Approval criteria:
+            - The subsuite backend shall honor the Accept-Encoding header.
+
+        Test steps:
+            1. Check different Accept-Encoding headers with the subsuite backend.
+            2. Verify that deflate is only accepted when the header allows it.
+        """
+        headers = {
+            None: False,
+            "gzip": False,
+            "gzip, deflate, br": True,
+            "deflate;q=0.5": True,
+            "deflate;q=0": False,
+            "*": True,
+            "*;q=0": False,
+        }
+        self.logger.info(
+            "STEP: Check different Accept-Encoding headers with the subsuite backend."
+        )
+        for header, accepted in headers.items():
+            request = FakeRequest()
+            request.fake_headers["Accept-Encoding"] = header
+            self.logger.info(
+                "STEP: Verify that deflate is only accepted when the header allows it."
+            )
+            self.assertEqual(accepts_deflate(request), accepted, header)
@@ -0,0 +1,72 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark for the environment provider webserver request contexts.
+
+Compares requests per second to the configure endpoint with a request context built
+for every request, which is what a pool size of 0 does, and with pooled contexts.
+
+Run with::
+
+    PYTHONPATH=src python -m tests.benchmark_webserver
+"""
+import json
+import time
+import logging
+
+from falcon import API
+from falcon.testing import TestClient
+
+from environment_provider_api.context import ContextPool
+from environment_provider_api.webserver import Configure
+from tests.library.fake_database import FakeDatabase
+
+NUMBER_OF_REQUESTS = 2000
+SUITE_ID = "5ef5a01c-8ff9-448d-9ac5-21836a2fa6ff"
+
+
+def client(pool_size):
+    """Create a test client for the configure endpoint.
+
+    :param pool_size: Number of request contexts to keep in the pool.
+    :type pool_size: int
+    :return: Test client for the configure endpoint.
+    :rtype: :obj:`falcon.testing.TestClient`
+    """
+    database = FakeDatabase()
+    database.writer.hset(
+        f"EnvironmentProvider:{SUITE_ID}", "Dataset", json.dumps({"dataset": "test"})
+    )
+    configure = Configure(database)
+    configure.contexts = ContextPool(database, size=pool_size)
+    app = API()
+    app.add_route("/configure", configure)
+    return TestClient(app)
+
+
+def main():
+    """Send requests to the configure endpoint and print requests per second."""
+    logging.disable(logging.CRITICAL)
+    for name, pool_size in (("new context per request", 0), ("pooled contexts", 10)):
+        test_client = client(pool_size)
+        start = time.perf_counter()
+        for _ in range(NUMBER_OF_REQUESTS):
+            test_client.simulate_get("/configure", params={"suite_id": SUITE_ID})
+        elapsed = time.perf_counter() - start
+        print(f"{name:>24}: {NUMBER_OF_REQUESTS / elapsed:9.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
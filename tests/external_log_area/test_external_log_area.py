@@ -24,6 +24,8 @@ from packageurl import PackageURL
 
 from tests.library.fake_server import FakeServer
 
+from execution_space_provider.execution_space import ExecutionSpace
+
 from log_area_provider.utilities.external_provider import ExternalProvider
 from log_area_provider.exceptions import (
     LogAreaCheckinFailed,
@@ -79,6 +81,52 @@ class TestExternalLogArea(unittest.TestCase):
             )
             self.assertEqual(start_id, expected_start_id)
 
+    def test_provider_start_contexts(self):
+        """Test that log area contexts are sent to an external log area provider.
+
+        Approval criteria:
+            - The contexts of each log area shall be sent in the start request.
+
+        Test steps::
+            1. Initialize an external provider.
+            2. Send a start request with contexts.
+            3. Verify that the contexts were sent to the external provider.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        jsontas = JsonTas()
+        jsontas.dataset.merge(
+            {
+                "identity": PackageURL.from_string("pkg:testing/etos"),
+                "artifact_id": "artifactid",
+                "artifact_created": "artifactcreated",
+                "artifact_published": "artifactpublished",
+                "tercc": "tercc",
+                "dataset": {},
+                "context": "context",
+            }
+        )
+        contexts = [
+            {"iut": "iut1", "executor": ExecutionSpace(id="executor1")},
+            {"iut": "iut2", "executor": ExecutionSpace(id="executor2")},
+        ]
+
+        with FakeServer("ok", {"id": "123"}) as server:
+            ruleset = {"id": "test_provider_start", "start": {"host": server.host}}
+            self.logger.info("STEP: Initialize an external provider.")
+            provider = ExternalProvider(etos, jsontas, ruleset)
+            self.logger.info("STEP: Send a start request with contexts.")
+            provider.start(2, 2, contexts)
+            self.logger.info(
+                "STEP: Verify that the contexts were sent to the external provider."
+            )
+            self.assertEqual(
+                server.requests[0]["contexts"],
+                [
+                    {"iut": "iut1", "executor": {"id": "executor1"}},
+                    {"iut": "iut2", "executor": {"id": "executor2"}},
+                ],
+            )
+
     def test_provider_start_http_exception(self):
         """Test that the start method tries again if there's an HTTP error.
 
@@ -592,3 +640,99 @@ class TestExternalLogArea(unittest.TestCase):
             dict_log_areas = [log_area.as_dict for log_area in log_areas]
             test_log_areas = [LogArea(provider_id=provider_id, test_id=test_id).as_dict]
             self.assertEqual(dict_log_areas, test_log_areas)
+
+    def test_request_and_wait_contexts(self):
+        """Test that log areas are matched with the contexts they were checked out for.
+
+        Approval criteria:
+            - Log areas shall be matched with contexts by the index they are returned with.
+            - Log areas that cannot be matched with a context shall fail the checkout.
+
+        Test steps::
+            1. Checkout log areas for two contexts, returned in reverse order.
+            2. Verify that each log area is paired with its own context.
+            3. Checkout log areas for two contexts, both returned for the same context.
+            4. Verify that the checkout fails and the log areas are checked in.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("WAIT_FOR_LOG_AREA_TIMEOUT", 10)
+        jsontas = JsonTas()
+        jsontas.dataset.merge(
+            {
+                "identity": PackageURL.from_string("pkg:testing/etos"),
+                "artifact_id": "artifactid",
+                "artifact_created": "artifactcreated",
+                "artifact_published": "artifactpublished",
+                "tercc": "tercc",
+                "dataset": {},
+                "context": "context",
+            }
+        )
+        contexts = [{"iut": "iut1"}, {"iut": "iut2"}]
+
+        self.logger.info(
+            "STEP: Checkout log areas for two contexts, returned in reverse order."
+        )
+        with FakeServer(
+            ["ok", "ok"],
+            [
+                {"id": "1"},
+                {
+                    "log_areas": [
+                        {"name": "second", "context": 1},
+                        {"name": "first", "context": 0},
+                    ],
+                    "status": "DONE",
+                },
+            ],
+        ) as server:
+            ruleset = {
+                "id": "test_request_and_wait_contexts",
+                "status": {"host": server.host},
+                "start": {"host": server.host},
+            }
+            provider = ExternalProvider(etos, jsontas, ruleset)
+            pairs = provider.request_and_wait_for_log_areas(2, 2, contexts)
+
+        self.logger.info(
+            "STEP: Verify that each log area is paired with its own context."
+        )
+        self.assertListEqual(
+            [(context["iut"], log_area.as_dict) for context, log_area in pairs],
+            [
+                ("iut2", {"provider_id": ruleset["id"], "name": "second"}),
+                ("iut1", {"provider_id": ruleset["id"], "name": "first"}),
+            ],
+        )
+
+        self.logger.info(
+            "STEP: Checkout log areas for two contexts, both returned for the same context."
+        )
+        with FakeServer(
+            ["ok", "ok", "no_content"],
+            [
+                {"id": "1"},
+                {
+                    "log_areas": [
+                        {"name": "first", "context": 0},
+                        {"name": "second", "context": 0},
+                    ],
+                    "status": "DONE",
+                },
+                {},
+            ],
+        ) as server:
+            ruleset = {
+                "id": "test_request_and_wait_contexts",
+                "status": {"host": server.host},
+                "start": {"host": server.host},
+                "stop": {"host": server.host},
+            }
+            provider = ExternalProvider(etos, jsontas, ruleset)
+
+            self.logger.info(
+                "STEP: Verify that the checkout fails and the log areas are checked in."
+            )
+            with self.assertRaises(LogAreaCheckoutFailed):
+                provider.request_and_wait_for_log_areas(2, 2, contexts)
+            self.assertEqual(len(server.requests[-1]), 2)
@@ -15,38 +15,224 @@
 # limitations under the License.
 """Fake database library helpers."""
 from etos_lib.lib.database import Database
+from redis.exceptions import WatchError
 
 # pylint:disable=too-few-public-methods
 
 
+class FakePipeline:
+    """A fake pipeline object for the FakeWriter and FakeReader."""
+
+    def __init__(self, client):
+        """Init."""
+        self._client = client
+        self._commands = []
+        self._watched = None
+        self._immediate = False
+
+    def __enter__(self):
+        """Use the pipeline as a context manager."""
+        return self
+
+    def __exit__(self, *_):
+        """Reset the pipeline."""
+        self._commands = []
+        self._watched = None
+        self._immediate = False
+
+    def __getattr__(self, name):
+        """Queue a command to run on execute, or run it at once if watching keys."""
+        method = getattr(self._client, name)
+
+        def command(*args, **kwargs):
+            if self._immediate:
+                return method(*args, **kwargs)
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return command
+
+    def watch(self, *keys):
+        """Watch keys, running commands at once until 'multi' is called."""
+        self._watched = {key: self._client.snapshot(key) for key in keys}
+        self._immediate = True
+
+    def multi(self):
+        """Start queueing commands again."""
+        self._immediate = False
+
+    def execute(self):
+        """Run all queued commands and return their results.
+
+        Raises WatchError, without running the commands, if a watched key changed.
+        """
+        commands, self._commands = self._commands, []
+        watched, self._watched = self._watched, None
+        for key, snapshot in (watched or {}).items():
+            if self._client.snapshot(key) != snapshot:
+                raise WatchError(f"Watched key {key!r} changed")
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
 class FakeWriter:
     """A fake writer object for the FakeDatabase."""
 
     def __init__(self, db_dict):
         """Init."""
         self._writer_dict = db_dict
+        self._hash_fields = {}
 
-    def set(self, key, value):
+    def set(self, key, value, ex=None, nx=False):  # pylint:disable=unused-argument
         """Write a value to database.
 
         :param key: Key to store value in.
         :type key: any
         :param value: Value to write.
         :type value: str
+        :param ex: Expiry time, ignored by the fake database.
+        :type ex: int
+        :param nx: Only write the value if the key does not exist.
+        :type nx: bool
         """
+        if nx and key in self._writer_dict:
+            return None
         self._writer_dict[key] = value
         return self._writer_dict.get(key)
 
-    def hset(self, key, _id, value):
+    def get(self, key):
+        """Get a single key from database."""
+        return self._writer_dict.get(key)
+
+    def snapshot(self, key):
+        """Get a copy of a key, and of all fields if it is a hash, to detect changes."""
+        return {
+            stored_key: str(value)
+            for stored_key, value in self._writer_dict.items()
+            if isinstance(stored_key, str) and stored_key.startswith(key)
+        }
+
+    def hset(self, key, _id=None, value=None, mapping=None):
         """Set hash into database."""
-        self.set(key + _id, value)
+        if _id is not None:
+            self.set(key + _id, value)
+            self._hash_fields.setdefault(key, set()).add(_id)
+        for field, field_value in (mapping or {}).items():
+            self.set(key + field, field_value)
+            self._hash_fields.setdefault(key, set()).add(field)
+
+    def hget(self, key, _id):
+        """Get hash from database."""
+        return self._writer_dict.get(key + _id)
 
-    def hdel(self, _key, _value):
-        """Delete hash from database."""
+    def hmget(self, key, ids):
+        """Get several hash values from database."""
+        return [self._writer_dict.get(key + _id) for _id in ids]
+
+    def hdel(self, key, *fields):
+        """Delete hash fields from database."""
+        for field in fields:
+            self._writer_dict.pop(key + field, None)
+            self._hash_fields.get(key, set()).discard(field)
 
     def expire(self, _key, _value):
         """Set expiration on database keys."""
 
+    def delete(self, *keys):
+        """Delete keys from database."""
+        for key in keys:
+            self._writer_dict.pop(key, None)
+            for field in self._hash_fields.pop(key, set()):
+                self._writer_dict.pop(key + field, None)
+
+    def hincrby(self, key, _id, amount):
+        """Increment a hash value in database."""
+        self.set(key + _id, int(self._writer_dict.get(key + _id, 0)) + amount)
+
+    def pipeline(self, transaction=True):  # pylint:disable=unused-argument
+        """Create a fake pipeline."""
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping, xx=False, ch=False):
+        """Add members with scores to a sorted set in database.
+
+        With 'xx' only existing members are updated. Returns the number of added
+        members or, with 'ch', the number of added and updated members.
+        """
+        sorted_set = self._writer_dict.setdefault(key, {})
+        if xx:
+            mapping = {
+                member: score
+                for member, score in mapping.items()
+                if member in sorted_set
+            }
+        added = len([member for member in mapping if member not in sorted_set])
+        changed = len(
+            [
+                member
+                for member, score in mapping.items()
+                if sorted_set.get(member) != score
+            ]
+        )
+        sorted_set.update(mapping)
+        return changed if ch else added
+
+    def zscore(self, key, member):
+        """Get the score of a member of a sorted set."""
+        return self._writer_dict.get(key, {}).get(member)
+
+    def zrangebyscore(self, key, minimum, maximum, **limit):
+        """Get members of a sorted set with a score between minimum and maximum.
+
+        The members can be limited with 'start' and 'num'.
+        """
+        members = [
+            member
+            for member, score in self.zrange(key, 0, -1, withscores=True)
+            if float(minimum) <= score <= float(maximum)
+        ]
+        if "start" in limit:
+            members = members[limit["start"] : limit["start"] + limit["num"]]
+        return members
+
+    def zcard(self, key):
+        """Get the number of members in a sorted set."""
+        return len(self._writer_dict.get(key, {}))
+
+    def zrange(self, key, start, end, withscores=False):
+        """Get members of a sorted set, ordered by score."""
+        members = sorted(
+            self._writer_dict.get(key, {}).items(), key=lambda member: member[1]
+        )
+        members = members[start:] if end == -1 else members[start : end + 1]
+        if withscores:
+            return members
+        return [member for member, _ in members]
+
+    def zpopmin(self, key, count=1):
+        """Remove and return the members with the lowest scores from a sorted set."""
+        members = self.zrange(key, 0, count - 1, withscores=True)
+        self.zrem(key, *(member for member, _ in members))
+        return members
+
+    def zrem(self, key, *members):
+        """Remove members from a sorted set."""
+        sorted_set = self._writer_dict.get(key, {})
+        removed = [member for member in members if member in sorted_set]
+        for member in removed:
+            sorted_set.pop(member)
+        return len(removed)
+
+    def zremrangebyrank(self, key, start, end):
+        """Remove members from a sorted set with a rank between start and end."""
+        return self.zrem(key, *self.zrange(key, start, end))
+
+    def zremrangebyscore(self, key, minimum, maximum):
+        """Remove members from a sorted set with a score between minimum and maximum."""
+        sorted_set = self._writer_dict.get(key, {})
+        for member, score in list(sorted_set.items()):
+            if float(minimum) <= score <= float(maximum):
+                sorted_set.pop(member)
+
 
 class FakeReader:
     """A fake reader object for the FakeDatabase."""
@@ -69,6 +255,26 @@ class FakeReader:
         """Get hash from database."""
         return self._reader_dict.get(key + _id)
 
+    def hmget(self, key, ids):
+        """Get several hash values from database."""
+        return [self._reader_dict.get(key + _id) for _id in ids]
+
+    def hexists(self, key, _id):
+        """Check if a hash field exists in database."""
+        return key + _id in self._reader_dict
+
+    def pipeline(self, transaction=True):  # pylint:disable=unused-argument
+        """Create a fake pipeline."""
+        return FakePipeline(self)
+
+    def hgetall(self, key):
+        """Get all hash values from database."""
+        return {
+            _id[len(key) :].encode(): str(value).encode()
+            for _id, value in self._reader_dict.items()
+            if isinstance(_id, str) and _id.startswith(key) and _id != key
+        }
+
 
 class FakeDatabase(Database):
     """A fake database that follows the ETOS library database.
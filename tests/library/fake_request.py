@@ -20,10 +20,22 @@ class FakeRequest:  # pylint:disable=too-few-public-methods
     """Fake request structure."""
 
     force_media_none = False
+    if_none_match = None
 
     def __init__(self):
         """Init some fake parameters."""
         self.fake_params = {}
+        self.fake_headers = {}
+
+    def get_header(self, name):
+        """Get a header from the fake headers dictionary.
+
+        :param name: Name of header to get.
+        :type name: str
+        :return: The value in fake headers.
+        :rtype: str
+        """
+        return self.fake_headers.get(name)
 
     def get_param(self, name):
         """Get a parameter from the fake params dictionary.
@@ -61,3 +73,7 @@ class FakeResponse:  # pylint:disable=too-few-public-methods
         if self.fake_responses is not None:
             self.fake_responses[key] = value
         super().__setattr__(key, value)
+
+    def set_header(self, name, value):
+        """Set a header in the fake responses dictionary."""
+        self.fake_responses.setdefault("headers", {})[name] = value
@@ -74,13 +74,21 @@ class FakeServer:
     def __enter__(self):
         """Figure out free port and start up a fake server in a thread."""
         self.port = self.__free_port()
-        self.mock_server = HTTPServer(("localhost", self.port), Handler)
+        # Each server gets its own handler class so that servers running at the
+        # same time do not share responses.
+        handler = type(
+            "Handler",
+            (Handler,),
+            {
+                "parent": self,
+                "response_code": self.status_name,
+                "response_json": self.response_json,
+            },
+        )
+        self.mock_server = HTTPServer(("localhost", self.port), handler)
         self.thread = Thread(target=self.mock_server.serve_forever)
         self.thread.setDaemon(True)
         self.thread.start()
-        self.mock_server.RequestHandlerClass.parent = self
-        self.mock_server.RequestHandlerClass.response_code = self.status_name
-        self.mock_server.RequestHandlerClass.response_json = self.response_json
         return self
 
     def __exit__(self, *_):
@@ -0,0 +1,67 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark for the environment provider splitter.
+
+Run with::
+
+    PYTHONPATH=src python -m tests.splitter.benchmark_splitter
+"""
+
+import time
+
+from etos_lib import ETOS
+from environment_provider.splitter.split import Splitter
+
+NUMBER_OF_IUTS = 10
+
+
+def test_suite(number_of_recipes):
+    """Create a test suite with recipes and IUTs to split.
+
+    :param number_of_recipes: Number of recipes in the test suite.
+    :type number_of_recipes: int
+    :return: Test suite to split.
+    :rtype: dict
+    """
+    return {
+        "iuts": {
+            f"iut{index}": {"recipes": [], "executor": None}
+            for index in range(NUMBER_OF_IUTS)
+        },
+        "unsplit_recipes": [
+            {
+                "id": f"recipe{index}",
+                "constraints": [{"key": "TEST_RUNNER", "value": "runner"}],
+                "testCase": {"id": f"test_case{index}"},
+            }
+            for index in range(number_of_recipes)
+        ],
+    }
+
+
+def main():
+    """Split test suites of increasing size and print how long each split took."""
+    splitter = Splitter(ETOS("testing_etos", "testing_etos", "testing_etos"), {})
+    for number_of_recipes in (100, 1000, 10000, 100000):
+        suite = test_suite(number_of_recipes)
+        start = time.perf_counter()
+        splitter.split(suite)
+        elapsed = time.perf_counter() - start
+        print(f"{number_of_recipes:>7} recipes: {elapsed * 1000:9.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
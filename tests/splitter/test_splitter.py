@@ -19,6 +19,7 @@ import unittest
 
 from etos_lib import ETOS
 from environment_provider.splitter.split import Splitter
+from environment_provider.splitter.strategies import LongestProcessingTimeFirst
 
 
 class TestSplitter(unittest.TestCase):
@@ -56,3 +57,177 @@ class TestSplitter(unittest.TestCase):
                 0,
                 f"'number_of_iuts' is 0, test_runner got 0 assigned IUTs. {test_runner}]",
             )
+
+    def test_assign_iuts_uses_all_iuts(self) -> None:
+        """Test that all IUTs are assigned, in proportion to the number of tests.
+
+        Approval criteria:
+            - All IUTs shall be assigned when there are fewer IUTs than tests.
+            - IUTs shall be assigned in proportion to the number of tests.
+            - Each IUT shall only be assigned to a single test runner.
+
+        Test steps::
+            1. Assign ten IUTs to three test runners.
+            2. Verify that the IUTs were assigned in proportion to the number of tests.
+            3. Verify that all IUTs were assigned exactly once.
+        """
+        iuts = [f"iut{index}" for index in range(10)]
+        test_runners = {
+            "runner1": {"unsplit_recipes": list(range(1))},
+            "runner2": {"unsplit_recipes": list(range(33))},
+            "runner3": {"unsplit_recipes": list(range(66))},
+        }
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("TOTAL_TEST_COUNT", 100)
+
+        self.logger.info("STEP: Assign ten IUTs to three test runners.")
+        unused = Splitter(etos, {}).assign_iuts(test_runners, iuts)
+
+        self.logger.info(
+            "STEP: Verify that the IUTs were assigned in proportion to the number of tests."
+        )
+        self.assertListEqual(
+            [test_runner["number_of_iuts"] for test_runner in test_runners.values()],
+            [1, 3, 6],
+        )
+
+        self.logger.info("STEP: Verify that all IUTs were assigned exactly once.")
+        self.assertListEqual(unused, [])
+        assigned = [
+            iut for test_runner in test_runners.values() for iut in test_runner["iuts"]
+        ]
+        self.assertListEqual(sorted(assigned), sorted(iuts))
+
+    def test_allocate(self) -> None:
+        """Test the largest remainder allocation of IUTs.
+
+        Approval criteria:
+            - Shares shall be rounded with the largest remainder method.
+            - A test runner shall not get more IUTs than it has tests.
+            - A test runner with tests shall get at least one IUT, if possible.
+
+        Test steps::
+            1. Allocate IUTs for different numbers of IUTs and tests.
+            2. Verify that the allocations are as expected.
+        """
+        self.logger.info("STEP: Allocate IUTs for different numbers of IUTs and tests.")
+        self.logger.info("STEP: Verify that the allocations are as expected.")
+        for number_of_iuts, number_of_tests, expected in (
+            (5, [1, 1, 1], [1, 1, 1]),
+            (7, [5, 5, 5], [3, 2, 2]),
+            (4, [1, 50, 49], [1, 2, 1]),
+            (3, [1, 1, 98], [1, 1, 1]),
+            (2, [1, 1, 98], [1, 0, 1]),
+            (4, [0, 10, 10], [0, 2, 2]),
+        ):
+            self.assertListEqual(
+                Splitter.allocate(number_of_iuts, number_of_tests), expected
+            )
+
+    def test_splitter(self) -> None:
+        """Test that recipes are assigned to IUTs in a round-robin fashion.
+
+        Approval criteria:
+            - Recipes shall be assigned to IUTs in a round-robin fashion.
+            - No recipes shall be left unsplit.
+
+        Test steps::
+            1. Split a test suite with five recipes over two IUTs.
+            2. Verify that the recipes were assigned in a round-robin fashion.
+            3. Verify that no recipes are left unsplit.
+        """
+        test_suite = {
+            "iuts": {
+                "iut1": {"recipes": [], "executor": None},
+                "iut2": {"recipes": [], "executor": None},
+            },
+            "unsplit_recipes": [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 2}, {"id": 5}],
+        }
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+
+        self.logger.info("STEP: Split a test suite with five recipes over two IUTs.")
+        Splitter(etos, {}).split(test_suite)
+
+        self.logger.info(
+            "STEP: Verify that the recipes were assigned in a round-robin fashion."
+        )
+        self.assertListEqual(
+            test_suite["iuts"]["iut1"]["recipes"], [{"id": 1}, {"id": 3}, {"id": 5}]
+        )
+        self.assertListEqual(
+            test_suite["iuts"]["iut2"]["recipes"], [{"id": 2}, {"id": 2}]
+        )
+
+        self.logger.info("STEP: Verify that no recipes are left unsplit.")
+        self.assertListEqual(test_suite["unsplit_recipes"], [])
+
+    def test_split_strategy(self) -> None:
+        """Test that the split strategy can be selected with 'SPLIT_STRATEGY'.
+
+        Approval criteria:
+            - The split strategy in 'SPLIT_STRATEGY' shall be used.
+            - An unknown split strategy shall raise ValueError.
+
+        Test steps::
+            1. Get the split strategy with 'SPLIT_STRATEGY' set to 'lpt'.
+            2. Verify that the longest processing time first strategy is used.
+            3. Verify that an unknown split strategy raises ValueError.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        self.addCleanup(etos.config.set, "SPLIT_STRATEGY", None)
+        splitter = Splitter(etos, {})
+        splitter.durations = {"runner": {"test_case": 10}}
+
+        self.logger.info(
+            "STEP: Get the split strategy with 'SPLIT_STRATEGY' set to 'lpt'."
+        )
+        etos.config.set("SPLIT_STRATEGY", "lpt")
+        strategy = splitter.strategy("runner")
+
+        self.logger.info(
+            "STEP: Verify that the longest processing time first strategy is used."
+        )
+        self.assertIsInstance(strategy, LongestProcessingTimeFirst)
+        self.assertDictEqual(strategy.durations, {"test_case": 10})
+
+        self.logger.info(
+            "STEP: Verify that an unknown split strategy raises ValueError."
+        )
+        etos.config.set("SPLIT_STRATEGY", "unknown")
+        with self.assertRaises(ValueError):
+            splitter.strategy()
+
+    def test_longest_processing_time_first(self) -> None:
+        """Test that the longest processing time first strategy balances durations.
+
+        Approval criteria:
+            - The longest recipes shall be assigned first, to the least loaded IUT.
+            - Recipes with unknown duration shall be expected to take the average duration.
+
+        Test steps::
+            1. Split recipes with known and unknown durations over two IUTs.
+            2. Verify that the expected durations of the IUTs are balanced.
+        """
+        durations = {"slow1": 10, "slow2": 9, "fast1": 1, "fast2": 2, "fast3": 3}
+        recipes = [
+            {"testCase": {"id": test_case}}
+            for test_case in ("fast1", "slow1", "fast2", "unknown", "slow2", "fast3")
+        ]
+        iuts = [{"recipes": []}, {"recipes": []}]
+
+        self.logger.info(
+            "STEP: Split recipes with known and unknown durations over two IUTs."
+        )
+        LongestProcessingTimeFirst(durations).split(iuts, recipes)
+
+        self.logger.info(
+            "STEP: Verify that the expected durations of the IUTs are balanced."
+        )
+        self.assertListEqual(
+            [recipe["testCase"]["id"] for recipe in iuts[0]["recipes"]],
+            ["slow1", "fast3", "fast2"],
+        )
+        self.assertListEqual(
+            [recipe["testCase"]["id"] for recipe in iuts[1]["recipes"]],
+            ["slow2", "unknown", "fast1"],
+        )
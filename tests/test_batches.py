@@ -0,0 +1,199 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the streaming test batches parser."""
+import json
+import logging
+import unittest
+
+from environment_provider.lib.batches import group_by_test_runner, stream_recipes
+
+BATCHES = [
+    {
+        "name": "suite1",
+        "priority": 1,
+        "recipes": [
+            {
+                "id": f"recipe{index}",
+                "constraints": [{"key": "TEST_RUNNER", "value": "runner"}],
+                "testCase": {"id": f"test_case_ö{index}", "version": 1.25},
+            }
+            for index in range(3)
+        ],
+    },
+    {"name": "suite2", "priority": 2, "recipes": []},
+    {"name": "suite3", "priority": 3, "recipes": [{"id": "recipe3"}]},
+]
+
+
+class TestBatches(unittest.TestCase):
+    """Tests for the streaming test batches parser."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_stream_recipes(self):
+        """Test that recipes are parsed the same regardless of how they are chunked.
+
+        Approval criteria:
+            - All recipes shall be yielded together with their test suite.
+
+        Test steps::
+            1. Parse a batches document in chunks of different sizes.
+            2. Verify that all recipes were yielded with their test suite.
+        """
+        document = json.dumps(BATCHES, indent=2).encode("utf-8")
+        expected = [
+            (
+                {"name": test_suite["name"], "priority": test_suite["priority"]},
+                recipe,
+            )
+            for test_suite in BATCHES
+            for recipe in test_suite["recipes"]
+        ]
+        for chunk_size in (1, 7, 64, len(document)):
+            self.logger.info(
+                "STEP: Parse a batches document in chunks of %d bytes.", chunk_size
+            )
+            chunks = (
+                document[index : index + chunk_size]
+                for index in range(0, len(document), chunk_size)
+            )
+            recipes = list(stream_recipes(chunks))
+
+            self.logger.info(
+                "STEP: Verify that all recipes were yielded with their test suite."
+            )
+            self.assertListEqual(recipes, expected)
+
+    def test_stream_recipes_key_order(self):
+        """Test that test suite keys after 'recipes' are yielded with the recipes.
+
+        Approval criteria:
+            - Recipes shall be yielded with the whole test suite, regardless of key order.
+
+        Test steps::
+            1. Parse a batches document where 'recipes' is the first key.
+            2. Verify that the recipes were yielded with the name and priority.
+        """
+        document = json.dumps(
+            [{"recipes": [{"id": "recipe0"}], "name": "suite1", "priority": 1}]
+        )
+        self.logger.info(
+            "STEP: Parse a batches document where 'recipes' is the first key."
+        )
+        recipes = list(stream_recipes([document]))
+
+        self.logger.info(
+            "STEP: Verify that the recipes were yielded with the name and priority."
+        )
+        self.assertListEqual(
+            recipes, [({"name": "suite1", "priority": 1}, {"id": "recipe0"})]
+        )
+
+    def test_stream_recipes_truncated(self):
+        """Test that a truncated batches document raises an exception.
+
+        Approval criteria:
+            - A truncated batches document shall raise ValueError.
+
+        Test steps::
+            1. Parse a truncated batches document.
+            2. Verify that ValueError is raised.
+        """
+        document = json.dumps(BATCHES)
+        self.logger.info("STEP: Parse a truncated batches document.")
+        self.logger.info("STEP: Verify that ValueError is raised.")
+        with self.assertRaises(ValueError):
+            list(stream_recipes([document[:-10]]))
+
+    def test_stream_recipes_incrementally(self):
+        """Test that recipes are yielded before the rest of the document is read.
+
+        Approval criteria:
+            - A recipe shall be yielded as soon as it has been parsed.
+
+        Test steps::
+            1. Parse a batches document, one recipe per chunk.
+            2. Verify that each recipe is yielded before the next chunk is read.
+        """
+        recipes = [{"id": f"recipe{index}"} for index in range(3)]
+        chunks = ['[{"name": "suite1", "recipes": [']
+        chunks += [json.dumps(recipe) + "," for recipe in recipes[:-1]]
+        chunks += [json.dumps(recipes[-1]), "]}]"]
+        read = []
+
+        def read_chunks():
+            """Record how many chunks have been read."""
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+
+        self.logger.info("STEP: Parse a batches document, one recipe per chunk.")
+        stream = stream_recipes(read_chunks())
+
+        self.logger.info(
+            "STEP: Verify that each recipe is yielded before the next chunk is read."
+        )
+        for index, recipe in enumerate(recipes):
+            self.assertEqual(next(stream)[1], recipe)
+            self.assertEqual(len(read), index + 2)
+        self.assertListEqual(list(stream), [])
+
+    def test_group_by_test_runner(self):
+        """Test that streamed recipes are grouped by test suite and test runner.
+
+        Approval criteria:
+            - Recipes shall be grouped by the name of their test suite and test runner.
+            - Test suites shall get the name and priority even if they come after
+              'recipes' in the document.
+
+        Test steps::
+            1. Group the recipes of a document where 'recipes' is the first key.
+            2. Verify that the recipes are grouped by test suite name and test runner.
+        """
+        recipes = [
+            {
+                "id": f"recipe{index}",
+                "constraints": [{"key": "TEST_RUNNER", "value": runner}],
+            }
+            for index, runner in enumerate(("runner1", "runner2", "runner1"))
+        ]
+        document = json.dumps([{"recipes": recipes, "name": "suite1", "priority": 1}])
+
+        self.logger.info(
+            "STEP: Group the recipes of a document where 'recipes' is the first key."
+        )
+        test_suites = group_by_test_runner(stream_recipes([document]))
+
+        self.logger.info(
+            "STEP: Verify that the recipes are grouped by test suite name and test runner."
+        )
+        self.assertDictEqual(
+            test_suites,
+            {
+                "suite1": {
+                    "runner1": {
+                        "docker": "runner1",
+                        "priority": 1,
+                        "unsplit_recipes": [recipes[0], recipes[2]],
+                    },
+                    "runner2": {
+                        "docker": "runner2",
+                        "priority": 1,
+                        "unsplit_recipes": [recipes[1]],
+                    },
+                }
+            },
+        )
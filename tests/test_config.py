@@ -0,0 +1,110 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the environment provider configuration."""
+import logging
+import unittest
+
+from mock import patch
+from etos_lib import ETOS
+
+from environment_provider.lib.config import Config
+
+TERCC = {
+    "testExecutionRecipeCollectionCreated": {
+        "edges": [
+            {
+                "node": {
+                    "data": {"batchesUri": "http://batches"},
+                    "meta": {"id": "tercc_id"},
+                    "links": [
+                        {
+                            "links": {
+                                "__typename": "ArtifactCreated",
+                                "data": {"identity": "pkg:testing/etos"},
+                                "meta": {"id": "artifact_id"},
+                            }
+                        }
+                    ],
+                }
+            }
+        ]
+    }
+}
+ACTIVITY_TRIGGERED = {
+    "activityTriggered": {"edges": [{"node": {"meta": {"id": "activity_id"}}}]}
+}
+ARTIFACT_PUBLISHED = {
+    "artifactPublished": {
+        "edges": [{"node": {"data": {"locations": [{"type": "OTHER"}]}}}]
+    }
+}
+
+
+class TestConfig(unittest.TestCase):
+    """Tests for the environment provider configuration."""
+
+    logger = logging.getLogger(__name__)
+
+    @patch("environment_provider.lib.config.request_artifact_published")
+    @patch("environment_provider.lib.config.request_activity_triggered")
+    @patch("environment_provider.lib.config.request_tercc")
+    @patch("environment_provider.lib.config.request_tercc_and_activity_triggered")
+    def test_generate_keeps_partial_results(
+        self,
+        request_tercc_and_activity_triggered_mock,
+        request_tercc_mock,
+        request_activity_triggered_mock,
+        request_artifact_published_mock,
+    ):
+        """Test that event data that has already been fetched is not requested again.
+
+        Approval criteria:
+            - TERCC and activity triggered shall be requested in a single query.
+            - Event data that has already been fetched shall not be requested again.
+
+        Test steps::
+            1. Generate a configuration where activity triggered is missing at first.
+            2. Verify that the TERCC was only requested once.
+            3. Verify that all event data was generated.
+        """
+        request_tercc_and_activity_triggered_mock.return_value = {
+            **TERCC,
+            "activityTriggered": {"edges": []},
+        }
+        request_activity_triggered_mock.return_value = ACTIVITY_TRIGGERED
+        request_artifact_published_mock.return_value = ARTIFACT_PUBLISHED
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("EVENT_DATA_TIMEOUT", 10)
+
+        self.logger.info(
+            "STEP: Generate a configuration where activity triggered is missing at first."
+        )
+        config = Config(etos, "tercc_id")
+
+        self.logger.info("STEP: Verify that the TERCC was only requested once.")
+        request_tercc_and_activity_triggered_mock.assert_called_once()
+        request_tercc_mock.assert_not_called()
+        request_activity_triggered_mock.assert_called_once()
+        request_artifact_published_mock.assert_called_once_with(etos, "artifact_id")
+
+        self.logger.info("STEP: Verify that all event data was generated.")
+        self.assertTrue(config.generated)
+        self.assertEqual(config.context, "activity_id")
+        self.assertEqual(config.artifact_id, "artifact_id")
+        self.assertEqual(
+            config.artifact_published,
+            ARTIFACT_PUBLISHED["artifactPublished"]["edges"][0]["node"],
+        )
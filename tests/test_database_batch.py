@@ -0,0 +1,79 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for batched database writes."""
+import logging
+import unittest
+
+from environment_provider.lib.database_batch import DatabaseBatch
+from tests.library.fake_database import FakeDatabase
+
+
+class TestDatabaseBatch(unittest.TestCase):
+    """Tests for batched database writes."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_batch(self):
+        """Test that batched writes are sent when the batch is finished.
+
+        Approval criteria:
+            - Writes shall not be sent until the batch is finished.
+            - All writes shall be sent when the batch is finished.
+
+        Test steps::
+            1. Write a key and a hash with several fields in a batch.
+            2. Verify that nothing was written before the batch finished.
+            3. Verify that everything was written when the batch finished.
+        """
+        database = FakeDatabase()
+
+        self.logger.info("STEP: Write a key and a hash with several fields in a batch.")
+        with DatabaseBatch(database) as batch:
+            batch.write("key", "value")
+            batch.hset("hash", {"field1": "value1", "field2": "value2"})
+
+            self.logger.info(
+                "STEP: Verify that nothing was written before the batch finished."
+            )
+            self.assertDictEqual(database.db_dict, {})
+
+        self.logger.info(
+            "STEP: Verify that everything was written when the batch finished."
+        )
+        self.assertEqual(database.read("key"), "value")
+        self.assertEqual(database.reader.hget("hash", "field1"), "value1")
+        self.assertEqual(database.reader.hget("hash", "field2"), "value2")
+
+    def test_batch_exception(self):
+        """Test that batched writes are sent even if an exception is raised.
+
+        Approval criteria:
+            - Writes queued before an exception shall be sent.
+
+        Test steps::
+            1. Write a key in a batch and raise an exception.
+            2. Verify that the key was written.
+        """
+        database = FakeDatabase()
+
+        self.logger.info("STEP: Write a key in a batch and raise an exception.")
+        with self.assertRaises(RuntimeError):
+            with DatabaseBatch(database) as batch:
+                batch.write("key", "value")
+                raise RuntimeError("Failure")
+
+        self.logger.info("STEP: Verify that the key was written.")
+        self.assertEqual(database.read("key"), "value")
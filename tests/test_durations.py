@@ -0,0 +1,169 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the test case duration history."""
+import logging
+import unittest
+
+import falcon
+from mock import patch
+
+from environment_provider.lib.durations import DurationHistory
+from environment_provider_api.webserver import Durations
+from tests.library.fake_database import FakeDatabase
+from tests.library.fake_request import FakeRequest, FakeResponse
+
+
+class TestDurationHistory(unittest.TestCase):
+    """Tests for the test case duration history."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_update(self):
+        """Test that duration estimates move towards reported durations.
+
+        Approval criteria:
+            - The first reported duration shall be the estimate.
+            - Later durations shall move the estimate towards them by 'weight'.
+            - Durations shall be estimated per test runner.
+
+        Test steps::
+            1. Report durations of two test cases twice.
+            2. Verify that the estimates are weighted moving averages.
+            3. Verify that other test runners have no estimates.
+        """
+        duration_history = DurationHistory(FakeDatabase(), weight=0.5)
+
+        self.logger.info("STEP: Report durations of two test cases twice.")
+        duration_history.update("runner", {"test1": 10, "test2": 20})
+        duration_history.update("runner", {"test1": 20})
+
+        self.logger.info(
+            "STEP: Verify that the estimates are weighted moving averages."
+        )
+        durations = duration_history.durations(
+            {"runner": ["test1", "test2", "test3"], "other_runner": ["test1"]}
+        )
+        self.assertDictEqual(durations["runner"], {"test1": 15.0, "test2": 20.0})
+
+        self.logger.info("STEP: Verify that other test runners have no estimates.")
+        self.assertDictEqual(durations["other_runner"], {})
+
+    def test_concurrent_update(self):
+        """Test that an estimate that changes while being updated is not lost.
+
+        Approval criteria:
+            - An update shall be based on the estimate stored when it is written.
+
+        Test steps::
+            1. Report a duration for a test case.
+            2. Report another duration while the estimate is changed concurrently.
+            3. Verify that the update was based on the concurrently changed estimate.
+        """
+        database = FakeDatabase()
+        duration_history = DurationHistory(database, weight=0.5)
+
+        self.logger.info("STEP: Report a duration for a test case.")
+        duration_history.update("runner", {"test1": 10})
+
+        self.logger.info(
+            "STEP: Report another duration while the estimate is changed concurrently."
+        )
+        hmget = database.writer.hmget
+        changed = []
+
+        def hmget_and_change(key, test_cases):
+            """Read the estimates and change them the first time they are read."""
+            estimates = hmget(key, test_cases)
+            if not changed:
+                changed.append(key)
+                database.writer.hset(key, "test1", 30)
+            return estimates
+
+        with patch.object(database.writer, "hmget", hmget_and_change):
+            duration_history.update("runner", {"test1": 20})
+
+        self.logger.info(
+            "STEP: Verify that the update was based on the concurrently changed estimate."
+        )
+        self.assertDictEqual(
+            duration_history.durations({"runner": ["test1"]}),
+            {"runner": {"test1": 25.0}},
+        )
+
+    def test_durations_without_id(self):
+        """Test that test cases without an ID are not looked up.
+
+        Approval criteria:
+            - Test cases without an ID shall be ignored.
+
+        Test steps::
+            1. Report the duration of a test case.
+            2. Get durations for test cases with and without IDs.
+            3. Verify that only the test case with an ID has an estimate.
+        """
+        duration_history = DurationHistory(FakeDatabase())
+
+        self.logger.info("STEP: Report the duration of a test case.")
+        duration_history.update("runner", {"test1": 10})
+
+        self.logger.info("STEP: Get durations for test cases with and without IDs.")
+        durations = duration_history.durations(
+            {"runner": ["test1", None], "other_runner": [None]}
+        )
+
+        self.logger.info(
+            "STEP: Verify that only the test case with an ID has an estimate."
+        )
+        self.assertDictEqual(durations, {"runner": {"test1": 10.0}})
+
+    def test_durations_endpoint(self):
+        """Test that durations can be reported to the durations endpoint.
+
+        Approval criteria:
+            - Reported durations shall be stored in the duration history.
+            - Invalid durations shall be rejected with HTTPBadRequest.
+
+        Test steps::
+            1. Send durations to the durations endpoint.
+            2. Verify that the durations were stored in the duration history.
+            3. Send an invalid duration to the durations endpoint.
+            4. Verify that the durations endpoint responds with HTTPBadRequest.
+        """
+        database = FakeDatabase()
+
+        self.logger.info("STEP: Send durations to the durations endpoint.")
+        request = FakeRequest()
+        request.fake_params = {"test_runner": "runner", "durations": {"test1": 1.5}}
+        response = FakeResponse()
+        Durations(database).on_post(request, response)
+
+        self.logger.info(
+            "STEP: Verify that the durations were stored in the duration history."
+        )
+        self.assertEqual(response.fake_responses.get("status"), falcon.HTTP_204)
+        self.assertDictEqual(
+            DurationHistory(database).durations({"runner": ["test1"]}),
+            {"runner": {"test1": 1.5}},
+        )
+
+        self.logger.info("STEP: Send an invalid duration to the durations endpoint.")
+        request.fake_params = {"test_runner": "runner", "durations": {"test1": "1s"}}
+
+        self.logger.info(
+            "STEP: Verify that the durations endpoint responds with HTTPBadRequest."
+        )
+        with self.assertRaises(falcon.HTTPBadRequest):
+            Durations(database).on_post(request, FakeResponse())
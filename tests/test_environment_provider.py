@@ -0,0 +1,585 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the environment provider task."""
+import os
+import uuid
+import json
+import logging
+import unittest
+from collections import OrderedDict
+
+from mock import patch
+from execution_space_provider import ExecutionSpaceProvider
+from log_area_provider import LogAreaProvider
+from iut_provider.iut import Iut
+from environment_provider.environment_provider import EnvironmentProvider
+from environment_provider.lib.leases import LeaseStore, ResourceLeases
+from environment_provider.lib.sub_suite_store import SubSuiteStore
+from tests.library.fake_database import FakeDatabase
+
+
+class FakePublisher:
+    """Fake publisher that records the events it publishes."""
+
+    def __init__(self, database, confirms=True):
+        """Init with the database that the environment provider writes to."""
+        self.database = database
+        self.confirms = confirms
+        self.published = []
+        self.stopped = False
+        # Events waiting for a confirm, by delivery tag, same as the RabbitMQ publisher.
+        self._deliveries = {}
+
+    def wait_for_unpublished_events(self):
+        """Wait for events to be confirmed, timing out if confirms are disabled."""
+        if not self.confirms:
+            raise TimeoutError("Timeout while waiting for events to publish")
+
+    def stop(self):
+        """Stop the publisher."""
+        self.stopped = True
+
+    def wait_start(self):
+        """Publisher is always started."""
+
+    def send_event(self, event, block=True):
+        """Record the event and whether it was stored in the database when published."""
+        self.published.append(
+            (event, block, self.database.read(event.meta.event_id) is not None)
+        )
+        if not self.confirms:
+            self._deliveries[len(self.published)] = event
+
+
+class TestEnvironmentProvider(unittest.TestCase):
+    """Tests for the environment provider task."""
+
+    logger = logging.getLogger(__name__)
+
+    def setUp(self):
+        """Set the environment variables required by the execution space instructions."""
+        os.environ["ETOS_GRAPHQL_SERVER"] = "http://graphql"
+        os.environ["ETOS_API"] = "http://etos_api"
+        os.environ["ETOS_ENVIRONMENT_PROVIDER"] = "http://environment_provider"
+
+    @staticmethod
+    def ruleset(ruleset):
+        """Convert a ruleset to an OrderedDict, the same way as the provider registry does."""
+        return json.loads(json.dumps(ruleset), object_pairs_hook=OrderedDict)
+
+    def environment_provider(self):
+        """Create an environment provider with static JSONTas providers."""
+        environment_provider = EnvironmentProvider("suite_id", ["suite_runner_id"])
+        etos = environment_provider.etos
+        etos.config.set("rabbitmq", {})
+        etos.config.set("source", {})
+        etos.config.set("WAIT_FOR_EXECUTION_SPACE_TIMEOUT", 10)
+        etos.config.set("WAIT_FOR_LOG_AREA_TIMEOUT", 10)
+        environment_provider.dataset.add("config", etos.config)
+        environment_provider.execution_space_provider = ExecutionSpaceProvider(
+            etos,
+            environment_provider.jsontas,
+            self.ruleset(
+                {
+                    "id": "execution_space_provider_test",
+                    "list": {
+                        "possible": {
+                            "$expand": {
+                                "value": {
+                                    "image": "$test_runner",
+                                    "instructions": {"identifier": "$uuid"},
+                                },
+                                "to": "$amount",
+                            }
+                        },
+                        "available": "$this.possible",
+                    },
+                }
+            ),
+        )
+        environment_provider.log_area_provider = LogAreaProvider(
+            etos,
+            environment_provider.jsontas,
+            self.ruleset(
+                {
+                    "id": "log_area_provider_test",
+                    "list": {
+                        "possible": {
+                            "$expand": {"value": {"name": "log_area"}, "to": "$amount"}
+                        },
+                        "available": "$this.possible",
+                    },
+                    "checkout": {"iut": "$iut", "executor": "$executor"},
+                }
+            ),
+        )
+        etos.config.set(
+            "PROVIDERS",
+            [
+                environment_provider.execution_space_provider,
+                environment_provider.log_area_provider,
+            ],
+        )
+        return environment_provider
+
+    def test_concurrent_execution_space_checkout(self):
+        """Test that execution spaces can be checked out concurrently for all test runners.
+
+        Approval criteria:
+            - Each IUT shall get an executor and a log area.
+            - Executors shall be checked out with the dataset of their own test runner.
+
+        Test steps::
+            1. Checkout executors for two test runners concurrently.
+            2. Verify that all IUTs got an executor from their own test runner.
+            3. Verify that all IUTs got a log area.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.dataset.add("uuid", "a_uuid")
+        test_runners = {
+            "runner1": {"iuts": {"iut1": {}, "iut2": {}}},
+            "runner2": {"iuts": {"iut3": {}}},
+        }
+
+        self.logger.info("STEP: Checkout executors for two test runners concurrently.")
+        environment_provider.checkout_and_assign_executors_to_test_runners(test_runners)
+
+        self.logger.info(
+            "STEP: Verify that all IUTs got an executor from their own test runner."
+        )
+        for test_runner, values in test_runners.items():
+            for suite in values["iuts"].values():
+                self.assertEqual(suite["executor"].image, test_runner)
+
+        self.logger.info("STEP: Verify that all IUTs got a log area.")
+        for values in test_runners.values():
+            for iut, suite in values["iuts"].items():
+                self.assertEqual(suite["log_area"].iut, iut)
+
+    def test_bulk_log_area_checkout(self):
+        """Test that log areas can be checked out for all IUTs in a single request.
+
+        Approval criteria:
+            - Log areas shall be checked out with a single request to the log area provider.
+            - Each log area shall be checked out with the 'iut' and 'executor' it belongs to.
+
+        Test steps::
+            1. Checkout log areas for three IUTs with bulk log area checkout enabled.
+            2. Verify that the log area provider was requested once.
+            3. Verify that each log area was checked out for its own IUT and executor.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.etos.config.set("BULK_LOG_AREA_CHECKOUT", True)
+        environment_provider.dataset.add("uuid", "a_uuid")
+        iuts = {"iut1": {}, "iut2": {}, "iut3": {}}
+        log_area_provider = environment_provider.log_area_provider
+        requests = []
+
+        def wait_for_and_checkout_log_areas(*args, **kwargs):
+            """Store the request and forward it to the log area provider."""
+            requests.append(kwargs)
+            return type(log_area_provider).wait_for_and_checkout_log_areas(
+                log_area_provider, *args, **kwargs
+            )
+
+        log_area_provider.wait_for_and_checkout_log_areas = (
+            wait_for_and_checkout_log_areas
+        )
+
+        self.logger.info(
+            "STEP: Checkout log areas for three IUTs with bulk log area checkout enabled."
+        )
+        environment_provider.checkout_and_assign_executors_to_iuts("runner1", iuts)
+
+        self.logger.info("STEP: Verify that the log area provider was requested once.")
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]["minimum_amount"], 3)
+
+        self.logger.info(
+            "STEP: Verify that each log area was checked out for its own IUT and executor."
+        )
+        for iut, suite in iuts.items():
+            self.assertEqual(suite["log_area"].iut, iut)
+            self.assertEqual(suite["log_area"].executor, suite["executor"])
+
+    def test_bulk_log_area_checkout_reading_iut(self):
+        """Test that log areas are listed per IUT if the list step reads the IUT.
+
+        Approval criteria:
+            - Log areas shall be checked out one by one if the 'list' step of the log
+              area ruleset reads the 'iut' or 'executor'.
+
+        Test steps::
+            1. Checkout log areas for two IUTs with a ruleset listing by IUT.
+            2. Verify that the log area provider was requested once per IUT.
+            3. Verify that each log area was listed for its own IUT.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.etos.config.set("BULK_LOG_AREA_CHECKOUT", True)
+        environment_provider.dataset.add("uuid", "a_uuid")
+        environment_provider.log_area_provider = LogAreaProvider(
+            environment_provider.etos,
+            environment_provider.jsontas,
+            self.ruleset(
+                {
+                    "id": "log_area_provider_test",
+                    "list": {
+                        "possible": {
+                            "$expand": {"value": {"name": "$iut"}, "to": "$amount"}
+                        },
+                        "available": "$this.possible",
+                    },
+                }
+            ),
+        )
+        iuts = {"iut1": {}, "iut2": {}}
+        provider_class = type(environment_provider.log_area_provider)
+        checkout = provider_class.wait_for_and_checkout_log_areas
+        requests = []
+
+        def wait_for_and_checkout_log_areas(provider, *args, **kwargs):
+            """Store the request and forward it to the log area provider."""
+            requests.append(kwargs)
+            return checkout(provider, *args, **kwargs)
+
+        self.logger.info(
+            "STEP: Checkout log areas for two IUTs with a ruleset listing by IUT."
+        )
+        with patch.object(
+            provider_class,
+            "wait_for_and_checkout_log_areas",
+            wait_for_and_checkout_log_areas,
+        ):
+            environment_provider.checkout_and_assign_executors_to_iuts("runner1", iuts)
+
+        self.logger.info(
+            "STEP: Verify that the log area provider was requested once per IUT."
+        )
+        self.assertListEqual(
+            [request["minimum_amount"] for request in requests], [1, 1]
+        )
+
+        self.logger.info("STEP: Verify that each log area was listed for its own IUT.")
+        for iut, suite in iuts.items():
+            self.assertEqual(suite["log_area"].name, iut)
+
+    def test_pipelined_checkout(self):
+        """Test that executors and log areas are checked out for all test runners at once.
+
+        Approval criteria:
+            - Each IUT shall get an executor from its own test runner and a log area.
+            - Log areas shall be checked out with a single request per test runner.
+            - Each log area shall be checked out with the 'iut' and 'executor' it belongs to.
+
+        Test steps::
+            1. Checkout IUTs, executors and log areas for two test runners, pipelined.
+            2. Verify that the log area provider was requested once per test runner.
+            3. Verify that all IUTs got an executor and a log area.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.dataset.add("uuid", "a_uuid")
+        environment_provider.etos.config.set("NUMBER_OF_TESTRUNNERS", 2)
+        test_runners = {"runner1": {}, "runner2": {}}
+
+        def checkout_and_assign_iuts_to_test_runners(test_runners):
+            """Assign IUTs without an IUT provider."""
+            test_runners["runner1"]["iuts"] = {"iut1": {}, "iut2": {}}
+            test_runners["runner2"]["iuts"] = {"iut3": {}}
+
+        environment_provider.checkout_and_assign_iuts_to_test_runners = (
+            checkout_and_assign_iuts_to_test_runners
+        )
+        provider_class = type(environment_provider.log_area_provider)
+        checkout = provider_class.wait_for_and_checkout_log_areas
+        requests = []
+
+        def wait_for_and_checkout_log_areas(provider, *args, **kwargs):
+            """Store the request and forward it to the log area provider."""
+            requests.append(kwargs)
+            return checkout(provider, *args, **kwargs)
+
+        self.logger.info(
+            "STEP: Checkout IUTs, executors and log areas for two test runners, pipelined."
+        )
+        with patch.object(
+            provider_class,
+            "wait_for_and_checkout_log_areas",
+            wait_for_and_checkout_log_areas,
+        ):
+            environment_provider.checkout_and_assign_pipelined(test_runners)
+
+        self.logger.info(
+            "STEP: Verify that the log area provider was requested once per test runner."
+        )
+        self.assertListEqual(
+            sorted(request["minimum_amount"] for request in requests), [1, 2]
+        )
+
+        self.logger.info("STEP: Verify that all IUTs got an executor and a log area.")
+        for test_runner, values in test_runners.items():
+            for iut, suite in values["iuts"].items():
+                self.assertEqual(suite["executor"].image, test_runner)
+                self.assertEqual(suite["log_area"].iut, iut)
+                self.assertEqual(suite["log_area"].executor, suite["executor"])
+
+    def test_checkin_unused_iuts(self):
+        """Test that the leases on IUTs are released when unused IUTs are checked in.
+
+        Approval criteria:
+            - IUTs that are not assigned to a test runner shall be checked in.
+            - The lease on an unused IUT shall be released when it is checked in.
+            - The lease on an assigned IUT shall be kept.
+
+        Test steps::
+            1. Checkout two IUTs, for a test runner that only uses one.
+            2. Verify that the unused IUT was checked in.
+            3. Verify that only the lease on the assigned IUT is kept.
+        """
+        environment_provider = self.environment_provider()
+        database = FakeDatabase()
+        environment_provider.resource_leases = ResourceLeases(
+            LeaseStore(database, ttl=60), "suite_id"
+        )
+        dataset = environment_provider.dataset
+        checked_in = []
+
+        class FakeIutProvider:
+            """IUT provider handing out two IUTs."""
+
+            @staticmethod
+            def wait_for_and_checkout_iuts(**_):
+                """Check out two IUTs, adding copies of them to the dataset."""
+                dataset.add(
+                    "iuts",
+                    [
+                        Iut(provider_id="iut_provider", name=name)
+                        for name in ("used", "unused")
+                    ],
+                )
+                return [
+                    Iut(provider_id="iut_provider", name=name)
+                    for name in ("used", "unused")
+                ]
+
+            @staticmethod
+            def checkin(iut):
+                """Check in an IUT."""
+                checked_in.append(iut)
+
+        class FakeSplitter:  # pylint:disable=too-few-public-methods
+            """Splitter assigning the first IUT to the test runner."""
+
+            @staticmethod
+            def assign_iuts(test_runners, iuts):
+                """Assign the first IUT and return the rest."""
+                test_runners["runner"]["iuts"] = {iuts[0]: {}}
+                return iuts[1:]
+
+        environment_provider.iut_provider = FakeIutProvider()
+        environment_provider.splitter = FakeSplitter()
+        test_runners = {"runner": {}}
+
+        self.logger.info(
+            "STEP: Checkout two IUTs, for a test runner that only uses one."
+        )
+        environment_provider.checkout_and_assign_iuts_to_test_runners(test_runners)
+
+        self.logger.info("STEP: Verify that the unused IUT was checked in.")
+        self.assertListEqual([iut.name for iut in checked_in], ["unused"])
+
+        self.logger.info(
+            "STEP: Verify that only the lease on the assigned IUT is kept."
+        )
+        lease_ids = database.writer.zrange(LeaseStore.index, 0, -1)
+        resources = LeaseStore(database).read_resources(lease_ids)
+        self.assertListEqual(
+            [resource["iut"]["name"] for resource in resources.values()], ["used"]
+        )
+
+    def test_copy_for_test_suite(self):
+        """Test that a test suite can be provisioned in isolation from other test suites.
+
+        Approval criteria:
+            - A copied environment provider shall not share dataset, registry or
+              configuration with the original.
+            - A copied environment provider shall share the event publisher.
+
+        Test steps::
+            1. Copy an environment provider for a test suite.
+            2. Verify that the dataset, registry and configuration are not shared.
+            3. Verify that the event publisher is shared.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.etos.publisher = "publisher"
+        environment_provider.etos.config.set("TOTAL_TEST_COUNT", 1)
+
+        self.logger.info("STEP: Copy an environment provider for a test suite.")
+        copied = environment_provider.copy_for_test_suite()
+        copied.etos.config.set("TOTAL_TEST_COUNT", 2)
+
+        self.logger.info(
+            "STEP: Verify that the dataset, registry and configuration are not shared."
+        )
+        self.assertIsNot(copied.dataset, environment_provider.dataset)
+        self.assertIsNot(copied.registry, environment_provider.registry)
+        self.assertIsNot(
+            copied.etos.config.get("PROVIDERS"),
+            environment_provider.etos.config.get("PROVIDERS"),
+        )
+        self.assertEqual(environment_provider.etos.config.get("TOTAL_TEST_COUNT"), 1)
+        self.assertEqual(copied.etos.config.get("TOTAL_TEST_COUNT"), 2)
+
+        self.logger.info("STEP: Verify that the event publisher is shared.")
+        self.assertEqual(copied.etos.publisher, "publisher")
+
+    def test_send_environment_events(self):
+        """Test that environment defined events are published in a single burst.
+
+        Approval criteria:
+            - All events shall be stored in the database before any is published.
+            - Events shall be published without blocking on the publisher.
+
+        Test steps::
+            1. Send environment defined events for three sub suites.
+            2. Verify that all events were stored in the database before publishing.
+            3. Verify that all events were published without blocking.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.dataset.add("context", str(uuid.uuid4()))
+        database = FakeDatabase()
+        publisher = FakePublisher(database)
+        environment_provider.etos.publisher = publisher
+        sub_suites = [
+            {
+                "name": f"suite_{index}",
+                "executor": {"instructions": {"identifier": f"identifier_{index}"}},
+            }
+            for index in range(3)
+        ]
+
+        environment_provider.sub_suite_store = SubSuiteStore(database)
+
+        self.logger.info("STEP: Send environment defined events for three sub suites.")
+        environment_provider.send_environment_events({"sub_suites": sub_suites})
+
+        self.logger.info(
+            "STEP: Verify that all events were stored in the database before publishing."
+        )
+        self.assertEqual(len(publisher.published), 3)
+        for event, _, stored in publisher.published:
+            self.assertTrue(stored, f"{event.meta.event_id} was not stored")
+
+        self.logger.info(
+            "STEP: Verify that all events were published without blocking."
+        )
+        for _, block, _ in publisher.published:
+            self.assertFalse(block)
+
+    def test_confirm_events(self):
+        """Test that events that are not confirmed are published again.
+
+        Approval criteria:
+            - Events that are not confirmed shall be published again with a new publisher.
+            - Events that are confirmed shall not be published again.
+            - TimeoutError shall be raised if the events are still not confirmed.
+
+        Test steps::
+            1. Send two environment defined events with a publisher that never confirms.
+            2. Confirm the first event and wait for the rest with a new publisher.
+            3. Verify that only the second event was published again.
+            4. Confirm the events with a new publisher that never confirms.
+            5. Verify that TimeoutError is raised.
+        """
+        environment_provider = self.environment_provider()
+        environment_provider.dataset.add("context", str(uuid.uuid4()))
+        database = FakeDatabase()
+        environment_provider.sub_suite_store = SubSuiteStore(database)
+        stuck = FakePublisher(database, confirms=False)
+        environment_provider.etos.publisher = stuck
+        publishers = []
+
+        def start_publisher(confirms):
+            """Replace the publisher of the environment provider."""
+            environment_provider.etos.publisher = FakePublisher(database, confirms)
+            publishers.append(environment_provider.etos.publisher)
+
+        self.logger.info(
+            "STEP: Send two environment defined events with a publisher that never confirms."
+        )
+        environment_provider.send_environment_events(
+            {
+                "sub_suites": [
+                    {
+                        "name": "suite",
+                        "executor": {"instructions": {"identifier": identifier}},
+                    }
+                    for identifier in ("first", "second")
+                ]
+            }
+        )
+
+        self.logger.info(
+            "STEP: Confirm the first event and wait for the rest with a new publisher."
+        )
+        stuck._deliveries.pop(1)  # pylint:disable=protected-access
+        environment_provider.etos.start_publisher = lambda: start_publisher(True)
+        environment_provider.confirm_events()
+
+        self.logger.info("STEP: Verify that only the second event was published again.")
+        self.assertTrue(stuck.stopped)
+        self.assertListEqual(
+            [event for event, _, _ in publishers[0].published],
+            [stuck.published[1][0]],
+        )
+
+        self.logger.info(
+            "STEP: Confirm the events with a new publisher that never confirms."
+        )
+        environment_provider.etos.publisher = stuck
+        environment_provider.etos.start_publisher = lambda: start_publisher(False)
+
+        self.logger.info("STEP: Verify that TimeoutError is raised.")
+        with self.assertRaises(TimeoutError):
+            environment_provider.confirm_events()
+
+    def test_confirm_events_and_stop_publisher(self):
+        """Test that events can be confirmed after the environment has been returned.
+
+        Approval criteria:
+            - Events that are never confirmed shall not raise an exception.
+            - The publisher shall be stopped when the events have been confirmed.
+
+        Test steps::
+            1. Confirm events with publishers that never confirm.
+            2. Verify that the publisher was stopped.
+        """
+        environment_provider = self.environment_provider()
+        database = FakeDatabase()
+        environment_provider.etos.publisher = FakePublisher(database, confirms=False)
+
+        def start_publisher():
+            """Replace the publisher of the environment provider."""
+            environment_provider.etos.publisher = FakePublisher(
+                database, confirms=False
+            )
+
+        environment_provider.etos.start_publisher = start_publisher
+
+        self.logger.info("STEP: Confirm events with publishers that never confirm.")
+        environment_provider.confirm_events_and_stop_publisher()
+
+        self.logger.info("STEP: Verify that the publisher was stopped.")
+        self.assertTrue(environment_provider.etos.publisher.stopped)
@@ -0,0 +1,132 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the event cache."""
+import logging
+import unittest
+
+from mock import patch
+from etos_lib import ETOS
+
+from environment_provider.lib.config import Config
+from environment_provider.lib.event_cache import EventCache
+from tests.library.fake_database import FakeDatabase
+from tests.test_config import TERCC, ACTIVITY_TRIGGERED, ARTIFACT_PUBLISHED
+
+
+class TestEventCache(unittest.TestCase):
+    """Tests for the event cache."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_get_and_set(self):
+        """Test that events can be stored in and read from the event cache.
+
+        Approval criteria:
+            - The event cache shall return stored events.
+            - The event cache shall count hits and misses.
+
+        Test steps::
+            1. Get an event that is not in the event cache.
+            2. Store the event in the event cache and get it again.
+            3. Verify that the event was returned from the event cache.
+            4. Verify that there was one hit and one miss.
+        """
+        event_cache = EventCache(FakeDatabase())
+
+        self.logger.info("STEP: Get an event that is not in the event cache.")
+        self.assertIsNone(event_cache.get("ArtifactPublished", "artifact_id"))
+
+        self.logger.info("STEP: Store the event in the event cache and get it again.")
+        event_cache.set("ArtifactPublished", "artifact_id", ARTIFACT_PUBLISHED)
+        event = event_cache.get("ArtifactPublished", "artifact_id")
+
+        self.logger.info(
+            "STEP: Verify that the event was returned from the event cache."
+        )
+        self.assertDictEqual(event, ARTIFACT_PUBLISHED)
+
+        self.logger.info("STEP: Verify that there was one hit and one miss.")
+        self.assertDictEqual(event_cache.statistics(), {"hits": 1, "misses": 1})
+
+    def test_max_size(self):
+        """Test that the oldest events are removed when the event cache is full.
+
+        Approval criteria:
+            - The event cache shall not store more than 'max_size' events.
+
+        Test steps::
+            1. Store three events in an event cache with a max size of two.
+            2. Verify that the oldest event was removed from the event cache.
+        """
+        event_cache = EventCache(FakeDatabase(), max_size=2)
+
+        self.logger.info(
+            "STEP: Store three events in an event cache with a max size of two."
+        )
+        with patch("environment_provider.lib.event_cache.time.time") as time_mock:
+            for timestamp, artifact_id in enumerate(("first", "second", "third")):
+                time_mock.return_value = timestamp
+                event_cache.set("ArtifactPublished", artifact_id, ARTIFACT_PUBLISHED)
+
+        self.logger.info(
+            "STEP: Verify that the oldest event was removed from the event cache."
+        )
+        self.assertIsNone(event_cache.get("ArtifactPublished", "first"))
+        self.assertIsNotNone(event_cache.get("ArtifactPublished", "second"))
+        self.assertIsNotNone(event_cache.get("ArtifactPublished", "third"))
+
+    @patch("environment_provider.lib.config.request_artifact_published")
+    @patch("environment_provider.lib.config.request_tercc_and_activity_triggered")
+    def test_config_uses_event_cache(
+        self, request_tercc_and_activity_triggered_mock, request_artifact_published_mock
+    ):
+        """Test that the configuration reads artifact published from the event cache.
+
+        Approval criteria:
+            - Artifact published shall only be requested once for the same artifact.
+
+        Test steps::
+            1. Generate two configurations for the same artifact with an event cache.
+            2. Verify that artifact published was only requested once.
+            3. Verify that both configurations got the artifact published.
+        """
+        request_tercc_and_activity_triggered_mock.return_value = {
+            **TERCC,
+            **ACTIVITY_TRIGGERED,
+        }
+        request_artifact_published_mock.return_value = ARTIFACT_PUBLISHED
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("EVENT_DATA_TIMEOUT", 10)
+        event_cache = EventCache(FakeDatabase())
+
+        self.logger.info(
+            "STEP: Generate two configurations for the same artifact with an event cache."
+        )
+        configs = [Config(etos, "tercc_id", event_cache) for _ in range(2)]
+
+        self.logger.info(
+            "STEP: Verify that artifact published was only requested once."
+        )
+        request_artifact_published_mock.assert_called_once_with(etos, "artifact_id")
+
+        self.logger.info(
+            "STEP: Verify that both configurations got the artifact published."
+        )
+        for config in configs:
+            self.assertEqual(
+                config.artifact_published,
+                ARTIFACT_PUBLISHED["artifactPublished"]["edges"][0]["node"],
+            )
@@ -0,0 +1,210 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the asynchronous external provider client."""
+import logging
+import unittest
+
+from etos_lib import ETOS
+from jsontas.jsontas import JsonTas
+from packageurl import PackageURL
+
+from environment_provider.lib.external_client import ExternalProviderClient
+from iut_provider.utilities.external_provider import (
+    ExternalProvider as ExternalIutProvider,
+)
+from iut_provider.exceptions import IutCheckoutFailed
+from log_area_provider.utilities.external_provider import (
+    ExternalProvider as ExternalLogAreaProvider,
+)
+from tests.library.fake_server import FakeServer
+
+
+class TestExternalProviderClient(unittest.TestCase):
+    """Tests for the asynchronous external provider client."""
+
+    logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def jsontas():
+        """Create a JSONTas instance with the dataset of the external providers.
+
+        :return: JSONTas instance.
+        :rtype: :obj:`jsontas.jsontas.JsonTas`
+        """
+        jsontas = JsonTas()
+        jsontas.dataset.merge(
+            {
+                "identity": PackageURL.from_string("pkg:testing/etos"),
+                "artifact_id": "artifactid",
+                "artifact_created": "artifactcreated",
+                "artifact_published": "artifactpublished",
+                "tercc": "tercc",
+                "dataset": {},
+                "context": "context",
+            }
+        )
+        return jsontas
+
+    def test_checkout_all(self):
+        """Test that resources can be checked out from several providers at once.
+
+        Approval criteria:
+            - It shall be possible to check out from several external providers at once.
+
+        Test steps::
+            1. Initialize an external IUT provider and an external log area provider.
+            2. Check out from both providers with the external provider client.
+            3. Verify that resources from both providers are returned.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("WAIT_FOR_IUT_TIMEOUT", 10)
+        etos.config.set("WAIT_FOR_LOG_AREA_TIMEOUT", 10)
+        with FakeServer(
+            ["ok", "ok", "ok"],
+            [
+                {"id": "1"},
+                {"status": "PENDING"},
+                {"status": "DONE", "iuts": [{"test_id": "iut"}]},
+            ],
+        ) as iut_server, FakeServer(
+            ["ok", "ok"],
+            [{"id": "2"}, {"status": "DONE", "log_areas": [{"test_id": "log_area"}]}],
+        ) as log_area_server:
+            self.logger.info(
+                "STEP: Initialize an external IUT provider and an external log area provider."
+            )
+            iut_provider = ExternalIutProvider(
+                etos,
+                self.jsontas(),
+                {
+                    "id": "iut_provider",
+                    "start": {"host": iut_server.host},
+                    "status": {"host": iut_server.host},
+                    "stop": {"host": iut_server.host},
+                },
+            )
+            log_area_provider = ExternalLogAreaProvider(
+                etos,
+                self.jsontas(),
+                {
+                    "id": "log_area_provider",
+                    "start": {"host": log_area_server.host},
+                    "status": {"host": log_area_server.host},
+                    "stop": {"host": log_area_server.host},
+                },
+            )
+
+            self.logger.info(
+                "STEP: Check out from both providers with the external provider client."
+            )
+            iuts, log_areas = ExternalProviderClient().checkout_all(
+                [(iut_provider, 1, 1), (log_area_provider, 1, 1, None)]
+            )
+
+        self.logger.info(
+            "STEP: Verify that resources from both providers are returned."
+        )
+        self.assertEqual([iut.test_id for iut in iuts], ["iut"])
+        self.assertEqual([log_area.test_id for log_area in log_areas], ["log_area"])
+
+    def test_checkout_failed(self):
+        """Test that a failed checkout is returned as an exception and checked in.
+
+        Approval criteria:
+            - A failed checkout shall be returned as the exception it raised.
+            - The resources of a failed checkout shall be checked in.
+
+        Test steps::
+            1. Check out from an external provider that fails the request.
+            2. Verify that the exception is returned and that a stop request was sent.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("WAIT_FOR_IUT_TIMEOUT", 10)
+        with FakeServer(
+            ["ok", "ok", "no_content"],
+            [{"id": "1"}, {"status": "FAILED", "description": "failure"}, {}],
+        ) as server:
+            provider = ExternalIutProvider(
+                etos,
+                self.jsontas(),
+                {
+                    "id": "iut_provider",
+                    "start": {"host": server.host},
+                    "status": {"host": server.host},
+                    "stop": {"host": server.host},
+                },
+            )
+            self.logger.info(
+                "STEP: Check out from an external provider that fails the request."
+            )
+            (result,) = ExternalProviderClient().checkout_all([(provider, 1, 1)])
+
+            self.logger.info(
+                "STEP: Verify that the exception is returned and that a stop request was sent."
+            )
+            self.assertIsInstance(result, IutCheckoutFailed)
+            self.assertEqual(server.nbr_of_requests, 3)
+
+    def test_checkout_log_areas_with_contexts(self):
+        """Test that log areas checked out with contexts are matched with them.
+
+        Approval criteria:
+            - Log areas checked out for contexts shall be returned with their context.
+
+        Test steps::
+            1. Check out log areas for two contexts with the external provider client.
+            2. Verify that each log area is returned with its context.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        etos.config.set("WAIT_FOR_LOG_AREA_TIMEOUT", 10)
+        contexts = [{"iut": "first"}, {"iut": "second"}]
+        with FakeServer(
+            ["ok", "ok"],
+            [
+                {"id": "1"},
+                {
+                    "status": "DONE",
+                    "log_areas": [
+                        {"test_id": "second", "context": 1},
+                        {"test_id": "first", "context": 0},
+                    ],
+                },
+            ],
+        ) as server:
+            provider = ExternalLogAreaProvider(
+                etos,
+                self.jsontas(),
+                {
+                    "id": "log_area_provider",
+                    "start": {"host": server.host},
+                    "status": {"host": server.host},
+                    "stop": {"host": server.host},
+                },
+            )
+            self.logger.info(
+                "STEP: Check out log areas for two contexts with the external provider client."
+            )
+            (result,) = ExternalProviderClient().checkout_all(
+                [(provider, 2, 2, contexts)]
+            )
+
+        self.logger.info(
+            "STEP: Verify that each log area is returned with its context."
+        )
+        self.assertEqual(
+            [(context["iut"], log_area.test_id) for context, log_area in result],
+            [("second", "second"), ("first", "first")],
+        )
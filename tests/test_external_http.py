@@ -0,0 +1,72 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the pooled HTTP sessions and status polling of external providers."""
+import logging
+import unittest
+
+from provider_http import get_session, poll_delays
+
+
+class TestExternalHttp(unittest.TestCase):
+    """Tests for the pooled HTTP sessions and status polling of external providers."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_pooled_session(self):
+        """Test that requests to the same host share a pooled HTTP session.
+
+        Approval criteria:
+            - Requests to the same host shall use the same session.
+            - Requests to different hosts shall use different sessions.
+
+        Test steps::
+            1. Get sessions for two URLs on the same host and one on another host.
+            2. Verify that only the URLs on the same host share a session.
+        """
+        self.logger.info(
+            "STEP: Get sessions for two URLs on the same host and one on another host."
+        )
+        status = get_session("http://external.provider:8080/status")
+        stop = get_session("http://external.provider:8080/stop")
+        other = get_session("http://other.provider:8080/status")
+        self.logger.info(
+            "STEP: Verify that only the URLs on the same host share a session."
+        )
+        self.assertIs(status, stop)
+        self.assertIsNot(status, other)
+
+    def test_poll_delays(self):
+        """Test that the delays between status polls grow up to a maximum.
+
+        Approval criteria:
+            - The first delay shall be at most the minimum delay.
+            - The delays shall grow exponentially, up to the maximum delay.
+
+        Test steps::
+            1. Generate delays between status polls.
+            2. Verify that the delays grow exponentially up to the maximum delay.
+        """
+        self.logger.info("STEP: Generate delays between status polls.")
+        delays = poll_delays(minimum=0.2, maximum=2)
+        generated = [next(delays) for _ in range(10)]
+
+        self.logger.info(
+            "STEP: Verify that the delays grow exponentially up to the maximum delay."
+        )
+        for index, delay in enumerate(generated):
+            expected = min(0.2 * 2**index, 2)
+            self.assertGreaterEqual(delay, expected / 2)
+            self.assertLessEqual(delay, expected)
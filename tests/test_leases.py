@@ -0,0 +1,181 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the lease store."""
+import logging
+import unittest
+
+from environment_provider.lib.database_batch import DatabaseBatch
+from environment_provider.lib.leases import LeaseStore, ResourceLeases
+from log_area_provider.log_area import LogArea
+from tests.library.fake_database import FakeDatabase
+
+
+class FakeProvider:  # pylint:disable=too-few-public-methods
+    """Provider that records the resources checked in to it."""
+
+    def __init__(self):
+        """Init."""
+        self.checked_in = []
+
+    def checkin(self, resource):
+        """Check in a resource."""
+        self.checked_in.append(resource)
+
+
+class TestLeaseStore(unittest.TestCase):
+    """Tests for the lease store."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_renew(self):
+        """Test that only leases that have not been claimed or released can be renewed.
+
+        Approval criteria:
+            - Leases that have not been claimed or released shall be renewed.
+            - Leases that have been claimed by a reaper or released shall not be renewed.
+
+        Test steps::
+            1. Grant three leases.
+            2. Expire and claim one lease and release another.
+            3. Renew all three leases.
+            4. Verify that only the lease that was neither claimed nor released was renewed.
+        """
+        database = FakeDatabase()
+        lease_store = LeaseStore(database, ttl=60)
+
+        self.logger.info("STEP: Grant three leases.")
+        with DatabaseBatch(database) as batch:
+            lease_store.grant(batch, "active", "claimed", "released")
+
+        self.logger.info("STEP: Expire and claim one lease and release another.")
+        database.writer.zadd(LeaseStore.index, {"claimed": 0})
+        self.assertListEqual(lease_store.claim_expired(), ["claimed"])
+        lease_store.release("released")
+
+        self.logger.info("STEP: Renew all three leases.")
+        renewed = lease_store.renew("active", "claimed", "released")
+
+        self.logger.info(
+            "STEP: Verify that only the lease that was neither claimed nor released was renewed."
+        )
+        self.assertListEqual(renewed, ["active"])
+        self.assertIsNone(database.writer.zscore(LeaseStore.index, "claimed"))
+        self.assertIsNone(database.writer.zscore(LeaseStore.index, "released"))
+
+    def test_claim_expired(self):
+        """Test that expired leases are claimed only once.
+
+        Approval criteria:
+            - Only expired leases shall be claimed.
+            - A claimed lease shall not be claimed again.
+
+        Test steps::
+            1. Grant two leases and expire one of them.
+            2. Claim expired leases twice.
+            3. Verify that the expired lease was claimed once.
+        """
+        database = FakeDatabase()
+        lease_store = LeaseStore(database, ttl=60)
+
+        self.logger.info("STEP: Grant two leases and expire one of them.")
+        with DatabaseBatch(database) as batch:
+            lease_store.grant(batch, "active", "expired")
+        database.writer.zadd(LeaseStore.index, {"expired": 0})
+
+        self.logger.info("STEP: Claim expired leases twice.")
+        first = lease_store.claim_expired()
+        second = lease_store.claim_expired()
+
+        self.logger.info("STEP: Verify that the expired lease was claimed once.")
+        self.assertListEqual(first, ["expired"])
+        self.assertListEqual(second, [])
+        self.assertListEqual(lease_store.renew("active"), ["active"])
+
+    def test_resource_leases(self):
+        """Test that resources are leased when checked out and handed over to sub suites.
+
+        Approval criteria:
+            - Resources shall be leased, and stored, when they are checked out.
+            - Resources shall not be changed when they are leased.
+            - A sub suite lease shall replace the leases on the resources of the sub suite.
+            - The lease on a resource shall be released when it is checked in.
+            - Leases on resources that are not handed over shall be released.
+
+        Test steps::
+            1. Lease three checked out log areas.
+            2. Verify that the log areas are leased, stored and unchanged.
+            3. Hand over the lease on the first log area to a sub suite.
+            4. Check in the second log area.
+            5. Verify that only the sub suite and the third log area are leased.
+            6. Release the remaining resource leases.
+            7. Verify that only the sub suite is leased.
+        """
+        database = FakeDatabase()
+        resource_leases = ResourceLeases(LeaseStore(database, ttl=60), "suite_id")
+        log_areas = [
+            LogArea(provider_id="provider", name=name)
+            for name in ("first", "second", "third")
+        ]
+        first, second, _ = log_areas
+
+        self.logger.info("STEP: Lease three checked out log areas.")
+        resource_leases.lease("log_area", log_areas)
+        lease_ids = [resource_leases.leases[id(log_area)][1] for log_area in log_areas]
+
+        self.logger.info(
+            "STEP: Verify that the log areas are leased, stored and unchanged."
+        )
+        lease_store = resource_leases.lease_store
+        resources = lease_store.read_resources(lease_ids)
+        self.assertListEqual(
+            [resources[lease_id]["log_area"]["name"] for lease_id in lease_ids],
+            ["first", "second", "third"],
+        )
+        self.assertEqual(resources[lease_ids[0]]["suite_id"], "suite_id")
+        self.assertDictEqual(
+            first.as_dict, {"provider_id": "provider", "name": "first"}
+        )
+
+        self.logger.info(
+            "STEP: Hand over the lease on the first log area to a sub suite."
+        )
+        with DatabaseBatch(database) as batch:
+            resource_leases.transfer(batch, "sub_suite", [first])
+
+        self.logger.info("STEP: Check in the second log area.")
+        provider = FakeProvider()
+        resource_leases.checkin(provider, second)
+
+        self.logger.info(
+            "STEP: Verify that only the sub suite and the third log area are leased."
+        )
+        self.assertListEqual(provider.checked_in, [second])
+        self.assertCountEqual(
+            database.writer.zrange(LeaseStore.index, 0, -1),
+            [lease_ids[2], "sub_suite"],
+        )
+        self.assertListEqual(
+            list(lease_store.read_resources(lease_ids)), [lease_ids[2]]
+        )
+
+        self.logger.info("STEP: Release the remaining resource leases.")
+        resource_leases.release()
+
+        self.logger.info("STEP: Verify that only the sub suite is leased.")
+        self.assertListEqual(
+            database.writer.zrange(LeaseStore.index, 0, -1), ["sub_suite"]
+        )
+        self.assertDictEqual(lease_store.read_resources(lease_ids), {})
@@ -0,0 +1,69 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the log area checkout."""
+import logging
+import unittest
+from collections import OrderedDict
+
+from jsontas.jsontas import JsonTas
+
+from log_area_provider.log_area import LogArea
+from log_area_provider.utilities.checkout import Checkout
+
+
+class FailingJsonTas(JsonTas):
+    """JSONTas failing to run rulesets for the IUT 'iut2'."""
+
+    def run(self, json_data=None, json_file=None, copy=True):
+        """Run a ruleset, failing if the IUT in the dataset is 'iut2'."""
+        if self.dataset.get("iut") == "iut2":
+            return "Checkout failed"
+        return super().run(json_data, json_file, copy)
+
+
+class TestLogAreaCheckout(unittest.TestCase):
+    """Tests for the log area checkout."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_checkout_contexts_with_failure(self):
+        """Test that log areas are matched with their contexts when a checkout fails.
+
+        Approval criteria:
+            - Log areas that fail checkout shall not be returned.
+            - Every returned log area shall be paired with the context it was checked
+              out with.
+
+        Test steps::
+            1. Checkout three log areas, where the checkout of the second fails.
+            2. Verify that the remaining log areas are paired with their contexts.
+        """
+        checkout = Checkout(FailingJsonTas(), OrderedDict({"iut": "$iut"}))
+        contexts = [{"iut": "iut1"}, {"iut": "iut2"}, {"iut": "iut3"}]
+        log_areas = [LogArea(name=str(index)) for index in range(3)]
+
+        self.logger.info(
+            "STEP: Checkout three log areas, where the checkout of the second fails."
+        )
+        checked_out = checkout.checkout(log_areas, contexts)
+
+        self.logger.info(
+            "STEP: Verify that the remaining log areas are paired with their contexts."
+        )
+        self.assertListEqual(
+            [(context["iut"], log_area.iut) for context, log_area in checked_out],
+            [("iut1", "iut1"), ("iut3", "iut3")],
+        )
@@ -0,0 +1,140 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the provider registry."""
+import logging
+import unittest
+
+from etos_lib import ETOS
+from jsontas.jsontas import JsonTas
+from jsonschema.exceptions import ValidationError
+
+from iut_provider import iut_provider_schema
+from environment_provider.lib.registry import ProviderRegistry, schema_validator
+from tests.library.fake_database import FakeDatabase
+
+
+def iut_provider(name):
+    """Create an IUT provider ruleset."""
+    return {
+        "iut": {
+            "id": "registry_iut_provider_test",
+            "list": {"possible": [name], "available": []},
+        }
+    }
+
+
+class TestProviderRegistry(unittest.TestCase):
+    """Tests for the provider registry."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_provider_cache(self):
+        """Test that parsed providers are cached until they are registered again.
+
+        Approval criteria:
+            - A provider shall only be parsed once per generation.
+            - A provider registered again shall not be read from the cache.
+
+        Test steps::
+            1. Register an IUT provider and get it twice.
+            2. Verify that the same parsed provider was returned both times.
+            3. Register the IUT provider again and get it.
+            4. Verify that the newly registered provider was returned.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        registry = ProviderRegistry(etos, JsonTas(), FakeDatabase())
+
+        self.logger.info("STEP: Register an IUT provider and get it twice.")
+        registry.register_iut_provider(iut_provider("first"))
+        first = registry.get_iut_provider_by_id("registry_iut_provider_test")
+        second = registry.get_iut_provider_by_id("registry_iut_provider_test")
+
+        self.logger.info(
+            "STEP: Verify that the same parsed provider was returned both times."
+        )
+        self.assertIs(first, second)
+        self.assertDictEqual(first, iut_provider("first"))
+
+        self.logger.info("STEP: Register the IUT provider again and get it.")
+        registry.register_iut_provider(iut_provider("second"))
+        third = registry.get_iut_provider_by_id("registry_iut_provider_test")
+
+        self.logger.info(
+            "STEP: Verify that the newly registered provider was returned."
+        )
+        self.assertDictEqual(third, iut_provider("second"))
+
+    def test_configured_provider_cache(self):
+        """Test that a provider configured to a suite is read from the cache.
+
+        Approval criteria:
+            - A configured provider shall be read from the cache if it is up to date.
+
+        Test steps::
+            1. Register and configure an IUT provider for a suite.
+            2. Get the IUT provider configured for the suite.
+            3. Verify that the cached IUT provider was used.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        database = FakeDatabase()
+        registry = ProviderRegistry(etos, JsonTas(), database)
+
+        self.logger.info("STEP: Register and configure an IUT provider for a suite.")
+        registry.register_iut_provider(iut_provider("first"))
+        cached = registry.get_iut_provider_by_id("registry_iut_provider_test")
+        registry.configure_environment_provider_for_suite(
+            "suite_id", cached, {}, {}, {}
+        )
+
+        self.logger.info("STEP: Get the IUT provider configured for the suite.")
+        provider = ProviderRegistry(etos, JsonTas(), database).iut_provider("suite_id")
+
+        self.logger.info("STEP: Verify that the cached IUT provider was used.")
+        self.assertIs(provider.ruleset, cached["iut"])  # pylint:disable=no-member
+
+    def test_validate_reuses_validator(self):
+        """Test that the schema validator is only created once per schema.
+
+        Approval criteria:
+            - A schema shall only be loaded once, no matter how many times it is used.
+            - Invalid providers shall still raise ValidationError.
+
+        Test steps::
+            1. Validate an IUT provider several times.
+            2. Verify that the schema validator was only created once.
+            3. Verify that an invalid IUT provider raises ValidationError.
+        """
+        etos = ETOS("testing_etos", "testing_etos", "testing_etos")
+        registry = ProviderRegistry(etos, JsonTas(), FakeDatabase())
+        provider = iut_provider("first")
+        schema = iut_provider_schema(provider)
+        schema_validator.cache_clear()
+
+        self.logger.info("STEP: Validate an IUT provider several times.")
+        for _ in range(3):
+            registry.validate(provider, schema)
+
+        self.logger.info(
+            "STEP: Verify that the schema validator was only created once."
+        )
+        self.assertEqual(schema_validator.cache_info().misses, 1)
+        self.assertEqual(schema_validator.cache_info().hits, 2)
+
+        self.logger.info(
+            "STEP: Verify that an invalid IUT provider raises ValidationError."
+        )
+        with self.assertRaises(ValidationError):
+            registry.validate({"iut": {"list": {}}}, schema)
@@ -0,0 +1,201 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the sub suite storage."""
+import json
+import logging
+import unittest
+
+from environment_provider.lib.database_batch import DatabaseBatch
+from environment_provider.lib.sub_suite_store import SubSuiteStore
+from tests.library.fake_database import FakeDatabase
+
+SUB_SUITE = {
+    "name": "SubSuite_0",
+    "recipes": [{"id": str(index), "testCase": {"id": "test"}} for index in range(50)],
+}
+
+
+class TestSubSuiteStore(unittest.TestCase):
+    """Tests for the sub suite storage."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_compressed_sub_suite(self):
+        """Test that a compressed sub suite is stored once and can be read back.
+
+        Approval criteria:
+            - A sub suite shall only be stored in the sub suite hash.
+            - A compressed sub suite shall be smaller than its JSON.
+            - It shall be possible to read a compressed sub suite.
+
+        Test steps::
+            1. Store a sub suite with zlib compression.
+            2. Verify that the sub suite is stored compressed, in the sub suite hash only.
+            3. Verify that the sub suite can be read from the store.
+        """
+        database = FakeDatabase()
+        store = SubSuiteStore(database, compression="zlib")
+
+        self.logger.info("STEP: Store a sub suite with zlib compression.")
+        with DatabaseBatch(database) as batch:
+            store.write(batch, "identifier", SUB_SUITE)
+
+        self.logger.info(
+            "STEP: Verify that the sub suite is stored compressed, in the sub suite hash only."
+        )
+        self.assertIsNone(database.read("identifier"))
+        data = database.reader.hget("SubSuite:identifier", "Suite")
+        self.assertEqual(
+            database.reader.hget("SubSuite:identifier", "Encoding"), "zlib"
+        )
+        self.assertLess(len(data), len(json.dumps(SUB_SUITE)))
+
+        self.logger.info("STEP: Verify that the sub suite can be read from the store.")
+        self.assertDictEqual(store.read("identifier"), SUB_SUITE)
+        self.assertTrue(store.exists("identifier"))
+
+    def test_legacy_sub_suite(self):
+        """Test that sub suites stored by earlier versions can be read.
+
+        Approval criteria:
+            - Sub suites stored directly under the identifier shall be readable.
+
+        Test steps::
+            1. Store a sub suite as JSON under its identifier.
+            2. Verify that the sub suite can be read from the store.
+        """
+        database = FakeDatabase()
+
+        self.logger.info("STEP: Store a sub suite as JSON under its identifier.")
+        database.write("identifier", json.dumps(SUB_SUITE))
+
+        self.logger.info("STEP: Verify that the sub suite can be read from the store.")
+        self.assertDictEqual(SubSuiteStore(database).read("identifier"), SUB_SUITE)
+
+    def test_read_many(self):
+        """Test that several sub suites can be read at once.
+
+        Approval criteria:
+            - Compressed, legacy and missing sub suites shall be read in order.
+
+        Test steps::
+            1. Store a compressed sub suite and a legacy sub suite.
+            2. Read both sub suites and one that is not stored.
+            3. Verify that the sub suites are returned in order, None if not stored.
+        """
+        database = FakeDatabase()
+        store = SubSuiteStore(database, compression="zlib")
+
+        self.logger.info("STEP: Store a compressed sub suite and a legacy sub suite.")
+        with DatabaseBatch(database) as batch:
+            store.write(batch, "compressed", SUB_SUITE)
+        database.write("legacy", json.dumps(SUB_SUITE))
+
+        self.logger.info("STEP: Read both sub suites and one that is not stored.")
+        sub_suites = store.read_many(["compressed", "missing", "legacy"])
+
+        self.logger.info(
+            "STEP: Verify that the sub suites are returned in order, None if not stored."
+        )
+        self.assertListEqual(sub_suites, [SUB_SUITE, None, SUB_SUITE])
+
+    def test_remove(self):
+        """Test that removing a sub suite also removes its environment defined event ID.
+
+        Approval criteria:
+            - Removing a sub suite shall remove the sub suite and its event ID.
+
+        Test steps::
+            1. Store a sub suite and its environment defined event ID.
+            2. Remove the sub suite.
+            3. Verify that neither the sub suite nor the event ID is stored.
+        """
+        database = FakeDatabase()
+        store = SubSuiteStore(database)
+
+        self.logger.info(
+            "STEP: Store a sub suite and its environment defined event ID."
+        )
+        with DatabaseBatch(database) as batch:
+            store.write(batch, "identifier", SUB_SUITE)
+            store.write_event_id(batch, "identifier", "event_id")
+        self.assertEqual(database.read("event_id"), "identifier")
+
+        self.logger.info("STEP: Remove the sub suite.")
+        store.remove("identifier")
+
+        self.logger.info(
+            "STEP: Verify that neither the sub suite nor the event ID is stored."
+        )
+        self.assertFalse(store.exists("identifier"))
+        self.assertIsNone(store.read("identifier"))
+        self.assertIsNone(database.read("event_id"))
+
+    def test_remove_several(self):
+        """Test that several sub suites can be checked and removed at once.
+
+        Approval criteria:
+            - It shall be possible to check whether several sub suites are stored.
+            - It shall be possible to remove several sub suites and their event IDs.
+
+        Test steps::
+            1. Store two sub suites and their environment defined event IDs.
+            2. Verify that both sub suites, and only them, are reported as stored.
+            3. Remove both sub suites.
+            4. Verify that neither the sub suites nor the event IDs are stored.
+        """
+        database = FakeDatabase()
+        store = SubSuiteStore(database)
+
+        self.logger.info(
+            "STEP: Store two sub suites and their environment defined event IDs."
+        )
+        with DatabaseBatch(database) as batch:
+            for identifier in ("first", "second"):
+                store.write(batch, identifier, SUB_SUITE)
+                store.write_event_id(batch, identifier, f"{identifier}_event_id")
+
+        self.logger.info(
+            "STEP: Verify that both sub suites, and only them, are reported as stored."
+        )
+        self.assertListEqual(
+            store.exists_many(["first", "missing", "second"]), [True, False, True]
+        )
+
+        self.logger.info("STEP: Remove both sub suites.")
+        store.remove("first", "second")
+
+        self.logger.info(
+            "STEP: Verify that neither the sub suites nor the event IDs are stored."
+        )
+        self.assertListEqual(store.exists_many(["first", "second"]), [False, False])
+        self.assertIsNone(database.read("first_event_id"))
+        self.assertIsNone(database.read("second_event_id"))
+
+    def test_unknown_compression(self):
+        """Test that an unknown compression is rejected.
+
+        Approval criteria:
+            - It shall not be possible to create a store with an unknown compression.
+
+        Test steps::
+            1. Create a store with an unknown compression.
+            2. Verify that a ValueError is raised.
+        """
+        self.logger.info("STEP: Create a store with an unknown compression.")
+        self.logger.info("STEP: Verify that a ValueError is raised.")
+        with self.assertRaises(ValueError):
+            SubSuiteStore(FakeDatabase(), compression="lz4")
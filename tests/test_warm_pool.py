@@ -0,0 +1,296 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the warm pool."""
+import json
+import time
+import logging
+import unittest
+
+from jsontas.jsontas import JsonTas
+
+from environment_provider.lib.warm_pool import WarmPool, WarmPoolProvider, warm_pool_id
+from log_area_provider.log_area import LogArea
+from tests.library.fake_database import FakeDatabase
+
+
+class FakeLogAreaProvider:
+    """Log area provider handing out numbered log areas."""
+
+    def __init__(self):
+        """Init."""
+        self.requests = []
+        self.checked_in = []
+
+    def wait_for_and_checkout_log_areas(
+        self, minimum_amount=0, maximum_amount=100, contexts=None
+    ):
+        """Check out log areas."""
+        self.requests.append((minimum_amount, maximum_amount, contexts))
+        log_areas = [LogArea(name=f"new_{index}") for index in range(maximum_amount)]
+        if contexts is None:
+            return log_areas
+        return list(zip(contexts, log_areas))
+
+    def checkin(self, log_area):
+        """Check in a log area."""
+        self.checked_in.append(log_area)
+
+
+class TestWarmPool(unittest.TestCase):
+    """Tests for the warm pool."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_take_and_metrics(self):
+        """Test that resources can be taken from a pool and that hits are counted.
+
+        Approval criteria:
+            - Resources shall be taken from the pool, oldest first.
+            - The pool shall report its size, hits and misses.
+
+        Test steps::
+            1. Put two resources in a pool.
+            2. Take three resources from the pool.
+            3. Verify that the two resources were taken, oldest first.
+            4. Verify that the pool reports two hits, one miss and an empty pool.
+        """
+        database = FakeDatabase()
+        pool = WarmPool(database, "provider", 2)
+
+        self.logger.info("STEP: Put two resources in a pool.")
+        pool.put([{"name": "first"}])
+        pool.put([{"name": "second"}])
+        self.assertEqual(pool.missing(), 0)
+
+        self.logger.info("STEP: Take three resources from the pool.")
+        resources = pool.take(3)
+
+        self.logger.info(
+            "STEP: Verify that the two resources were taken, oldest first."
+        )
+        self.assertListEqual(resources, [{"name": "first"}, {"name": "second"}])
+
+        self.logger.info(
+            "STEP: Verify that the pool reports two hits, one miss and an empty pool."
+        )
+        metrics = WarmPool.all_metrics(database)["provider"]
+        self.assertEqual(metrics["size"], 0)
+        self.assertEqual(metrics["hits"], 2)
+        self.assertEqual(metrics["misses"], 1)
+        self.assertEqual(pool.missing(), 2)
+
+    def test_warm_pool_provider(self):
+        """Test that a warm pool provider takes resources from the pool first.
+
+        Approval criteria:
+            - Log areas shall be taken from the pool before checking out new ones.
+            - Contexts shall only be passed for the log areas that are checked out.
+            - Log areas taken from the pool shall be checked in by 'checkin_all'.
+
+        Test steps::
+            1. Check out three log areas from a pool holding one log area.
+            2. Verify that one log area was taken from the pool and two checked out.
+            3. Check in all log areas taken from the pool.
+            4. Verify that the log area from the pool was checked in.
+        """
+        pool = WarmPool(FakeDatabase(), "provider", 1)
+        pool.put([{"name": "pooled"}])
+        log_area_provider = FakeLogAreaProvider()
+        provider = WarmPoolProvider(log_area_provider, pool, LogArea, lambda _: [])
+
+        self.logger.info(
+            "STEP: Check out three log areas from a pool holding one log area."
+        )
+        log_areas = provider.wait_for_and_checkout_log_areas(
+            minimum_amount=3, maximum_amount=3, contexts=["a", "b", "c"]
+        )
+
+        self.logger.info(
+            "STEP: Verify that one log area was taken from the pool and two checked out."
+        )
+        self.assertListEqual(
+            [(context, log_area.name) for context, log_area in log_areas],
+            [("a", "pooled"), ("b", "new_0"), ("c", "new_1")],
+        )
+        self.assertListEqual(log_area_provider.requests, [(2, 2, ["b", "c"])])
+
+        self.logger.info("STEP: Check in all log areas taken from the pool.")
+        provider.checkin_all()
+
+        self.logger.info("STEP: Verify that the log area from the pool was checked in.")
+        self.assertListEqual(log_area_provider.checked_in, [log_areas[0][1]])
+
+    def test_evict(self):
+        """Test that resources older than the maximum age are checked in, not taken.
+
+        Approval criteria:
+            - Resources older than the maximum age shall not be taken from the pool.
+            - Evicted resources shall be checked in to the wrapped provider.
+
+        Test steps::
+            1. Put a resource that is older than the maximum age in a pool.
+            2. Check out a log area from the pool.
+            3. Verify that the old log area was checked in and a new one checked out.
+        """
+        pool = WarmPool(FakeDatabase(), "provider", 1, max_age=60)
+        log_area_provider = FakeLogAreaProvider()
+        provider = WarmPoolProvider(log_area_provider, pool, LogArea, lambda _: [])
+
+        self.logger.info(
+            "STEP: Put a resource that is older than the maximum age in a pool."
+        )
+        pool.database.writer.zadd(
+            pool.key, {json.dumps({"name": "old"}): time.time() - 120}
+        )
+
+        self.logger.info("STEP: Check out a log area from the pool.")
+        log_areas = provider.wait_for_and_checkout_log_areas(
+            minimum_amount=1, maximum_amount=1
+        )
+
+        self.logger.info(
+            "STEP: Verify that the old log area was checked in and a new one checked out."
+        )
+        self.assertListEqual([log_area.name for log_area in log_areas], ["new_0"])
+        self.assertListEqual(
+            [log_area.name for log_area in log_area_provider.checked_in], ["old"]
+        )
+        self.assertEqual(pool.missing(), 1)
+
+    def test_warm_pool_id(self):
+        """Test that resources are only pooled for checkouts reading the same dataset.
+
+        Approval criteria:
+            - Datasets with the same values for the referenced keys shall share a pool.
+            - Datasets with different values for the referenced keys shall not.
+            - Rulesets with a 'checkout' step shall not be pooled.
+            - Rulesets reading values that differ between requests shall not be pooled.
+            - External providers shall not be pooled.
+
+        Test steps::
+            1. Get pool IDs for datasets differing in a key that is not referenced.
+            2. Verify that the pool IDs are the same.
+            3. Get a pool ID for a dataset differing in a referenced key.
+            4. Verify that the pool ID is different.
+            5. Verify that a ruleset with a checkout step has no pool.
+            6. Verify that a ruleset reading the request UUID has no pool.
+            7. Verify that an external provider has no pool.
+        """
+        ruleset = {
+            "id": "provider",
+            "list": {
+                "possible": {
+                    "$expand": {"value": {"image": "$test_runner"}, "to": "$amount"}
+                },
+                "available": "$this.possible",
+            },
+        }
+
+        def dataset(**values):
+            """Create a dataset with values."""
+            jsontas = JsonTas()
+            for key, value in values.items():
+                jsontas.dataset.add(key, value)
+            return jsontas.dataset
+
+        self.logger.info(
+            "STEP: Get pool IDs for datasets differing in a key that is not referenced."
+        )
+        first = warm_pool_id(
+            "log_area", ruleset, dataset(test_runner="runner", suite="first")
+        )
+        second = warm_pool_id(
+            "log_area", ruleset, dataset(test_runner="runner", suite="second")
+        )
+
+        self.logger.info("STEP: Verify that the pool IDs are the same.")
+        self.assertEqual(first, second)
+
+        self.logger.info(
+            "STEP: Get a pool ID for a dataset differing in a referenced key."
+        )
+        other = warm_pool_id(
+            "log_area", ruleset, dataset(test_runner="other", suite="first")
+        )
+
+        self.logger.info("STEP: Verify that the pool ID is different.")
+        self.assertNotEqual(first, other)
+
+        self.logger.info(
+            "STEP: Verify that a ruleset with a checkout step has no pool."
+        )
+        checkout = dict(ruleset, checkout={"iut": "$iut"})
+        self.assertIsNone(
+            warm_pool_id("log_area", checkout, dataset(test_runner="runner"))
+        )
+
+        self.logger.info(
+            "STEP: Verify that a ruleset reading the request UUID has no pool."
+        )
+        uuid = dict(ruleset, list=dict(ruleset["list"], name="$uuid"))
+        self.assertIsNone(
+            warm_pool_id("log_area", uuid, dataset(test_runner="runner", uuid="1"))
+        )
+
+        self.logger.info("STEP: Verify that an external provider has no pool.")
+        external = {"id": "provider", "type": "external", "start": {"host": "host"}}
+        self.assertIsNone(
+            warm_pool_id("log_area", external, dataset(test_runner="runner"))
+        )
+
+    def test_evict_all(self):
+        """Test that resources older than the maximum age are evicted from all pools.
+
+        Approval criteria:
+            - Old resources shall be evicted from every pool in the index.
+            - Resources that are not too old shall be kept.
+
+        Test steps::
+            1. Put an old and a new resource in two pools.
+            2. Evict all pools.
+            3. Verify that only the old resources were evicted, from both pools.
+        """
+        database = FakeDatabase()
+        pools = [
+            WarmPool(database, "log_area:first:1", 2, max_age=60),
+            WarmPool(database, "executor:second:2", 2, max_age=60),
+        ]
+
+        self.logger.info("STEP: Put an old and a new resource in two pools.")
+        for pool in pools:
+            pool.put([{"name": "new"}])
+            database.writer.zadd(
+                pool.key, {json.dumps({"name": "old"}): time.time() - 120}
+            )
+
+        self.logger.info("STEP: Evict all pools.")
+        evicted = WarmPool.evict_all(database, 60)
+
+        self.logger.info(
+            "STEP: Verify that only the old resources were evicted, from both pools."
+        )
+        self.assertCountEqual(
+            [
+                (pool.pool_id, pool.resource_type, resources)
+                for pool, resources in evicted
+            ],
+            [
+                ("log_area:first:1", "log_area", [{"name": "old"}]),
+                ("executor:second:2", "executor", [{"name": "old"}]),
+            ],
+        )
+        for pool in pools:
+            self.assertEqual(pool.missing(), 1)
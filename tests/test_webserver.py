@@ -17,9 +17,12 @@
 import logging
 import json
 import unittest
+import zlib
 
 import falcon
 
+from environment_provider.lib.database_batch import DatabaseBatch
+from environment_provider.lib.sub_suite_store import SubSuiteStore
 from environment_provider_api.webserver import SubSuite
 from tests.library.fake_request import FakeRequest, FakeResponse
 from tests.library.fake_database import FakeDatabase
@@ -56,7 +59,88 @@ class TestSubSuite(unittest.TestCase):
         self.logger.info(
             "STEP: Verify that the sub suite endpoint responds with a sub suite."
         )
-        self.assertDictEqual(response.fake_responses.get("media"), sub_suite)
+        self.assertDictEqual(json.loads(response.fake_responses.get("data")), sub_suite)
+
+    def test_get_deflate(self):
+        """Test that compressed sub suites are served compressed to clients accepting it.
+
+        Approval criteria:
+            - A compressed sub suite shall be served as stored, with deflate encoding.
+            - An entity tag shall be sent with the sub suite.
+
+        Test steps:
+            1. Add a compressed sub suite to the database.
+            2. Send a fake request, accepting deflate, to the sub suite endpoint.
+            3. Verify that the sub suite is served as stored, with deflate encoding.
+        """
+        self.logger.info("STEP: Add a compressed sub suite to the database.")
+        database = FakeDatabase()
+        sub_suite = {"test": "suite"}
+        with DatabaseBatch(database) as batch:
+            SubSuiteStore(database, compression="zlib").write(
+                batch, "identifier", sub_suite
+            )
+
+        self.logger.info(
+            "STEP: Send a fake request, accepting deflate, to the sub suite endpoint."
+        )
+        request = FakeRequest()
+        request.fake_params["id"] = "identifier"
+        request.fake_headers["Accept-Encoding"] = "gzip, deflate"
+        response = FakeResponse()
+        SubSuite(database).on_get(request, response)
+
+        self.logger.info(
+            "STEP: Verify that the sub suite is served as stored, with deflate encoding."
+        )
+        self.assertEqual(
+            response.fake_responses.get("data"),
+            database.reader.hget("SubSuite:identifier", "Suite"),
+        )
+        self.assertEqual(
+            zlib.decompress(response.fake_responses["data"]),
+            json.dumps(sub_suite).encode(),
+        )
+        self.assertEqual(
+            response.fake_responses["headers"].get("Content-Encoding"), "deflate"
+        )
+        self.assertIsNotNone(response.fake_responses.get("etag"))
+
+    def test_get_not_modified(self):
+        """Test that a sub suite is not sent again if the client already has it.
+
+        Approval criteria:
+            - The sub suite endpoint shall respond with 304 if the entity tag matches.
+
+        Test steps:
+            1. Add a sub suite to the database and fetch it from the endpoint.
+            2. Send a fake request with the entity tag in If-None-Match.
+            3. Verify that the sub suite endpoint responds with 304 and no sub suite.
+        """
+        self.logger.info(
+            "STEP: Add a sub suite to the database and fetch it from the endpoint."
+        )
+        database = FakeDatabase()
+        with DatabaseBatch(database) as batch:
+            SubSuiteStore(database).write(batch, "identifier", {"test": "suite"})
+        request = FakeRequest()
+        request.fake_params["id"] = "identifier"
+        response = FakeResponse()
+        SubSuite(database).on_get(request, response)
+        etag = response.fake_responses.get("etag")
+
+        self.logger.info(
+            "STEP: Send a fake request with the entity tag in If-None-Match."
+        )
+        request.if_none_match = [etag]
+        response = FakeResponse()
+        SubSuite(database).on_get(request, response)
+
+        self.logger.info(
+            "STEP: Verify that the sub suite endpoint responds with 304 and no sub suite."
+        )
+        self.assertEqual(response.fake_responses.get("status"), falcon.HTTP_304)
+        self.assertIsNone(response.fake_responses.get("data"))
 
     def test_get_no_id(self):
         """Test that the sub suite endpoint fails when sub suite was not found.
@@ -0,0 +1,110 @@
+# Copyright 2022 Axis Communications AB.
+#
+# For a full list of individual contributors, please see the commit history.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the webserver request context pool."""
+import logging
+import unittest
+
+from environment_provider_api.context import ContextPool
+from tests.library.fake_database import FakeDatabase
+
+
+class TestContextPool(unittest.TestCase):
+    """Tests for the webserver request context pool."""
+
+    logger = logging.getLogger(__name__)
+
+    def test_reuse(self):
+        """Test that request contexts are reused between requests.
+
+        Approval criteria:
+            - A request context shall be reused when it is no longer in use.
+
+        Test steps::
+            1. Get a request context from the pool and return it.
+            2. Get a request context from the pool again.
+            3. Verify that the same request context was returned.
+        """
+        pool = ContextPool(FakeDatabase(), size=1)
+
+        self.logger.info("STEP: Get a request context from the pool and return it.")
+        with pool.context() as context:
+            first = context
+
+        self.logger.info("STEP: Get a request context from the pool again.")
+        with pool.context() as context:
+            second = context
+
+        self.logger.info("STEP: Verify that the same request context was returned.")
+        self.assertIs(first, second)
+
+    def test_isolation(self):
+        """Test that configuration is isolated between request contexts.
+
+        Approval criteria:
+            - Configuration set in one request context shall not be visible in another.
+            - Configuration shall be reset when a request context is returned.
+
+        Test steps::
+            1. Set a configuration value in a request context.
+            2. Verify that the value is not set in another request context in use.
+            3. Return the request context and get it again.
+            4. Verify that the value is no longer set.
+        """
+        pool = ContextPool(FakeDatabase(), size=2)
+
+        self.logger.info("STEP: Set a configuration value in a request context.")
+        with pool.context() as context:
+            context.etos.config.set("SUITE_ID", "suite_id")
+            context.jsontas.dataset.add("key", "value")
+
+            self.logger.info(
+                "STEP: Verify that the value is not set in another request context in use."
+            )
+            with pool.context() as other_context:
+                self.assertIsNot(context, other_context)
+                self.assertIsNone(other_context.etos.config.get("SUITE_ID"))
+            first = context
+
+        self.logger.info("STEP: Return the request context and get it again.")
+        with pool.context() as context:
+            self.assertIs(context, first)
+
+            self.logger.info("STEP: Verify that the value is no longer set.")
+            self.assertIsNone(context.etos.config.get("SUITE_ID"))
+            self.assertIsNone(context.jsontas.dataset.get("key"))
+            self.assertEqual(context.etos.config.get("PROVIDERS"), [])
+
+    def test_size(self):
+        """Test that the pool keeps at most 'size' request contexts.
+
+        Approval criteria:
+            - Request contexts shall not be kept when the pool is full.
+
+        Test steps::
+            1. Use two request contexts at the same time, with a pool size of one.
+            2. Verify that only one of them is kept in the pool.
+        """
+        pool = ContextPool(FakeDatabase(), size=1)
+
+        self.logger.info(
+            "STEP: Use two request contexts at the same time, with a pool size of one."
+        )
+        with pool.context():
+            with pool.context():
+                pass
+
+        self.logger.info("STEP: Verify that only one of them is kept in the pool.")
+        self.assertEqual(pool.contexts.qsize(), 1)